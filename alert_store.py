@@ -0,0 +1,107 @@
+import sqlite3
+import threading
+import time
+
+# ==============================================================================
+# --- 設定項目 ---
+# ==============================================================================
+ALERT_DB_PATH = "alert_store.sqlite"
+MAX_ROWS = 100_000   # 期限内でもこれを超えたら古い順に捨てる（ファイルを一定サイズに保つ）
+BATCH = 500          # 1回の IN (...) に渡すキー数（SQLite の変数上限より十分小さく）
+
+
+# ==============================================================================
+# --- 通知済みキーのTTL付きストア ---
+# ==============================================================================
+class AlertStore:
+    """通知済みのシグナルをキーごとの有効期限付きで SQLite に記録する重複排除ストア
+
+    ファイルに保存するため再起動後も記録が残り、場中監視(monitor.py)と夜間パトロール
+    (monitor_stocks.py)で同じファイルを共有できる。期限切れの行は記録のたびに削除する。
+    """
+
+    def __init__(self, path=ALERT_DB_PATH, clock=time.time, max_rows=MAX_ROWS):
+        self.path = path
+        self.clock = clock
+        self.max_rows = max_rows
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.lock = threading.RLock()
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS alerts ("
+            " key TEXT PRIMARY KEY, sent REAL NOT NULL, expires REAL NOT NULL)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS alerts_expires ON alerts (expires)")
+
+    def close(self):
+        self.conn.close()
+
+    def _live(self, keys, now):
+        live = set()
+        for i in range(0, len(keys), BATCH):
+            part = keys[i:i+BATCH]
+            rows = self.conn.execute(
+                f"SELECT key FROM alerts WHERE expires > ? AND key IN ({','.join('?' * len(part))})",
+                (now, *part))
+            live.update(key for key, in rows)
+        return live
+
+    def fresh(self, keys):
+        """keys のうち、未通知または期限切れのものを元の順序で返す"""
+        keys = list(dict.fromkeys(keys))
+        with self.lock:
+            live = self._live(keys, self.clock())
+        return [k for k in keys if k not in live]
+
+    def claim(self, keys, ttl, refresh=False):
+        """未通知のキーを通知済みとして記録し、その一覧を返す（判定と記録は1トランザクション）
+
+        別プロセスが同時に claim しても、同じキーを両方が「新規」と判定することはない。
+        refresh=True なら既に記録済みのキーも期限を延ばす（シグナルが続く間は再通知しない用途）。
+        """
+        keys = list(dict.fromkeys(keys))
+        with self.lock:
+            now = self.clock()
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                live = self._live(keys, now)
+                new = [k for k in keys if k not in live]
+                targets = keys if refresh else new
+                self.conn.executemany(
+                    "INSERT INTO alerts (key, sent, expires) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET expires = excluded.expires, "
+                    "sent = CASE WHEN alerts.expires > ? THEN alerts.sent ELSE excluded.sent END",
+                    [(k, now, now + ttl, now) for k in targets])
+                self._evict(now)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return new
+
+    def forget(self, keys):
+        """記録を取り消す（送信に失敗したシグナルを次回また新規として扱う）"""
+        keys = list(keys)
+        with self.lock:
+            for i in range(0, len(keys), BATCH):
+                part = keys[i:i+BATCH]
+                self.conn.execute(f"DELETE FROM alerts WHERE key IN ({','.join('?' * len(part))})", part)
+
+    def _evict(self, now):
+        self.conn.execute("DELETE FROM alerts WHERE expires <= ?", (now,))
+        excess = self.conn.execute("SELECT COUNT(*) FROM alerts").fetchone()[0] - self.max_rows
+        if excess > 0:
+            self.conn.execute(
+                "DELETE FROM alerts WHERE key IN (SELECT key FROM alerts ORDER BY sent LIMIT ?)", (excess,))
+
+    def evict(self):
+        """期限切れの行を削除する"""
+        with self.lock:
+            self._evict(self.clock())
+
+    def clear(self, prefix=""):
+        with self.lock:
+            self.conn.execute("DELETE FROM alerts WHERE key LIKE ? ESCAPE '\\'",
+                              (prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%",))
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM alerts WHERE expires > ?", (self.clock(),)).fetchone()[0]
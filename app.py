@@ -1,65 +1,179 @@
+import os
+import re
+import threading
+import unicodedata
+
 import streamlit as st
 import yfinance as yf
 import pandas as pd
-import requests  # 👈 追加: Discord通信用
-import json
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, time as dt_time, timedelta, timezone
+
+from discord_notify import DiscordWebhook
+from monitor_stocks import FILTER_STEPS, build_panel
+from snapshot import SNAPSHOT_PATH, Snapshot
 
 # ==========================================
 # ⚙️ 設定 (ここにURLを入れてください)
 # ==========================================
 DISCORD_WEBHOOK_URL ="https://discord.com/api/webhooks/1472281747000393902/Fbclh0R3R55w6ZnzhenJ24coaUPKy42abh3uPO-fRjfQulk9OwAq-Cf8cJQOe2U4SFme"
+CACHE_MINUTES = 5   # 場中に株価データを取り直す間隔（分）
+MIN_BARS = 60
+
+JST = timezone(timedelta(hours=9))
+
+# ==========================================
+# 🗄️ キャッシュ：市場の時間帯に合わせて更新
+# ==========================================
+def session_key(now=None):
+    """キャッシュの有効範囲を区切るキー
+
+    場中（平日 9:00〜15:30）は CACHE_MINUTES 分ごとに切り替わり、
+    場外は寄り付き前・大引け後でそれぞれ1日1つに固定される（同じデータを取り直さない）。
+    """
+    now = now or datetime.now(JST)
+    t = now.time()
+    if now.weekday() < 5 and dt_time(9, 0) <= t <= dt_time(15, 30):
+        return now.strftime("%Y%m%d-%H") + f"{now.minute // CACHE_MINUTES * CACHE_MINUTES:02d}"
+    return now.strftime("%Y%m%d") + ("-pre" if t < dt_time(9, 0) else "-post")
+
+
+@st.cache_data(ttl=timedelta(days=1), max_entries=64, show_spinner=False)
+def fetch_history(tickers, key):
+    """6ヶ月分の日足をまとめて1回で取得する（key が同じ間は再実行・ボタン操作でも取り直さない）"""
+    return yf.download(list(tickers), period="6mo", interval="1d",
+                       progress=False, group_by='ticker', auto_adjust=True)
+
+
+@st.cache_resource
+def analysis_cache():
+    """銘柄ごとの分析結果 {session_key: {ticker: 結果 or None}} とそのロック（全セッション共有）"""
+    return {}, threading.Lock()
+
 
 # ==========================================
 # 📊 判定ロジック：MACD, RSI, 平均足
 # ==========================================
-def get_analysis(ticker, name):
+def analyze_panel(data, tickers):
+    """yf.download(group_by='ticker') の結果から、全銘柄の指標を列方向に一括計算する
+
+    銘柄ごとの dropna() と同じになるよう有効行を右揃えにしてから計算し、
+    {ticker: 結果dict（本数不足・取得失敗は None）} を返す。
+    """
+    panel, lengths = build_panel(data, tickers)
+    results = {t: None for t in tickers}
+    if not panel or len(panel["Close"]) < MIN_BARS:
+        return results
+    close, high, low = panel["Close"], panel["High"], panel["Low"]
+
+    # MACD
+    ema12 = close.ewm(span=12, adjust=False).mean()
+    ema26 = close.ewm(span=26, adjust=False).mean()
+    macd = ema12 - ema26
+    signal = macd.ewm(span=9, adjust=False).mean()
+
+    # RSI
+    delta = close.diff()
+    gain = (delta.where(delta > 0, 0)).rolling(14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(14).mean()
+    rsi = 100 - (100 / (1 + (gain / loss))).iloc[-1]
+
+    # 反転フロア予測 (ボリンジャーバンド-2σ付近を想定)
+    ma20 = close.rolling(20).mean().iloc[-1]
+    std20 = close.rolling(20).std().iloc[-1]
+    low60 = low.iloc[-60:].min()
+    high25 = high.iloc[-25:].max()
+
+    for ticker in close.columns:
+        if lengths[ticker] < MIN_BARS:
+            continue
+        try:
+            floor = max(int(ma20[ticker] - (std20[ticker] * 2)), int(low60[ticker]))
+            results[ticker] = {
+                "コード": ticker.replace(".T", ""),
+                "現在値": int(close[ticker].iloc[-1]),
+                "RSI": round(rsi[ticker], 1),
+                "MACD": "GC(上昇)" if macd[ticker].iloc[-1] > signal[ticker].iloc[-1] else "DC(下落)",
+                "フロア": floor,
+                "指値目安": int(floor * 1.01),
+                "利確目標": int(high25[ticker]),
+                "損切目安": int(floor * 0.97),
+            }
+        except (ValueError, OverflowError):
+            continue
+    return results
+
+
+def analyze_codes(tickers):
+    """銘柄リストの分析結果を返す。同じ時間帯に分析済みの銘柄は再利用し、残りだけを一括取得する"""
+    key = session_key()
+    cache, lock = analysis_cache()
+    with lock:
+        for old in [k for k in cache if k != key]:
+            del cache[old]
+        bucket = cache.setdefault(key, {})
+        missing = [t for t in tickers if t not in bucket]
+    if missing:
+        results = analyze_panel(fetch_history(tuple(missing), key), missing)
+        with lock:
+            bucket.update(results)
+    return {t: bucket.get(t) for t in tickers}
+
+
+# ==========================================
+# 🗂️ パトロールの指標スナップショット（全銘柄・ローカル）
+# ==========================================
+SCREEN_COLUMNS = {
+    "name": "銘柄名", "close": "終値", "rule": "ルール", "filter": "フィルター",
+    "rci9": "RCI9", "rci27": "RCI27", "psy12": "PSY12", "plus_di": "+DI", "minus_di": "-DI",
+    "vwap25": "VWAP25", "avg_range_7d": "7日平均値幅", "avg_vol_3m": "3ヶ月平均出来高",
+    "vol_ratio": "出来高倍率", "candle": "ローソク足", "patterns": "酒田五法パターン",
+    "rci9_w": "RCI9(週)", "rci27_w": "RCI27(週)", "psy12_w": "PSY12(週)", "plus_di_w": "+DI(週)",
+    "minus_di_w": "-DI(週)", "rci9_m": "RCI9(月)",
+}
+
+
+@st.cache_resource(show_spinner=False)
+def open_snapshot(path, mtime):
+    """スナップショットを開く（mtime が変わる＝パトロールが書き直すまで同じものを使い回す）"""
+    return Snapshot(path)
+
+
+def current_snapshot(path=SNAPSHOT_PATH):
+    """最新のスナップショット。まだパトロールが実行されていなければ None"""
     try:
-        stock = yf.Ticker(ticker)
-        # データ取得期間を少し長めに確保
-        hist = stock.history(period="6mo")
-        if len(hist) < 60: return None
-        curr_price = int(hist["Close"].iloc[-1])
-
-        # MACD
-        ema12 = hist['Close'].ewm(span=12, adjust=False).mean()
-        ema26 = hist['Close'].ewm(span=26, adjust=False).mean()
-        macd = ema12 - ema26
-        signal = macd.ewm(span=9, adjust=False).mean()
-        
-        # RSI
-        delta = hist['Close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(14).mean()
-        rsi_val = 100 - (100 / (1 + (gain / loss))).iloc[-1]
-
-        # 反転フロア予測 (ボリンジャーバンド-2σ付近を想定)
-        ma20 = hist['Close'].rolling(20).mean()
-        std20 = hist['Close'].rolling(20).std()
-        floor = max(int(ma20.iloc[-1] - (std20.iloc[-1] * 2)), int(hist['Low'].tail(60).min()))
-        
-        # MACDの状態判定
-        macd_val = macd.iloc[-1]
-        sig_val = signal.iloc[-1]
-        macd_status = "GC(上昇)" if macd_val > sig_val else "DC(下落)"
-
-        return {
-            "コード": ticker.replace(".T", ""), 
-            "銘柄名": name, 
-            "現在値": curr_price,
-            "RSI": round(rsi_val, 1), 
-            "MACD": macd_status,
-            "フロア": floor, 
-            "指値目安": int(floor * 1.01),
-            "利確目標": int(hist['High'].tail(25).max()), 
-            "損切目安": int(floor * 0.97)
-        }
-    except Exception as e:
+        mtime = os.path.getmtime(os.path.join(path, "meta.json"))
+    except OSError:
         return None
+    return open_snapshot(path, mtime)
+
+
+def screen(frame, rules=(), passed_only=False, rci9=(-100, 100), rci27=(-100, 100), psy=(0, 100),
+           min_price=0, sort_by="rci9", ascending=True):
+    """スナップショットの DataFrame を条件で絞り込み、並べ替えて返す（指標が NaN の銘柄は範囲条件で落ちる）"""
+    mask = frame["close"] >= min_price
+    mask &= frame["rci9"].between(*rci9) & frame["rci27"].between(*rci27) & frame["psy12"].between(*psy)
+    if rules:
+        mask &= frame["rule"].isin(rules)
+    if passed_only:
+        mask &= frame["filter"] == ""
+    return frame[mask].sort_values(sort_by, ascending=ascending)
+
+
+def parse_codes(text):
+    """「6701, 9984」「6701 9984」「６７０１、９９８４」などを [ティッカー] に変換する（重複は除く）"""
+    codes = [c for c in re.split(r"[\s,、，]+", unicodedata.normalize("NFKC", text)) if c]
+    tickers = [c + ".T" if ".T" not in c and c.isdigit() else c for c in codes]
+    return list(dict.fromkeys(tickers))
 
 # ==========================================
 # 📨 Discord送信機能 (新規追加！)
 # ==========================================
+@st.cache_resource
+def get_webhook():
+    """再実行のたびに接続を張り直さないよう、Webhookクライアントをセッション間で使い回す"""
+    return DiscordWebhook(DISCORD_WEBHOOK_URL)
+
+
 def send_to_discord(data):
     if not DISCORD_WEBHOOK_URL.startswith("http"):
         st.error("⚠️ Webhook URLが設定されていません。コード内の `DISCORD_WEBHOOK_URL` を書き換えてください。")
@@ -84,14 +198,11 @@ def send_to_discord(data):
         ]
     }
     
-    try:
-        response = requests.post(DISCORD_WEBHOOK_URL, json=payload)
-        if response.status_code == 204:
-            st.toast("✅ Discordに通知を送信しました！", icon="🦅")
-        else:
-            st.error(f"送信失敗: {response.status_code}")
-    except Exception as e:
-        st.error(f"エラーが発生しました: {e}")
+    webhook = get_webhook()
+    if webhook.post(payload):
+        st.toast("✅ Discordに通知を送信しました！", icon="🦅")
+    else:
+        st.error(f"送信失敗: {webhook.last_error}")
 
 # ==========================================
 # 🦅 画面表示
@@ -102,37 +213,101 @@ st.title("🦅 最強株スキャナー (Discord連携版)")
 # 翻訳エラー回避
 st.markdown('<meta name="google" content="notranslate">', unsafe_allow_html=True)
 
-code_in = st.text_input("銘柄コードを入力 (例: 6701, 9984)", "").strip()
+snap = current_snapshot()
+tab_analysis, tab_screener = st.tabs(["🔎 銘柄分析", "📋 スクリーナー"])
 
-if code_in:
-    # 全角数字などを半角に変換したり、.Tをつける処理
-    ticker_clean = code_in.replace(" ", "").replace("　", "")
-    full_c = ticker_clean + ".T" if ".T" not in ticker_clean and ticker_clean.isdigit() else ticker_clean
-    
-    with st.spinner('市場データを分析中...'):
-        res = get_analysis(full_c, ticker_clean)
-
-    if res:
-        # --- メイン情報の表示 ---
-        c1, c2, c3 = st.columns(3)
-        with c1:
-            st.metric("現在値", f"{res['現在値']}円")
-            st.info(f"🛡️ 反転予想フロア: {res['フロア']}円")
-        with c2:
-            st.success(f"⚡ 指値目安: {res['指値目安']}円")
-            st.write(f"🎯 利確: {res['利確目標']}円 / 🛑 損切: {res['損切目安']}円")
-        with c3:
-            # RSIの色分け
-            rsi_color = "red" if res['RSI'] < 30 else ("blue" if res['RSI'] > 70 else "black")
-            st.markdown(f"MACD状態: **{res['MACD']}**")
-            st.markdown(f"RSI(14): <span style='color:{rsi_color}; font-weight:bold;'>{res['RSI']}</span>", unsafe_allow_html=True)
-
-        st.divider()
-
-        # --- 👇 ここが追加機能：通知ボタン ---
-        col_btn, col_void = st.columns([1, 4])
-        with col_btn:
-            if st.button('🦅 Discordに通知を送る'):
-                send_to_discord(res)
+with tab_analysis:
+    code_in = st.text_input("銘柄コードを入力 (例: 6701, 9984)", "").strip()
+
+    if code_in:
+        tickers = parse_codes(code_in)
+
+        with st.spinner('市場データを分析中...'):
+            analyses = analyze_codes(tickers)
+        patrol = {t: snap.lookup(t) for t in tickers} if snap is not None else {}
+        found = {t: dict(r, 銘柄名=(patrol.get(t) or {}).get("name") or t.replace(".T", ""))
+                 for t, r in analyses.items() if r}
+        failed = [t.replace(".T", "") for t, r in analyses.items() if not r]
+
+        if failed:
+            st.warning(f"データが取得できなかった銘柄: {', '.join(failed)}")
+
+        if len(found) > 1:
+            # --- 複数銘柄：並べ替えできる一覧表 ---
+            table = pd.DataFrame(found.values()).set_index("コード").drop(columns="銘柄名")
+            st.dataframe(table, use_container_width=True)
+            pick = st.selectbox("詳細を表示する銘柄", list(found), format_func=lambda t: t.replace(".T", ""))
+        else:
+            pick = next(iter(found), None)
+        res = found.get(pick)
+
+        if res:
+            # --- メイン情報の表示 ---
+            c1, c2, c3 = st.columns(3)
+            with c1:
+                st.metric("現在値", f"{res['現在値']}円")
+                st.info(f"🛡️ 反転予想フロア: {res['フロア']}円")
+            with c2:
+                st.success(f"⚡ 指値目安: {res['指値目安']}円")
+                st.write(f"🎯 利確: {res['利確目標']}円 / 🛑 損切: {res['損切目安']}円")
+            with c3:
+                # RSIの色分け
+                rsi_color = "red" if res['RSI'] < 30 else ("blue" if res['RSI'] > 70 else "black")
+                st.markdown(f"MACD状態: **{res['MACD']}**")
+                st.markdown(f"RSI(14): <span style='color:{rsi_color}; font-weight:bold;'>{res['RSI']}</span>", unsafe_allow_html=True)
+
+            # --- パトロール時点の指標（スナップショットにある銘柄のみ） ---
+            row = patrol.get(pick)
+            if row:
+                st.caption(f"🗂️ パトロール時点の指標（{snap.meta['created_at']}）")
+                p1, p2, p3, p4, p5 = st.columns(5)
+                p1.metric("RCI9", f"{row['rci9']:.1f}")
+                p2.metric("RCI27", f"{row['rci27']:.1f}")
+                p3.metric("PSY12", f"{row['psy12']:.1f}")
+                p4.metric("+DI / -DI", f"{row['plus_di']:.1f} / {row['minus_di']:.1f}")
+                p5.metric("VWAP25", f"{row['vwap25']:,.0f}")
+                rule = f"ルール{row['rule']}" if row["rule"] else "該当なし"
+                verdict = f"除外（{FILTER_STEPS[row['filter']]}）" if row["filter"] else "通過"
+                st.write(f"判定: {rule} / フィルター: {verdict} / ローソク足: {row['candle'] or '-'}"
+                         f" / 酒田五法パターン: {row.get('patterns') or '-'}")
+                if row.get("rci9_w") is not None:
+                    # 古いスナップショットには週足・月足の列が無い
+                    st.write(f"週足 RCI9 / RCI27 / PSY12: {row['rci9_w']:.1f} / {row['rci27_w']:.1f} / {row['psy12_w']:.1f}"
+                             f" / 月足 RCI9: {row['rci9_m']:.1f}")
+
+            st.divider()
+
+            # --- 👇 ここが追加機能：通知ボタン ---
+            col_btn, col_void = st.columns([1, 4])
+            with col_btn:
+                if st.button('🦅 Discordに通知を送る'):
+                    send_to_discord(res)
+        else:
+            st.error("データが取得できませんでした。コードを確認してください。")
+
+with tab_screener:
+    if snap is None:
+        st.info("指標スナップショットがありません。先に python monitor_stocks.py --snapshot でパトロールを実行してください。")
     else:
-        st.error("データが取得できませんでした。コードを確認してください。")
+        st.caption(f"🗂️ {snap.meta['created_at']} のパトロール結果（{len(snap)} 銘柄）をローカルで絞り込みます")
+        # 古いスナップショットに無い列（後から追加した列）は表示しない
+        columns = [c for c in SCREEN_COLUMNS if c in snap.columns]
+        f1, f2, f3 = st.columns(3)
+        with f1:
+            rules = st.multiselect("ルール", ["A", "B", "C"])
+            passed_only = st.checkbox("価格・出来高フィルター通過のみ", value=True)
+            min_price = st.number_input("最低株価(円)", min_value=0, value=0, step=500)
+        with f2:
+            rci9_range = st.slider("RCI9", -100, 100, (-100, 100))
+            rci27_range = st.slider("RCI27", -100, 100, (-100, 100))
+            psy_range = st.slider("PSY12", 0, 100, (0, 100))
+        with f3:
+            sort_by = st.selectbox("並べ替え", columns[1:], format_func=SCREEN_COLUMNS.get)
+            ascending = st.checkbox("昇順", value=True)
+
+        hits = screen(snap.frame(columns), rules, passed_only, rci9_range, rci27_range,
+                      psy_range, min_price, sort_by, ascending)
+        hits = hits.assign(filter=hits["filter"].map(lambda step: FILTER_STEPS.get(step, "通過")))
+        hits.index = hits.index.str.replace(".T", "", regex=False)
+        st.write(f"該当: {len(hits)} 銘柄")
+        st.dataframe(hits.rename(columns=SCREEN_COLUMNS), use_container_width=True)
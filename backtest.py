@@ -0,0 +1,158 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from monitor_stocks import (MIN_BARS, RULE_LABELS, calculate_dmi, calculate_psy, calculate_rci,
+                            candle_flags, rule_flags)
+from ohlcv_store import FIELDS, STORE_PATH, OHLCVStore
+
+# ==============================================================================
+# --- 設定項目 ---
+# ==============================================================================
+HORIZONS = (1, 5, 10, 20)           # 何営業日後のリターンを評価するか
+RULE_DIRECTION = {"A": 1, "B": 1, "C": -1}  # C は下落警戒なので「下がれば的中」
+
+
+# ==============================================================================
+# --- データ読み込み（ローカルストアのみ・ネットワーク不要） ---
+# ==============================================================================
+def load_panel(store_path=STORE_PATH, tickers=None, start=None):
+    """OHLCVストアから 項目→(日付×銘柄) の行列を読み込む"""
+    store = OHLCVStore(store_path, fetcher=None)
+    try:
+        data = store.load(tickers or store.tickers(), start=start)
+    finally:
+        store.close()
+    return {f: data.xs(f, axis=1, level=1) for f in FIELDS}
+
+
+# ==============================================================================
+# --- 全期間のシグナル計算 ---
+# ==============================================================================
+def _rolling(a, n, func):
+    """(日付×銘柄) 配列の時間方向の移動集計（pandas の列ごとループを避ける）。窓が揃わない先頭は NaN"""
+    out = np.full(a.shape, np.nan)
+    if len(a) >= n:
+        out[n-1:] = func(np.lib.stride_tricks.sliding_window_view(a, n, axis=0), axis=-1)
+    return out
+
+
+def signal_history(panel, volume_ratio=2.0):
+    """全銘柄・全営業日について、パトロールと同じ条件でルールA/B/Cが点灯したかを返す
+
+    戻り値は {"A": 日付×銘柄のbool DataFrame, ..., "bull": 陽転足, "bear": 陰転足}。
+    パトロールと同じく A→B→C の優先順位で1銘柄1日1ルールに割り当てる。
+    """
+    o, h, l, c, v = (panel[f] for f in FIELDS)
+    hv, lv, cv, vv = (x.to_numpy(dtype=float) for x in (h, l, c, v))
+    valid = ~(np.isnan(cv) | np.isnan(hv) | np.isnan(lv) | np.isnan(vv))
+
+    # 出来高トリプルフィルター等は NaN を含む窓では不成立とする（比較は成立側で書く）
+    avg_vol_3m = _rolling(vv, 60, np.mean)
+    with np.errstate(invalid="ignore"):
+        passed = (
+            (valid.cumsum(axis=0) >= MIN_BARS)
+            & (cv > 3000)
+            & (_rolling(hv - lv, 7, np.mean) >= 300.0)
+            & (avg_vol_3m >= 500000)
+            & (vv >= avg_vol_3m * volume_ratio)
+            & (_rolling(vv, 5, np.mean) >= avg_vol_3m * 1.2)
+        )
+
+    rci9 = calculate_rci(c, 9).to_numpy()
+    rci27 = calculate_rci(c, 27).to_numpy()
+    psy12 = calculate_psy(c, 12).to_numpy()
+    plus_di, minus_di, _ = calculate_dmi(h, l, c, di_period=14, adx_period=9)
+    rule_a, rule_b, rule_c = rule_flags(rci9, rci27, psy12, plus_di.to_numpy(), minus_di.to_numpy())
+    passed &= np.isfinite(rci9) & np.isfinite(rci27)
+
+    is_bull, is_bear, _ = candle_flags(o, h, l, c)
+    sig_a = passed & rule_a
+    sig_b = passed & rule_b & ~rule_a
+    sig_c = passed & rule_c & ~rule_a & ~rule_b
+
+    frame = lambda a: pd.DataFrame(a, index=c.index, columns=c.columns)
+    return {"A": frame(sig_a), "B": frame(sig_b), "C": frame(sig_c),
+            "bull": frame(is_bull), "bear": frame(is_bear)}
+
+
+# ==============================================================================
+# --- 成績集計 ---
+# ==============================================================================
+def _summarize(signal, ret, drawdown):
+    mask = signal & np.isfinite(ret)
+    r, dd = ret[mask], drawdown[mask]
+    if not len(r):
+        return {"signals": 0, "hit_rate": np.nan, "mean_return": np.nan, "median_return": np.nan,
+                "mean_drawdown": np.nan, "worst_drawdown": np.nan}
+    return {
+        "signals": int(len(r)),
+        "hit_rate": float((r > 0).mean()),
+        "mean_return": float(r.mean()),
+        "median_return": float(np.median(r)),
+        "mean_drawdown": float(np.nanmean(dd)),
+        "worst_drawdown": float(np.nanmin(dd)),
+    }
+
+
+def backtest(panel, horizons=HORIZONS, volume_ratio=2.0):
+    """ルールごと・保有日数ごとの的中率、平均リターン、最大逆行幅を集計する
+
+    エントリーはシグナル点灯日の終値。リターンと逆行幅はルールの方向（C は売り）で符号を揃える。
+    酒田五法が一致したシグナルだけの成績も「A+酒田」「C+酒田」として併記する。
+    """
+    signals = signal_history(panel, volume_ratio=volume_ratio)
+    close, high, low = (panel[f].to_numpy(dtype=float) for f in ("Close", "High", "Low"))
+
+    subsets = {
+        "A": signals["A"].to_numpy(),
+        "A+酒田": (signals["A"] & signals["bull"]).to_numpy(),
+        "B": signals["B"].to_numpy(),
+        "C": signals["C"].to_numpy(),
+        "C+酒田": (signals["C"] & signals["bear"]).to_numpy(),
+    }
+
+    rows = []
+    for n in horizons:
+        fwd, future_low, future_high = (np.full(close.shape, np.nan) for _ in range(3))
+        fwd[:-n] = close[n:] / close[:-n] - 1
+        # 翌日から n 日後までの安値・高値（逆行幅の計算用）
+        future_low[:-n] = _rolling(low, n, np.min)[n:] / close[:-n] - 1
+        future_high[:-n] = _rolling(high, n, np.max)[n:] / close[:-n] - 1
+        for name, signal in subsets.items():
+            direction = RULE_DIRECTION[name[0]]
+            ret = fwd * direction
+            drawdown = future_low if direction > 0 else -future_high
+            rows.append({"rule": name, "horizon": n, **_summarize(signal, ret, drawdown)})
+    return pd.DataFrame(rows).set_index(["rule", "horizon"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ルールA/B/Cの過去検証（ローカルOHLCVストアを使用）")
+    parser.add_argument("--store", default=STORE_PATH, help="OHLCVストアのパス")
+    parser.add_argument("--start", default=None, help="検証開始日 (YYYY-MM-DD)")
+    parser.add_argument("--horizons", type=int, nargs="+", default=list(HORIZONS), help="保有日数")
+    parser.add_argument("--midday", action="store_true", help="中間巡回の出来高倍率(0.6倍)で検証")
+    parser.add_argument("--json", default=None, help="結果をJSONで保存するパス")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    panel = load_panel(args.store, start=args.start)
+    loaded = time.perf_counter()
+    result = backtest(panel, horizons=args.horizons, volume_ratio=0.6 if args.midday else 2.0)
+    finished = time.perf_counter()
+
+    print(f"対象: {panel['Close'].shape[1]} 銘柄 × {panel['Close'].shape[0]} 営業日 "
+          f"(読込 {loaded - started:.1f}秒 / 計算 {finished - loaded:.1f}秒)")
+    for key, label in RULE_LABELS.items():
+        print(f"{key}: {label}")
+    with pd.option_context("display.width", 200, "display.max_columns", None, "display.float_format", "{:.4f}".format):
+        print(result)
+    if args.json:
+        result.reset_index().to_json(args.json, orient="records", force_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,508 @@
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from datetime import datetime
+from functools import partial
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import intraday as intraday_module
+import monitor
+import monitor_stocks
+from alert_store import AlertStore
+from candlestick import candle_flags, candle_patterns, pattern_codes
+from downloader import ChunkDownloader
+from ohlcv_panel import OHLCVPanel
+from snapshot import Snapshot
+
+# ==============================================================================
+# --- 設定項目 ---
+# ==============================================================================
+DEFAULT_TICKERS = 4000
+DEFAULT_DAYS = 750      # 約3年分の営業日
+DEFAULT_REPEAT = 3
+OUTPUT_PATH = "benchmark_results.json"
+FIELDS = ("Open", "High", "Low", "Close", "Volume")
+
+
+# ==============================================================================
+# --- 合成OHLCVデータ生成（シード固定で毎回同じデータ） ---
+# ==============================================================================
+def synthetic_ohlcv(n_tickers=DEFAULT_TICKERS, n_days=DEFAULT_DAYS, seed=0, end=None, freq="B"):
+    """幾何ランダムウォークで 項目→(日付×銘柄) の行列を一括生成する
+
+    株価は1,000〜10,000円、出来高は10万〜300万株の範囲に散らし、直近には出来高急増も混ぜて
+    パトロールのフィルターを一部の銘柄が通過するようにしてある。
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(end=end or "2026-01-30", periods=n_days, freq=freq)
+    tickers = [f"{1000 + i}.T" for i in range(n_tickers)]
+
+    base = np.exp(rng.uniform(np.log(1000), np.log(10000), n_tickers))
+    vol = rng.uniform(0.01, 0.04, n_tickers)
+    close = base * np.exp((rng.standard_normal((n_days, n_tickers)) * vol).cumsum(axis=0))
+    close = np.round(close)
+    open_ = np.round(close * (1 + rng.standard_normal((n_days, n_tickers)) * vol / 2))
+    wick = np.abs(rng.standard_normal((2, n_days, n_tickers))) * vol * close / 2
+    high = np.maximum(open_, close) + np.round(wick[0])
+    low = np.minimum(open_, close) - np.round(wick[1])
+
+    volume = np.exp(rng.uniform(np.log(1e5), np.log(3e6), n_tickers)) * rng.lognormal(0, 0.3, (n_days, n_tickers))
+    volume[-5:] *= rng.uniform(1.0, 3.5, n_tickers)
+    volume = np.round(volume)
+
+    return {f: pd.DataFrame(a, index=index, columns=tickers)
+            for f, a in zip(FIELDS, (open_, high, low, close, volume))}
+
+
+def to_yf_frame(panel, tickers=None):
+    """項目→行列の辞書を yf.download(group_by='ticker') と同じ (ticker, 項目) 列のフレームにする"""
+    tickers = list(tickers) if tickers is not None else list(panel["Close"].columns)
+    frame = pd.concat({f: panel[f].loc[:, tickers] for f in FIELDS}, axis=1)
+    return frame.swaplevel(axis=1).reindex(columns=pd.MultiIndex.from_product([tickers, FIELDS]))
+
+
+# ==============================================================================
+# --- yfinance / Discord の差し替え用フェイク ---
+# ==============================================================================
+_PERIOD_BARS = {"y": 245, "mo": 21, "d": 1}
+
+
+def _period_bars(period):
+    for unit, bars in _PERIOD_BARS.items():
+        if period.endswith(unit):
+            return int(period[:-len(unit)]) * bars
+    raise ValueError(f"未対応の期間指定です: {period}")
+
+
+class FakeYFinance:
+    """yf.download / yf.Ticker(...).history の代わりに合成データを返すフェイク
+
+    daily は日足、intraday は1分足の 項目→行列 辞書。latency 秒だけ通信待ちを模擬できる。
+    until を時刻で指定すると、それより後のバーはまだ存在しないものとして返さない（場中の再現用）。
+    わざと失敗させる設定:
+    - fail_tickers: これを1つでも含む download は例外になる（1銘柄の不具合でチャンク全体が取れない状況）
+    - crash_after: この回数を超えた download で KeyboardInterrupt を送出する（巡回の途中停止）
+    """
+
+    def __init__(self, daily=None, intraday=None, latency=0.0, until=None, fail_tickers=(), crash_after=None):
+        self.daily = daily
+        self.intraday = intraday
+        self.latency = latency
+        self.until = until
+        self.fail_tickers = set(fail_tickers)
+        self.crash_after = crash_after
+        self.calls = 0
+        self.failures = 0
+
+    def _slice(self, panel, period=None, start=None, intraday=False):
+        if self.until is not None:
+            panel = {f: df[df.index <= pd.Timestamp(self.until)] for f, df in panel.items()}
+        if start is not None:
+            return {f: df[df.index >= pd.Timestamp(start)] for f, df in panel.items()}
+        if period is not None and intraday:
+            # 1分足の "Nd" は直近N営業日分
+            dates = panel["Close"].index.normalize()
+            first = dates.unique()[-_period_bars(period)]
+            return {f: df[dates >= first] for f, df in panel.items()}
+        if period is not None:
+            n = _period_bars(period)
+            return {f: df.iloc[-n:] for f, df in panel.items()}
+        return panel
+
+    def download(self, tickers, period=None, start=None, interval="1d", **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if isinstance(tickers, str):
+            tickers = tickers.split()
+        if self.crash_after is not None and self.calls > self.crash_after:
+            raise KeyboardInterrupt("fake crash")
+        if self.fail_tickers.intersection(tickers):
+            self.failures += 1
+            raise ConnectionError("fake download failure")
+        source = self.daily if interval == "1d" else self.intraday
+        panel = self._slice(source, period=period, start=start, intraday=interval != "1d")
+        present = [t for t in tickers if t in panel["Close"].columns]
+        return to_yf_frame(panel, present)
+
+    def Ticker(self, ticker):
+        fake = self
+
+        class _Ticker:
+            def history(self, period="1mo", interval="1d", **kwargs):
+                fake.calls += 1
+                if fake.latency:
+                    time.sleep(fake.latency)
+                source = fake.daily if interval == "1d" else fake.intraday
+                if ticker not in source["Close"].columns:
+                    return pd.DataFrame(columns=list(FIELDS))
+                panel = fake._slice(source, period=period, intraday=interval != "1d")
+                return pd.DataFrame({f: panel[f][ticker] for f in FIELDS})
+
+        return _Ticker()
+
+
+class FakeDiscord:
+    """Webhook の Session.post の代わりに送信内容を記録し、Discord と同じく 204 を返すフェイク"""
+
+    def __init__(self):
+        self.posts = []
+
+    def post(self, url, json=None, **kwargs):
+        self.posts.append(json)
+        return SimpleNamespace(status_code=204, headers={}, text="")
+
+
+# ==============================================================================
+# --- 計測ユーティリティ ---
+# ==============================================================================
+def timeit(func, repeat=DEFAULT_REPEAT):
+    """func を repeat 回実行し、最小・平均・各回の秒数を返す"""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return {"min": min(times), "mean": sum(times) / len(times), "runs": times}
+
+
+def traced_mb(func):
+    """func の実行中に確保されたメモリのピークと、終了時点で残っている量を MB で返す（tracemalloc）"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, current / 2**20, peak / 2**20
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ==============================================================================
+# --- ベンチマーク本体 ---
+# ==============================================================================
+def bench_indicators(panel, repeat):
+    """指標関数を 1銘柄(Series) と 全銘柄(DataFrame) の両方で計測する"""
+    close, high, low = panel["Close"], panel["High"], panel["Low"]
+    first = close.columns[0]
+    results = {}
+    for period in (9, 27):
+        results[f"calculate_rci[{period},series]"] = timeit(lambda: monitor_stocks.calculate_rci(close[first], period), repeat)
+        results[f"calculate_rci[{period},panel]"] = timeit(lambda: monitor_stocks.calculate_rci(close, period), repeat)
+    results["calculate_psy[series]"] = timeit(lambda: monitor_stocks.calculate_psy(close[first], 12), repeat)
+    results["calculate_psy[panel]"] = timeit(lambda: monitor_stocks.calculate_psy(close, 12), repeat)
+    results["calculate_dmi[series]"] = timeit(
+        lambda: monitor_stocks.calculate_dmi(high[first], low[first], close[first]), repeat)
+    results["calculate_dmi[panel]"] = timeit(lambda: monitor_stocks.calculate_dmi(high, low, close), repeat)
+    return results
+
+
+def bench_candles(panel, repeat):
+    """ローソク足判定を、全銘柄・全期間の配列一括版で計測する（最終足だけの判定と比べて）"""
+    ohlc = [panel[f].to_numpy() for f in ("Open", "High", "Low", "Close")]
+    return {
+        "candle_flags[last_bar,all_tickers]": timeit(lambda: candle_flags(*(a[-2:] for a in ohlc)), repeat),
+        "candle_flags[panel]": timeit(lambda: candle_flags(*ohlc), repeat),
+        "candle_patterns[panel]": timeit(lambda: candle_patterns(*ohlc), repeat),
+        "pattern_codes[panel]": timeit(lambda: pattern_codes(candle_patterns(*ohlc)), repeat),
+    }
+
+
+def bench_main_scan(panel, repeat, scan_mode, workers=1):
+    """monitor_stocks.main() を合成データ・フェイク通信で丸ごと実行して計測する"""
+    fake_yf = FakeYFinance(daily=panel)
+    discord = FakeDiscord()
+    ticker_map = {t: f"銘柄{t[:-2]}" for t in panel["Close"].columns}
+
+    def run():
+        with ExitStack() as stack:
+            workdir = stack.enter_context(tempfile.TemporaryDirectory())
+            stack.enter_context(mock.patch.object(monitor_stocks, "yf", fake_yf))
+            stack.enter_context(mock.patch.object(monitor_stocks.webhook, "session", discord))
+            stack.enter_context(mock.patch.object(monitor_stocks, "get_ticker_list", lambda: ticker_map))
+            stack.enter_context(mock.patch.object(monitor_stocks, "ChunkDownloader", partial(ChunkDownloader, rate=None)))
+            stack.enter_context(mock.patch.object(monitor_stocks, "USE_LOCAL_STORE", False))
+            stack.enter_context(mock.patch.object(monitor_stocks, "USE_ALERT_STORE", False))
+            stack.enter_context(mock.patch.object(monitor_stocks, "SCAN_MODE", scan_mode))
+            stack.enter_context(mock.patch.object(monitor_stocks, "CHECKPOINT_PATH", os.path.join(workdir, "checkpoint.sqlite")))
+            stack.enter_context(mock.patch("builtins.print", lambda *a, **k: None))
+            monitor_stocks.main(report_path=None, snapshot_path=os.path.join(workdir, "snapshot"), workers=workers)
+
+    result = timeit(run, repeat)
+    result["download_calls"] = fake_yf.calls
+    result["discord_posts"] = len(discord.posts)
+    return {f"monitor_stocks.main[{scan_mode},workers={workers}]": result}
+
+
+def bench_memory(panel):
+    """全銘柄1年分の日足を判定できる形で持つときのメモリ量を、持ち方ごとに比べる（MB）
+
+    multiindex: yf.download 形式のフレームと、そこから作る float64 の右揃え行列（build_panel）
+    ohlcv_panel: OHLCVPanel へ変換してフレームを捨て、判定時は末尾 MIN_BARS 本だけを float64 に展開
+    peak_mb は変換中の一時配列を含むピーク（どちらも変換元のフレームが残っている間の値）。
+    """
+    tickers = list(panel["Close"].columns)
+    frame = to_yf_frame(panel)
+    frame_mb = frame.memory_usage().sum() / 2**20
+
+    matrices, current, peak = traced_mb(lambda: monitor_stocks.build_panel(frame, tickers))
+    results = {f"memory[multiindex,{len(tickers)}x{len(frame)}]": {
+        "retained_mb": frame_mb + current, "peak_mb": frame_mb + peak}}
+    del matrices
+
+    compact, current, peak = traced_mb(lambda: OHLCVPanel.from_frame(frame, tickers))
+    tail, tail_mb, _ = traced_mb(lambda: compact.tail(monitor_stocks.MIN_BARS))
+    results[f"memory[ohlcv_panel,{len(tickers)}x{len(frame)}]"] = {
+        "retained_mb": current + tail_mb, "peak_mb": frame_mb + peak}
+    del tail
+
+    # 1銘柄の切り出しがコピーなしのビューになっているか
+    bars = compact.bars(tickers[0])
+    results["memory[ticker_slice]"] = {
+        "zero_copy": bool(np.shares_memory(bars["Close"], compact.prices) and np.shares_memory(bars["Volume"], compact.volume)),
+    }
+    return results
+
+
+def bench_monitor_cycle(n_watch, repeat, seed=0):
+    """monitor.py の1分ごとの1巡（監視リスト全銘柄の取得と判定）を計測する
+
+    first は起動直後（当日分を一括取得）、incremental は場中の定常状態（毎巡1分ずつ時計を進め、
+    前回以降のバーだけを取得）の1巡。
+    """
+    intraday = synthetic_ohlcv(n_tickers=n_watch, n_days=300, seed=seed, end="2026-01-30 14:59", freq="min")
+    fake_yf = FakeYFinance(intraday=intraday)
+    discord = FakeDiscord()
+    tickers = list(intraday["Close"].columns)
+    minutes = intraday["Close"].index
+    alerts = AlertStore(":memory:")
+
+    def run(step=None):
+        alerts.clear()
+        if step is None:
+            monitor.bars.clear()
+            fake_yf.until = minutes[-1]
+        else:
+            fake_yf.until = next(step)
+        with ExitStack() as stack:
+            stack.enter_context(mock.patch.object(intraday_module, "yf", fake_yf))
+            stack.enter_context(mock.patch("builtins.print", lambda *a, **k: None))
+            monitor.run_cycle(tickers, alerts)
+
+    # 通知は巡回の後に送信スレッドが送るので、送り終わるまでフェイクの Discord に向けておく
+    with mock.patch.object(monitor.notifier.webhook, "session", discord):
+        results = {f"monitor.run_cycle[{n_watch},first]": timeit(run, repeat)}
+        step = iter(minutes[-repeat:])
+        monitor.bars.clear()
+        fake_yf.until = minutes[-repeat - 1]
+        run(iter([minutes[-repeat - 1]]))
+        results[f"monitor.run_cycle[{n_watch},incremental]"] = timeit(lambda: run(step), repeat)
+        monitor.notifier.flush()
+    return results
+
+
+def _patch_patrol(stack, fake_yf, discord, ticker_map, scan_mode, workdir):
+    """monitor_stocks の通信・銘柄リスト・保存先をフェイクと作業ディレクトリに差し替える（取得の再試行なし）"""
+    stack.enter_context(mock.patch.object(monitor_stocks, "yf", fake_yf))
+    stack.enter_context(mock.patch.object(monitor_stocks.webhook, "session", discord))
+    stack.enter_context(mock.patch.object(monitor_stocks, "get_ticker_list", lambda: ticker_map))
+    stack.enter_context(mock.patch.object(monitor_stocks, "ChunkDownloader", partial(ChunkDownloader, rate=None, retries=0)))
+    stack.enter_context(mock.patch.object(monitor_stocks, "USE_LOCAL_STORE", False))
+    stack.enter_context(mock.patch.object(monitor_stocks, "USE_ALERT_STORE", False))
+    stack.enter_context(mock.patch.object(monitor_stocks, "SCAN_MODE", scan_mode))
+    stack.enter_context(mock.patch.object(monitor_stocks, "CHECKPOINT_PATH", os.path.join(workdir, "checkpoint.sqlite")))
+    stack.enter_context(mock.patch.object(monitor_stocks, "RULE_STATS_PATH", os.path.join(workdir, "rule_stats.json")))
+    stack.enter_context(mock.patch("builtins.print", lambda *a, **k: None))
+
+
+def _patrol_output(discord, snapshot_dir):
+    """フェイクの Discord に届いた本文（実行日時の行を除く）と、スナップショットの DataFrame（無ければ None）"""
+    body = "".join(post["content"] for post in discord.posts)
+    # 銘柄ごとループ方式はスナップショットを書かない
+    snap = Snapshot(snapshot_dir).frame() if os.path.exists(os.path.join(snapshot_dir, "meta.json")) else None
+    return [line for line in body.splitlines() if "実行日時" not in line], snap
+
+
+def _same_snapshot(a, b):
+    return a is None and b is None or a is not None and b is not None and a.equals(b)
+
+
+def bench_resume(panel, scan_mode, workers=1, crash_after=None):
+    """取得エラーの取り直しと途中再開を、わざと失敗するフェイクで通して確かめる
+
+    数銘柄を「含むとチャンクごと取得に失敗する」銘柄にし、(1) 止まらずに最後まで実行した場合と、
+    (2) crash_after 回目の取得の後で中断し、同じ途中経過ファイルで再実行した場合の
+    通知本文（実行日時の行を除く）とスナップショットが一致するかを返す。
+    """
+    tickers = list(panel["Close"].columns)
+    poison = tickers[len(tickers) // 7::len(tickers) // 4 or 1]
+    ticker_map = {t: f"銘柄{t[:-2]}" for t in tickers}
+    crash_after = crash_after or max(2, len(tickers) // 200)
+
+    def run(workdir, fake_yf):
+        discord = FakeDiscord()
+        with ExitStack() as stack:
+            _patch_patrol(stack, fake_yf, discord, ticker_map, scan_mode, workdir)
+            monitor_stocks.main(report_path=None, snapshot_path=os.path.join(workdir, "snapshot"), workers=workers)
+        return _patrol_output(discord, os.path.join(workdir, "snapshot"))
+
+    with tempfile.TemporaryDirectory() as full_dir, tempfile.TemporaryDirectory() as resumed_dir:
+        fake_yf = FakeYFinance(daily=panel, fail_tickers=poison)
+        started = time.perf_counter()
+        full_msg, full_snap = run(full_dir, fake_yf)
+        full_sec = time.perf_counter() - started
+        full_calls = fake_yf.calls
+        retried = monitor_stocks.metrics.counters["retried_tickers"]
+        failed = monitor_stocks.metrics.counters["failed_tickers"]
+
+        crashed = False
+        try:
+            run(resumed_dir, FakeYFinance(daily=panel, fail_tickers=poison, crash_after=crash_after))
+        except KeyboardInterrupt:
+            crashed = True
+        fake_yf = FakeYFinance(daily=panel, fail_tickers=poison)
+        started = time.perf_counter()
+        resumed_msg, resumed_snap = run(resumed_dir, fake_yf)
+        resumed_sec = time.perf_counter() - started
+
+    return {f"resume[{scan_mode},workers={workers}]": {
+        "crashed": crashed,
+        "identical_message": full_msg == resumed_msg,
+        "identical_snapshot": _same_snapshot(full_snap, resumed_snap),
+        "retried_tickers": retried,
+        "failed_tickers": failed,
+        "full_sec": full_sec,
+        "resumed_sec": resumed_sec,
+        "full_download_calls": full_calls,
+        "resumed_download_calls": fake_yf.calls,
+    }}
+
+
+def _run_shard(workdir, shard):
+    monitor_stocks.main(report_path=None, snapshot_path=os.path.join(workdir, "snapshot"), workers=1, shard=shard,
+                        shard_dir=os.path.join(workdir, "shards"))
+
+
+def bench_shards(panel, scan_mode, shards=4):
+    """銘柄リストを shards 分割して別々のプロセスで同時に判定し、merge_shards でまとめた結果を確かめる
+
+    分割しない実行（workers=1）と比べて、通知本文（実行日時の行を除く）とスナップショットが一致するか、
+    部分結果ファイルの大きさ、分割巡回全体（最も遅い分割 + まとめ）の実時間を返す。
+    分割巡回のプロセスは fork で作るので、フェイクへの差し替えもそのまま引き継がれる。
+    """
+    ticker_map = {t: f"銘柄{t[:-2]}" for t in panel["Close"].columns}
+    with ExitStack() as stack:
+        single_dir = stack.enter_context(tempfile.TemporaryDirectory())
+        sharded_dir = stack.enter_context(tempfile.TemporaryDirectory())
+        discord = FakeDiscord()
+        _patch_patrol(stack, FakeYFinance(daily=panel), discord, ticker_map, scan_mode, single_dir)
+
+        started = time.perf_counter()
+        monitor_stocks.main(report_path=None, snapshot_path=os.path.join(single_dir, "snapshot"), workers=1)
+        single_sec = time.perf_counter() - started
+        single_msg, single_snap = _patrol_output(discord, os.path.join(single_dir, "snapshot"))
+
+        discord.posts.clear()
+        stack.enter_context(mock.patch.object(monitor_stocks, "CHECKPOINT_PATH",
+                                              os.path.join(sharded_dir, "checkpoint.sqlite")))
+        started = time.perf_counter()
+        with ProcessPoolExecutor(shards, mp_context=multiprocessing.get_context("fork")) as executor:
+            list(executor.map(partial(_run_shard, sharded_dir), [(i, shards) for i in range(1, shards + 1)]))
+        partial_bytes = [os.path.getsize(os.path.join(sharded_dir, "shards", f"shard-{i}-of-{shards}.json"))
+                         for i in range(1, shards + 1)]
+        monitor_stocks.merge_shards(os.path.join(sharded_dir, "shards"), os.path.join(sharded_dir, "snapshot"),
+                                    report_path=None)
+        sharded_sec = time.perf_counter() - started
+        sharded_msg, sharded_snap = _patrol_output(discord, os.path.join(sharded_dir, "snapshot"))
+
+    return {f"shards[{scan_mode},{shards}]": {
+        "identical_message": single_msg == sharded_msg,
+        "identical_snapshot": _same_snapshot(single_snap, sharded_snap),
+        "universe": monitor_stocks.metrics.counters["universe"],
+        "partial_kb": sum(partial_bytes) / 1024,
+        "single_sec": single_sec,
+        "sharded_sec": sharded_sec,
+    }}
+
+
+BENCHMARKS = ("indicators", "candles", "main", "memory", "monitor", "resume", "shards")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="パトロール処理のベンチマーク（合成データ・通信なし）")
+    parser.add_argument("--tickers", type=int, default=DEFAULT_TICKERS, help="合成銘柄数")
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS, help="合成営業日数（指標ベンチ用）")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="各ベンチの繰り返し回数")
+    parser.add_argument("--watch", type=int, default=100, help="monitor.py の監視銘柄数")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS), help="実行するベンチ")
+    parser.add_argument("--scan-modes", nargs="+", default=["staged", "panel", "ticker"], help="main() のスキャン方式")
+    parser.add_argument("--workers", nargs="+", type=int, default=[1], help="main() の判定プロセス数（複数指定で比較）")
+    parser.add_argument("--shards", type=int, default=4, help="分割巡回ベンチの分割数")
+    parser.add_argument("--out", default=OUTPUT_PATH, help="結果JSONの出力先")
+    args = parser.parse_args()
+
+    panel = synthetic_ohlcv(args.tickers, args.days)
+    year = {f: df.iloc[-_period_bars("1y"):] for f, df in panel.items()}
+
+    results = {}
+    if "indicators" in args.only:
+        results.update(bench_indicators(panel, args.repeat))
+    if "candles" in args.only:
+        results.update(bench_candles(panel, args.repeat))
+    if "main" in args.only:
+        for mode in args.scan_modes:
+            for workers in args.workers:
+                results.update(bench_main_scan(year, args.repeat, mode, workers))
+    if "memory" in args.only:
+        results.update(bench_memory(year))
+    if "monitor" in args.only:
+        results.update(bench_monitor_cycle(args.watch, args.repeat))
+    if "resume" in args.only:
+        for mode in args.scan_modes:
+            results.update(bench_resume(year, mode, args.workers[0]))
+    if "shards" in args.only:
+        for mode in args.scan_modes:
+            results.update(bench_shards(year, mode, args.shards))
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "params": vars(args),
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    for name, r in results.items():
+        if "min" in r:
+            print(f"{name:55s} min {r['min']:.4f}s / mean {r['mean']:.4f}s")
+        else:
+            print(f"{name:55s} " + " / ".join(f"{k} {v:.1f}" if isinstance(v, float) else f"{k} {v}" for k, v in r.items()))
+    print(f"結果を {args.out} に保存しました。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import numpy as np
+
+# ==============================================================================
+# --- 設定項目 ---
+# ==============================================================================
+DOJI_BODY = 0.1         # 実体が値幅のこの割合以下なら十字線
+SHADOW_RATIO = 2.0      # ヒゲが実体のこの倍率以上なら下ヒゲ・上ヒゲ
+SHAVED_RATIO = 0.5      # 反対側のヒゲが実体のこの倍率以下
+LONG_BODY = 0.5         # 実体が値幅のこの割合以上なら大陽線・大陰線（三兵・明星・はらみ線の1本目）
+STAR_BODY = 0.3         # 明星の2本目は、1本目の実体のこの割合以下の小さな実体
+TWEEZER_TOL = 0.05      # 毛抜きの高値（安値）の差が、2本の値幅の大きいほうのこの割合以内
+
+# (パターン名, 表示名, 向き)。向きは "bull"=底打ち・上昇暗示 / "bear"=天井・下落暗示 / "both"=転換暗示
+PATTERNS = (
+    ("doji", "十字線(転換暗示)", "both"),
+    ("hammer", "下ヒゲ(底打ちシグナル)", "bull"),
+    ("shooting_star", "上ヒゲ(天井警戒シグナル)", "bear"),
+    ("engulfing_bull", "陽線の包み足(抱き線)", "bull"),
+    ("engulfing_bear", "陰線の包み足(抱き線)", "bear"),
+    ("harami_bull", "はらみ線(底打ち暗示)", "bull"),
+    ("harami_bear", "はらみ線(天井暗示)", "bear"),
+    ("tweezer_bottom", "毛抜き底", "bull"),
+    ("tweezer_top", "毛抜き天井", "bear"),
+    ("morning_star", "明けの明星", "bull"),
+    ("evening_star", "宵の明星", "bear"),
+    ("three_white_soldiers", "赤三兵", "bull"),
+    ("three_black_crows", "三羽烏", "bear"),
+)
+PATTERN_BITS = {name: 1 << i for i, (name, _, _) in enumerate(PATTERNS)}
+PATTERN_LABELS = {name: label for name, label, _ in PATTERNS}
+
+
+# ==============================================================================
+# --- 配列ずらし ---
+# ==============================================================================
+def shift_bars(a, n=1):
+    """時間軸(0軸)方向に n 本ずらした配列（n 本前の値）。先頭 n 本は NaN"""
+    prev = np.full(a.shape, np.nan)
+    if n < len(a):
+        prev[n:] = a[:len(a) - n]
+    return prev
+
+
+# ==============================================================================
+# --- パターン判定（全バー一括） ---
+# ==============================================================================
+def candle_patterns(open_p, high_p, low_p, close_p, axis=0):
+    """OHLC配列の全バーについて、PATTERNS の各パターンが成立しているかを返す
+
+    配列は 1次元（1銘柄の時系列）か2次元で、axis が時間軸（既定は (日付×銘柄) の 0軸。
+    (銘柄×日数) なら axis=1）。戻り値は {パターン名: 入力と同じ形の bool 配列}。
+    前の足を使うパターンは、足りない先頭バーでは False になる。
+    """
+    o, h, l, c = (np.moveaxis(np.asarray(x, dtype=float), axis, 0) for x in (open_p, high_p, low_p, close_p))
+    body = np.abs(c - o)
+    total_range = h - l
+    total_range = np.where(total_range == 0, 1e-9, total_range)
+    upper_shaved = h - np.maximum(o, c)
+    lower_shaved = np.minimum(o, c) - l
+    is_up, is_down = c > o, c < o
+    is_long = body >= total_range * LONG_BODY
+
+    # 1本前・2本前の値（NaN との比較は False になるので、先頭バーは自然に不成立になる）
+    o1, h1, l1, c1, body1 = (shift_bars(x, 1) for x in (o, h, l, c, body))
+    o2, c2, body2 = (shift_bars(x, 2) for x in (o, c, body))
+    up1, down1, long1 = c1 > o1, c1 < o1, shift_bars(is_long.astype(float), 1) == 1
+    up2, down2, long2 = c2 > o2, c2 < o2, shift_bars(is_long.astype(float), 2) == 1
+    range1 = shift_bars(total_range, 1)
+
+    flags = {}
+    flags["doji"] = body <= (total_range * DOJI_BODY)
+    flags["hammer"] = ~flags["doji"] & (lower_shaved >= body * SHADOW_RATIO) & (upper_shaved <= body * SHAVED_RATIO)
+    flags["shooting_star"] = (~flags["doji"] & ~flags["hammer"]
+                              & (upper_shaved >= body * SHADOW_RATIO) & (lower_shaved <= body * SHAVED_RATIO))
+    flags["engulfing_bull"] = is_up & (o <= c1) & (c >= o1) & (c1 < o1)
+    flags["engulfing_bear"] = is_down & (o >= c1) & (c <= o1) & (c1 > o1)
+
+    # はらみ線: 大きな実体の翌日、その実体の内側に収まる逆向きの小さな実体
+    flags["harami_bull"] = down1 & long1 & is_up & (o >= c1) & (c <= o1) & (body < body1)
+    flags["harami_bear"] = up1 & long1 & is_down & (o <= c1) & (c >= o1) & (body < body1)
+
+    # 毛抜き: 逆向きの2本で安値（高値）がほぼ同じ
+    tolerance = np.fmax(total_range, range1) * TWEEZER_TOL
+    flags["tweezer_bottom"] = down1 & is_up & (np.abs(l - l1) <= tolerance)
+    flags["tweezer_top"] = up1 & is_down & (np.abs(h - h1) <= tolerance)
+
+    # 明星: 大陰線（大陽線）→ その終値の先に小さな実体 → 1本目の実体の半値を超えて戻す逆向きの足
+    star_small = body1 <= body2 * STAR_BODY
+    flags["morning_star"] = (down2 & long2 & star_small & (np.maximum(o1, c1) <= c2)
+                             & is_up & (c > (o2 + c2) / 2))
+    flags["evening_star"] = (up2 & long2 & star_small & (np.minimum(o1, c1) >= c2)
+                             & is_down & (c < (o2 + c2) / 2))
+
+    # 三兵・三羽烏: 実体の大きい同じ向きの足が3本、前の実体の内側で寄り付いて終値を切り上げる（切り下げる）
+    rising = is_long & is_up & (c > c1) & (o >= o1) & (o <= c1)
+    falling = is_long & is_down & (c < c1) & (o <= o1) & (o >= c1)
+    flags["three_white_soldiers"] = rising & (shift_bars(rising.astype(float), 1) == 1) & up2 & long2
+    flags["three_black_crows"] = falling & (shift_bars(falling.astype(float), 1) == 1) & down2 & long2
+
+    return {name: np.moveaxis(flags[name], 0, axis) for name, _, _ in PATTERNS}
+
+
+def pattern_codes(patterns):
+    """candle_patterns の結果を、成立したパターンのビット（PATTERN_BITS）の和の整数配列にまとめる"""
+    codes = None
+    for name, flag in patterns.items():
+        bits = flag * np.int32(PATTERN_BITS[name])
+        codes = bits if codes is None else codes | bits
+    return codes
+
+
+def describe(code, sep="・"):
+    """pattern_codes の1要素を表示名の連結にする（成立なしは ""）"""
+    return sep.join(label for name, label, _ in PATTERNS if int(code) & PATTERN_BITS[name])
+
+
+def candle_flags(open_p, high_p, low_p, close_p, axis=0):
+    """全バーの (陽転フラグ, 陰転フラグ, パターン名) を一括判定する（通知の酒田五法表示用）
+
+    十字線・下ヒゲ・上ヒゲと包み足（抱き線）だけを使う従来の判定。パターン名は包み足を優先する。
+    """
+    p = candle_patterns(open_p, high_p, low_p, close_p, axis)
+    candle_name = np.select([p["doji"], p["hammer"], p["shooting_star"]],
+                            [PATTERN_LABELS["doji"], PATTERN_LABELS["hammer"], PATTERN_LABELS["shooting_star"]], "")
+    is_bull_candle = p["doji"] | p["hammer"] | p["engulfing_bull"]
+    is_bear_candle = p["doji"] | p["shooting_star"] | p["engulfing_bear"]
+    candle_name = np.where(p["engulfing_bull"], PATTERN_LABELS["engulfing_bull"], candle_name)
+    candle_name = np.where(p["engulfing_bear"], PATTERN_LABELS["engulfing_bear"], candle_name)
+    return is_bull_candle, is_bear_candle, candle_name
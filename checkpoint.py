@@ -0,0 +1,84 @@
+import json
+import pickle
+import sqlite3
+import threading
+
+# ==============================================================================
+# --- 設定項目 ---
+# ==============================================================================
+CHECKPOINT_PATH = "patrol_checkpoint.sqlite"
+
+
+# ==============================================================================
+# --- パトロールの途中経過の記録 ---
+# ==============================================================================
+class PatrolCheckpoint:
+    """パトロールの途中経過を SQLite に記録し、異常終了した巡回を再実行したときに続きから再開させる
+
+    - chunks: 段階ごとに、判定の終わったチャンクの銘柄と結果（pickle）
+    - tickers: 段階ごとの銘柄の状態
+      "ok" = 判定済み / "missing" = データなし / "failed" = 取得エラー（最後に取り直す）/ "gave_up" = 取り直しても失敗
+    run_key（日付・巡回種別など）が記録と違えば別の巡回の途中経過なので捨てて最初から始める。
+    巡回が最後まで終わったら clear() で消す。
+    """
+
+    def __init__(self, path=CHECKPOINT_PATH, run_key=""):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.lock = threading.RLock()
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, stage TEXT NOT NULL, tickers TEXT NOT NULL, result BLOB NOT NULL)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS tickers ("
+            " stage TEXT NOT NULL, ticker TEXT NOT NULL, status TEXT NOT NULL, error TEXT,"
+            " PRIMARY KEY (stage, ticker))")
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'run_key'").fetchone()
+            if row is None or row[0] != run_key:
+                self.clear()
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('run_key', ?)", (run_key,))
+            self.resumed = self.conn.execute("SELECT COUNT(*) FROM tickers").fetchone()[0] > 0
+
+    def close(self):
+        self.conn.close()
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM chunks")
+            self.conn.execute("DELETE FROM tickers")
+
+    def statuses(self, stage):
+        """{銘柄: 状態}（記録の無い銘柄は含まない）"""
+        with self.lock:
+            return dict(self.conn.execute("SELECT ticker, status FROM tickers WHERE stage = ?", (stage,)))
+
+    def results(self, stage):
+        """記録済みのチャンクの [(銘柄リスト, 結果)] を記録順に返す"""
+        with self.lock:
+            rows = self.conn.execute("SELECT tickers, result FROM chunks WHERE stage = ? ORDER BY id", (stage,)).fetchall()
+        return [(json.loads(tickers), pickle.loads(result)) for tickers, result in rows]
+
+    def record(self, stage, chunk, result, statuses):
+        """チャンクの結果と銘柄ごとの状態（{銘柄: 状態}）を1トランザクションで記録する"""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute("INSERT INTO chunks (stage, tickers, result) VALUES (?, ?, ?)",
+                                  (stage, json.dumps(chunk), pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)))
+                self._set_status(stage, statuses.items(), None)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def mark(self, stage, tickers, status, error=None):
+        """結果の無い銘柄（取得エラーなど）の状態を記録する"""
+        with self.lock:
+            self._set_status(stage, [(t, status) for t in tickers], error)
+
+    def _set_status(self, stage, items, error):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO tickers (stage, ticker, status, error) VALUES (?, ?, ?, ?)",
+            [(stage, t, status, error) for t, status in items])
@@ -0,0 +1,268 @@
+import queue
+import threading
+import time
+
+import requests
+
+# ==============================================================================
+# --- 設定項目 ---
+# ==============================================================================
+MAX_CONTENT = 2000       # Discordの1メッセージあたりの文字数上限
+MAX_EMBEDS = 10          # 1メッセージに載せられる埋め込み(Embed)の上限
+MAX_RETRIES = 5          # 429以外（通信エラー・5xx）の再試行回数
+BACKOFF_SEC = 1.0        # 再試行の待ち時間（1.0, 2.0, 4.0 ... 秒と倍々に延ばす）
+MAX_RATE_LIMIT_WAITS = 10  # 429 を受けて待ち直す回数の上限（無限待ちの防止）
+TIMEOUT_SEC = 10
+BATCH_WINDOW_SEC = 0.0   # キューで最初の1件を受け取ってから追加を待つ秒数（0なら溜まっている分だけ）
+FENCE = "```"
+
+
+# ==============================================================================
+# --- メッセージ分割・まとめ ---
+# ==============================================================================
+def split_message(content, limit=MAX_CONTENT):
+    """改行位置で limit 文字以内に分割する
+
+    1行が長すぎるときだけ行の途中で切る。コードブロック(```)の途中で切れた場合は
+    いったん閉じ、次のメッセージの先頭で開き直すので、コピー用リストも崩れない。
+    閉じる・開き直す分の余白はコードブロックの中にいる間だけ見込む。開いた直後で
+    まだ中身の無いコードブロックは、閉じずに開始行ごと次のメッセージへ送る（空のブロックを作らない）。
+    """
+    fence_len = len(FENCE) + 1      # 閉じる "\n```" / 開き直す "```\n" の文字数
+    pieces, lines = [], []
+    in_code, opener = False, None   # opener: 開いたばかりで中身の無いコードブロックの開始行の位置
+
+    for raw in content.split("\n"):
+        is_fence = raw.lstrip().startswith(FENCE)
+        closes = in_code and is_fence
+        # コードブロック内の行は、開き直しと閉じを足しても1通に収まる長さで切る
+        width = limit - 2 * fence_len if in_code and not is_fence else limit
+        for part in (raw[i:i+width] for i in range(0, max(len(raw), 1), width)):
+            size = sum(map(len, lines)) + len(lines)   # 改行でつないだ長さ + 次の改行
+            reserve = fence_len if in_code and not closes else 0
+            if lines and size + len(part) + reserve > limit and not closes:
+                if opener is not None:
+                    carry = lines[opener:]
+                    del lines[opener:]
+                    opener = 0
+                elif in_code:
+                    lines.append(FENCE)
+                    carry = [FENCE]
+                else:
+                    carry = []
+                if lines:
+                    pieces.append("\n".join(lines))
+                lines = carry
+            lines.append(part)
+            if closes:
+                in_code, opener = False, None
+            elif is_fence:
+                in_code, opener = True, len(lines) - 1
+            else:
+                opener = None
+    if lines:
+        pieces.append("\n".join(lines))
+    return [p for p in pieces if p.strip()]
+
+
+def pack_messages(items, limit=MAX_CONTENT, sep="\n\n"):
+    """短い通知文をまとめ、limit 文字以内のメッセージ数が最少になるよう詰め込む（順序は保つ）"""
+    messages, current = [], ""
+    for item in items:
+        for piece in split_message(item, limit):
+            if current and len(current) + len(sep) + len(piece) <= limit:
+                current += sep + piece
+            else:
+                if current:
+                    messages.append(current)
+                current = piece
+    if current:
+        messages.append(current)
+    return messages
+
+
+# ==============================================================================
+# --- Webhook 送信（接続の使い回しとレート制限への追従） ---
+# ==============================================================================
+class DiscordWebhook:
+    """1つの Webhook URL への送信を受け持つクライアント
+
+    - requests.Session で接続を使い回す（毎回のTLSハンドシェイクを省く）
+    - 応答ヘッダー X-RateLimit-Remaining / X-RateLimit-Reset-After を見て、
+      枠を使い切ったときだけ次の送信を待たせる（固定の sleep はしない）
+    - 429 を受けたら retry_after（または Retry-After ヘッダー）だけ待って同じ内容を送り直す
+    - 通信エラーと 5xx は指数バックオフで再試行し、それ以外の 4xx は即座に失敗とする
+    """
+
+    def __init__(self, url, session=None, retries=MAX_RETRIES, backoff=BACKOFF_SEC,
+                 timeout=TIMEOUT_SEC, clock=time.monotonic, sleep=time.sleep):
+        self.url = url
+        self.session = session or requests.Session()
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.clock = clock
+        self.sleep = sleep
+        self.blocked_until = 0.0
+        self.last_error = None
+        self.lock = threading.RLock()
+
+    def wait_ready(self):
+        """レート制限の枠が空くまで待つ"""
+        with self.lock:
+            delay = self.blocked_until - self.clock()
+            if delay > 0:
+                self.sleep(delay)
+
+    def _update_limits(self, res):
+        headers = res.headers or {}
+        if headers.get("X-RateLimit-Remaining") == "0":
+            reset_after = float(headers.get("X-RateLimit-Reset-After", 1.0))
+            self.blocked_until = max(self.blocked_until, self.clock() + reset_after)
+
+    @staticmethod
+    def _retry_after(res):
+        try:
+            return float(res.json()["retry_after"])
+        except Exception:
+            return float((res.headers or {}).get("Retry-After", 1.0))
+
+    def post(self, payload):
+        """payload を1通送る。再試行しても届かなければ False を返し、原因を last_error に残す"""
+        with self.lock:
+            failures = waits = 0
+            while True:
+                self.wait_ready()
+                try:
+                    res = self.session.post(self.url, json=payload, timeout=self.timeout)
+                except requests.RequestException as e:
+                    error = e
+                else:
+                    self._update_limits(res)
+                    if res.status_code < 300:
+                        return True
+                    error = requests.HTTPError(f"HTTP {res.status_code}: {str(res.text)[:200]}", response=res)
+                    if res.status_code == 429 and waits < MAX_RATE_LIMIT_WAITS:
+                        waits += 1
+                        self.blocked_until = max(self.blocked_until, self.clock() + self._retry_after(res))
+                        continue
+                    if res.status_code < 500:
+                        failures = self.retries
+                if failures >= self.retries:
+                    self.last_error = error
+                    print(f"Discord送信エラー: {error}")
+                    return False
+                self.sleep(self.backoff * 2 ** failures)
+                failures += 1
+
+    def send(self, content, **extra):
+        """長文を2000文字以内に分割して順に送る。全て届けば True"""
+        ok = True
+        for piece in split_message(content):
+            ok = self.post({"content": piece, **extra}) and ok
+        return ok
+
+    def send_embeds(self, embeds, **extra):
+        """埋め込みを10件ずつのメッセージにまとめて送る。全て届けば True"""
+        ok = True
+        for i in range(0, len(embeds), MAX_EMBEDS):
+            ok = self.post({"embeds": embeds[i:i+MAX_EMBEDS], **extra}) and ok
+        return ok
+
+
+# ==============================================================================
+# --- バックグラウンド送信キュー（連続する通知のまとめ送り） ---
+# ==============================================================================
+_STOP = object()
+
+
+class DiscordQueue:
+    """通知をキューに積むだけで戻り、別スレッドで順に送るキュー
+
+    送信スレッドはレート制限の枠が空くのを待ってから、その間に溜まった通知を
+    まとめて取り出し、できるだけ少ないメッセージ数に詰めて送る。空いていれば
+    1件目はすぐ出るので、平常時の遅延は増えず、集中時だけ自然にまとめ送りになる。
+    """
+
+    def __init__(self, webhook, batch_window=BATCH_WINDOW_SEC, **extra):
+        self.webhook = webhook
+        self.batch_window = batch_window
+        self.extra = extra
+        self.queue = queue.Queue()
+        self.thread = None
+        self.failed = 0
+        self.lock = threading.Lock()
+
+    def put(self, content=None, embed=None):
+        """本文(content) か 埋め込み(embed) を1件積む"""
+        self._ensure_started()
+        self.queue.put((content, embed))
+
+    def flush(self, timeout=None):
+        """積んだ通知がすべて送り終わるまで待ち、送り切れたかを返す
+
+        timeout 秒を過ぎたら送り終わっていなくても戻る（残りは送信スレッドがそのまま送り続ける）。
+        """
+        if self.thread is None:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self):
+        """残りを送り切ってから送信スレッドを止める"""
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join()
+        self.thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _ensure_started(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name="discord-queue", daemon=True)
+                self.thread.start()
+
+    def _take_batch(self):
+        batch = [self.queue.get()]
+        self.webhook.wait_ready()
+        deadline = time.monotonic() + self.batch_window
+        while batch[-1] is not _STOP:
+            try:
+                batch.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            items = [item for item in batch if item is not _STOP]
+            try:
+                self._deliver(items)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+            if len(items) < len(batch):
+                return
+
+    def _deliver(self, items):
+        contents = [content for content, _ in items if content]
+        embeds = [embed for _, embed in items if embed]
+        ok = True
+        for message in pack_messages(contents):
+            ok = self.webhook.post({"content": message, **self.extra}) and ok
+        if embeds:
+            ok = self.webhook.send_embeds(embeds, **self.extra) and ok
+        if not ok:
+            self.failed += 1
@@ -0,0 +1,100 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# ==============================================================================
+# --- 設定項目 ---
+# ==============================================================================
+MAX_WORKERS = 4      # 同時に実行するチャンク取得数
+RATE_PER_SEC = 2.0   # 1秒あたりのリクエスト上限（トークン補充速度）
+BURST = 4            # 一度に連続発行できるリクエスト数（バケット容量）
+MAX_RETRIES = 3      # チャンクごとの再試行回数
+BACKOFF_SEC = 1.0    # 再試行の待ち時間（1.0, 2.0, 4.0 ... 秒と倍々に延ばす）
+
+
+# ==============================================================================
+# --- トークンバケット式レートリミッター ---
+# ==============================================================================
+class TokenBucket:
+    """rate 個/秒でトークンを補充し、最大 capacity 個まで溜めるレートリミッター"""
+
+    def __init__(self, rate=RATE_PER_SEC, capacity=BURST, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = capacity
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """トークンを1個消費する。足りなければ補充されるまで待つ"""
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_sec = (1 - self.tokens) / self.rate
+            self.sleep(wait_sec)
+
+
+# ==============================================================================
+# --- 並列チャンクダウンローダー ---
+# ==============================================================================
+class ChunkDownloader:
+    """スレッドプールでチャンクを並列取得し、完了した順に消費側へ渡すダウンローダー
+
+    取得（ネットワーク待ち）と判定（CPU処理）が重なるよう、iter_fetch はジェネレーターとして
+    完了済みチャンクから順に (chunk, data, error) を返す。同時保持するチャンクは
+    max_workers の2倍までに抑える。
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, rate=RATE_PER_SEC, burst=BURST,
+                 retries=MAX_RETRIES, backoff=BACKOFF_SEC, sleep=time.sleep):
+        self.max_workers = max_workers
+        self.limiter = TokenBucket(rate, burst, sleep=sleep)
+        self.retries = retries
+        self.backoff = backoff
+        self.sleep = sleep
+
+    def _fetch_with_retry(self, fetch, chunk):
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.sleep(self.backoff * 2 ** (attempt - 1))
+            self.limiter.acquire()
+            try:
+                return chunk, fetch(chunk), None
+            except Exception as e:
+                error = e
+        return chunk, None, error
+
+    def iter_fetch(self, fetch, chunks):
+        """chunks の各チャンクを fetch で取得し、完了順に (chunk, data, error) を返す"""
+        chunks = iter(chunks)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = set()
+
+            def submit_next():
+                chunk = next(chunks, None)
+                if chunk is not None:
+                    pending.add(pool.submit(self._fetch_with_retry, fetch, chunk))
+
+            for _ in range(self.max_workers * 2):
+                submit_next()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.discard(future)
+                    submit_next()
+                    yield future.result()
+
+
+def split_chunks(tickers, chunk_size=100):
+    """銘柄リストを chunk_size ごとのリストに分割する"""
+    return [tickers[i:i+chunk_size] for i in range(0, len(tickers), chunk_size)]
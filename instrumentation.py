@@ -0,0 +1,151 @@
+import cProfile
+import json
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+# ==============================================================================
+# --- パトロール実行計測（処理段階ごとの時間・足切り件数・エラー分類） ---
+# ==============================================================================
+REPORT_PATH = "patrol_report.json"
+FUNNEL_STEPS = ("missing", "length", "price", "range", "vol_3m", "vol_today", "vol_5d")
+
+
+class RunMetrics:
+    """1回のパトロール実行の計測値を集めるレコーダー
+
+    - stage(): 処理段階ごとの実時間(wall)とCPU時間。CPU時間はスレッド単位で測るため、
+      並列ダウンロードのワーカー内で計測しても他スレッドの処理は混ざらない
+    - funnel: フィルターごとに足切りされた銘柄数
+    - counters: dropna で落ちた行数、ルールごとのヒット数など
+    - errors: 「段階:例外クラス名」ごとの発生件数
+    - observations: 遅延秒数など、回ごとに変わる値の件数・合計・最大
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.chunks = []
+        self.funnel = Counter({step: 0 for step in FUNNEL_STEPS})
+        self.counters = Counter()
+        self.errors = Counter()
+        self.error_samples = {}
+        self.observations = {}
+
+    @contextmanager
+    def stage(self, name):
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - wall, time.thread_time() - cpu)
+
+    def add_time(self, name, wall, cpu):
+        with self.lock:
+            entry = self.stages.setdefault(name, {"wall": 0.0, "cpu": 0.0, "calls": 0})
+            entry["wall"] += wall
+            entry["cpu"] += cpu
+            entry["calls"] += 1
+
+    def timed_fetch(self, stage_name, fetch):
+        """取得関数を包み、チャンクごとの取得時間を記録する版を返す"""
+        def wrapped(chunk):
+            wall, cpu = time.perf_counter(), time.thread_time()
+            try:
+                return fetch(chunk)
+            finally:
+                elapsed = time.perf_counter() - wall
+                self.add_time(stage_name, elapsed, time.thread_time() - cpu)
+                with self.lock:
+                    self.chunks.append({"stage": stage_name, "size": len(chunk), "first": chunk[0], "wall": elapsed})
+        return wrapped
+
+    def add_funnel(self, removed):
+        with self.lock:
+            self.funnel.update({k: v for k, v in removed.items() if v})
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] += n
+
+    def observe(self, name, value):
+        with self.lock:
+            entry = self.observations.setdefault(name, {"count": 0, "sum": 0.0, "max": value, "last": value})
+            entry["count"] += 1
+            entry["sum"] += value
+            entry["max"] = max(entry["max"], value)
+            entry["last"] = value
+
+    def error(self, stage_name, exc):
+        key = f"{stage_name}:{type(exc).__name__}"
+        with self.lock:
+            self.errors[key] += 1
+            self.error_samples.setdefault(key, str(exc)[:200])
+
+    def merge(self, report):
+        """別プロセスの to_dict() の結果（段階時間・足切り件数・カウンター・エラー・観測値）を足し込む"""
+        for name, entry in report["stages"].items():
+            with self.lock:
+                total = self.stages.setdefault(name, {"wall": 0.0, "cpu": 0.0, "calls": 0})
+                for k in total:
+                    total[k] += entry[k]
+        self.add_funnel(report["funnel"])
+        with self.lock:
+            self.counters.update(report["counters"])
+            self.errors.update(report["errors"])
+            for key, sample in report["error_samples"].items():
+                self.error_samples.setdefault(key, sample)
+            for name, entry in report["observations"].items():
+                total = self.observations.setdefault(name, {"count": 0, "sum": 0.0, "max": entry["max"], "last": entry["last"]})
+                total["count"] += entry["count"]
+                total["sum"] += entry["sum"]
+                total["max"] = max(total["max"], entry["max"])
+                total["last"] = entry["last"]
+
+    def to_dict(self):
+        jst = timezone(timedelta(hours=9))
+        with self.lock:
+            return {
+                "finished_at": datetime.now(jst).isoformat(timespec="seconds"),
+                "total_wall": time.perf_counter() - self.started,
+                "stages": {k: dict(v) for k, v in self.stages.items()},
+                "funnel": dict(self.funnel),
+                "counters": dict(self.counters),
+                "errors": dict(self.errors),
+                "observations": {k: dict(v, mean=v["sum"] / v["count"]) for k, v in self.observations.items()},
+                "error_samples": dict(self.error_samples),
+                "chunks": list(self.chunks),
+            }
+
+    def write(self, path=REPORT_PATH, extra=None):
+        report = self.to_dict()
+        if extra:
+            report.update(extra)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return report
+
+
+# パトロール全体で共有する計測インスタンス（main() の開始時に reset する）
+metrics = RunMetrics()
+
+
+@contextmanager
+def profiled(path=None):
+    """path が指定されていれば、ブロック内を cProfile で計測して pstats 形式で保存する"""
+    if not path:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
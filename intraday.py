@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+# ==============================================================================
+# --- 設定項目 ---
+# ==============================================================================
+FIELDS = ("Open", "High", "Low", "Close", "Volume")
+RING_BARS = 400   # 銘柄ごとに保持する1分足の本数（前場150本＋後場180本＋引けが収まる長さ）
+REFETCH_MIN = 2   # 前回取得した最新バーの何分前まで遡って取り直すか（最終バーの確定・銘柄ごとの反映遅れの分）
+MINUTE_NS = 60 * 10**9
+
+
+# ==============================================================================
+# --- データ取得関数（差し替え可能） ---
+# ==============================================================================
+def yf_intraday_fetcher(tickers, start=None, period=None):
+    """監視銘柄の1分足を yfinance から group_by='ticker' 形式で一括取得する標準フェッチャー"""
+    return yf.download(tickers, start=start, period=period, interval="1m",
+                       progress=False, group_by='ticker', auto_adjust=True)
+
+
+# ==============================================================================
+# --- 1銘柄分のリングバッファ ---
+# ==============================================================================
+class BarRing:
+    """1銘柄の1分足を固定長の配列に保持するリングバッファ（時刻は UTC の int64 ナノ秒）"""
+
+    def __init__(self, capacity=RING_BARS):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype="int64")
+        self.values = np.full((capacity, len(FIELDS)), np.nan)
+        self.start = 0
+        self.size = 0
+
+    def last_time(self):
+        return int(self.times[(self.start + self.size - 1) % self.capacity]) if self.size else None
+
+    def merge(self, times, values):
+        """時刻順の新しいバーを追記する。既存の末尾と重なる時刻以降は新しい値で置き換える
+
+        場中の最終バーは確定前の暫定値なので、次の取得で同じ時刻のバーが来たら上書きする。
+        """
+        n = len(times)
+        if not n:
+            return
+        while self.size and self.times[(self.start + self.size - 1) % self.capacity] >= times[0]:
+            self.size -= 1
+        if n >= self.capacity:
+            times, values = times[-self.capacity:], values[-self.capacity:]
+            n, self.start, self.size = self.capacity, 0, 0
+        overflow = max(self.size + n - self.capacity, 0)
+        self.start = (self.start + overflow) % self.capacity
+        self.size -= overflow
+        slots = (self.start + self.size + np.arange(n)) % self.capacity
+        self.times[slots] = times
+        self.values[slots] = values
+        self.size += n
+
+    def arrays(self):
+        order = (self.start + np.arange(self.size)) % self.capacity
+        return self.times[order], self.values[order]
+
+
+# ==============================================================================
+# --- 監視銘柄全体の1分足バッファ ---
+# ==============================================================================
+class IntradayBuffer:
+    """監視銘柄の1分足を銘柄ごとのリングバッファで持ち、前回以降のバーだけを取り込むデータ層
+
+    - 初回（またはリストに新しく加わった銘柄）は当日分をまとめて1リクエストで取得する
+    - 2回目以降は、取得済み銘柄の最終バー時刻（最も古いもの）以降だけを1リクエストで取得する。
+      ただし前回取得した最新バーの REFETCH_MIN 分前より古くは遡らない（売買停止・閑散で最終バーが
+      進まない銘柄があっても、その後のバーが無いことは前回までの取得で分かっている）
+    そのため1巡あたりの通信量と解析量は、時間帯によらずほぼ一定になる。
+    """
+
+    def __init__(self, fetcher=yf_intraday_fetcher, capacity=RING_BARS):
+        self.fetcher = fetcher
+        self.capacity = capacity
+        self.rings = {}
+        self.tz = None
+
+    def clear(self):
+        self.rings.clear()
+
+    def update(self, tickers):
+        """監視銘柄の最新バーを一括取得してバッファへ反映する"""
+        known = [t for t in tickers if t in self.rings and self.rings[t].size]
+        fresh = [t for t in tickers if t not in self.rings or not self.rings[t].size]
+        if fresh:
+            self._merge(self.fetcher(fresh, period="1d"), fresh)
+        if known:
+            last = [self.rings[t].last_time() for t in known]
+            since = pd.Timestamp(max(min(last), max(last) - REFETCH_MIN * MINUTE_NS), tz="UTC")
+            self._merge(self.fetcher(known, start=since if self.tz else since.tz_localize(None)), known)
+        # 監視リストから外れた銘柄のバッファは捨てる
+        for ticker in set(self.rings) - set(tickers):
+            del self.rings[ticker]
+
+    def _merge(self, data, tickers):
+        if data is None or data.empty:
+            return
+        if not isinstance(data.columns, pd.MultiIndex):
+            data = pd.concat({tickers[0]: data}, axis=1)
+        index = pd.DatetimeIndex(data.index)
+        self.tz = index.tz
+        times = index.asi8
+        present = set(data.columns.get_level_values(0))
+        for ticker in tickers:
+            if ticker not in present:
+                continue
+            values = data[ticker].reindex(columns=list(FIELDS)).to_numpy(dtype=float)
+            valid = ~np.isnan(values).any(axis=1)
+            ring = self.rings.setdefault(ticker, BarRing(self.capacity))
+            ring.merge(times[valid], values[valid])
+
+    def frame(self, ticker):
+        """ticker の最新営業日の1分足を DataFrame（列は OHLCV）で返す。未取得なら空"""
+        ring = self.rings.get(ticker)
+        if ring is None or not ring.size:
+            return pd.DataFrame(columns=list(FIELDS))
+        times, values = ring.arrays()
+        index = pd.DatetimeIndex(times)
+        if self.tz is not None:
+            index = index.tz_localize("UTC").tz_convert(self.tz)
+        # 日付をまたいで取得した場合も、period="1d" と同じく最新営業日の分だけを返す
+        today = index.normalize() == index[-1].normalize()
+        return pd.DataFrame(values[today], index=index[today], columns=list(FIELDS))
@@ -0,0 +1,135 @@
+from datetime import datetime, time, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from instrumentation import metrics
+
+# ==============================================================================
+# --- 設定項目 ---
+# ==============================================================================
+JST = timezone(timedelta(hours=9))
+# 東証の立会時間（前場・後場。2024年11月から大引けは15:30）
+SESSIONS = ((time(9, 0), time(11, 30)), (time(12, 30), time(15, 30)))
+QUOTE_DELAY_MIN = 20   # yfinance の東証銘柄は約20分遅れの値なので、経過時間からこの分を差し引く
+# 当日分に加えて直近数日分も取り直す（前回の大引け後巡回が動かずストアが1日古い場合も埋まる。本数が少ないので通信量はほぼ同じ）
+LIVE_PERIOD = "5d"
+HISTORY_PERIOD = "1y"
+
+
+# ==============================================================================
+# --- データ取得関数（差し替え可能） ---
+# ==============================================================================
+def yf_live_fetcher(tickers, period=LIVE_PERIOD):
+    """直近の日足（当日分は場中の暫定足）を yfinance から group_by='ticker' 形式で一括取得する標準フェッチャー"""
+    return yf.download(tickers, period=period, interval="1d", progress=False, group_by='ticker', auto_adjust=True)
+
+
+# ==============================================================================
+# --- 場中の経過割合 ---
+# ==============================================================================
+def session_progress(now=None, delay_min=QUOTE_DELAY_MIN):
+    """その日の立会時間（前場＋後場）のうち、取得できる値の時点までに経過した割合（0〜1）を返す
+
+    昼休み中は前場の分（0.5）で止まる。値は delay_min 分遅れている前提で、その分を差し引いた時刻で数える。
+    """
+    as_of = (now or datetime.now(JST)).astimezone(JST) - timedelta(minutes=delay_min)
+    total = elapsed = 0.0
+    for start, end in SESSIONS:
+        opened = datetime.combine(as_of.date(), start, JST)
+        length = (datetime.combine(as_of.date(), end, JST) - opened).total_seconds()
+        total += length
+        elapsed += min(max((as_of - opened).total_seconds(), 0.0), length)
+    return elapsed / total
+
+
+def volume_scale(now=None, delay_min=QUOTE_DELAY_MIN):
+    """当日の途中までの出来高を終日分に換算する倍率（寄り付き前・大引け後は 1.0）"""
+    progress = session_progress(now, delay_min)
+    return 1.0 / progress if 0 < progress < 1 else 1.0
+
+
+# ==============================================================================
+# --- 保存済みの日足と当日の暫定足の合成 ---
+# ==============================================================================
+def _daily_index(index):
+    """日足の索引を、ストアと同じタイムゾーンなしの日付に揃える"""
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.normalize()
+
+
+def merge_live(history, live, tickers, today=None, scale=1.0):
+    """保存済みの日足 history に、直近の日足 live（当日分は暫定足）を重ねたフレームを返す
+
+    どちらも yf.download(group_by='ticker') 形式。live にある日付・銘柄の値で history を置き換え、
+    history に無い日付（当日など）は追加する。live で値の無い銘柄・日は history の値を残す。
+    today を渡すと、today の終値（暫定足）が無い銘柄は除く。live の取得が空振りした（yfinance は
+    一時的なエラーでも空のフレームを返す）銘柄を、前日の確定足のまま当日として判定しないため。
+    scale が 1 以外なら、today の行の出来高をその倍率で終日分に換算する。
+    """
+    if live is None or live.empty:
+        return history if today is None else _with_today(history, today)
+    if not isinstance(live.columns, pd.MultiIndex):
+        live = pd.concat({tickers[0]: live}, axis=1)
+    live = live.set_axis(_daily_index(live.index), axis=0)
+    if history is None or history.empty:
+        merged = live
+    else:
+        merged = live.combine_first(history)
+    present = set(merged.columns.get_level_values(0))
+    fields = list(dict.fromkeys(merged.columns.get_level_values(1)))
+    merged = merged.reindex(columns=pd.MultiIndex.from_product([[t for t in tickers if t in present], fields]))
+    if today is None:
+        return merged
+    merged = _with_today(merged, today)
+    if scale != 1.0 and today in merged.index:
+        volume = merged.columns.get_level_values(1) == "Volume"
+        merged.loc[today, volume] = np.rint(merged.loc[today, volume].to_numpy(dtype=float) * scale)
+    return merged
+
+
+def _with_today(frame, today):
+    """today の終値がある銘柄の列だけを残す（該当なしなら列の無いフレーム）"""
+    if frame is None or frame.empty or today not in frame.index:
+        return pd.DataFrame(index=pd.DatetimeIndex([]), columns=pd.MultiIndex.from_tuples([], names=["Ticker", "Price"]))
+    tickers = list(dict.fromkeys(frame.columns.get_level_values(0)))
+    row = frame.loc[today]
+    keep = [t for t in tickers if pd.notna(row.get((t, "Close")))]
+    return frame.loc[:, frame.columns.get_level_values(0).isin(keep)]
+
+
+class LiveBars:
+    """中間巡回用の取得関数。ストアの日足を読み、当日の暫定足だけを取得して重ねたチャンクを返す
+
+    1年分の日足は取り直さず（前回の大引け後巡回でストアに保存済み）、通信はチャンクごとに
+    直近 LIVE_PERIOD 分の軽いリクエスト1回になる。ストアに履歴の無い銘柄だけは通常どおり取得し、前日までの分を保存する。
+    暫定足はストアへ保存しない（大引け後巡回が確定値で取り直す）。当日の暫定足が取れなかった銘柄は返さない。
+    project_volume=True なら当日の出来高を経過時間から終日分に換算する。
+    """
+
+    def __init__(self, store, fetcher=yf_live_fetcher, project_volume=False, now=None):
+        self.store = store
+        self.fetcher = fetcher
+        now = (now or datetime.now(JST)).astimezone(JST)
+        self.today = pd.Timestamp(now.date())
+        self.scale = volume_scale(now) if project_volume else 1.0
+
+    def __call__(self, chunk):
+        history = self.store.load_recent(chunk, HISTORY_PERIOD)
+        stored = set(history.columns.get_level_values(0)) if not history.empty else set()
+        missing = [t for t in chunk if t not in stored]
+        if missing:
+            metrics.count("live_missing_history", len(missing))
+            # 取得した1年分には当日の暫定足も含まれるので、前日までの分だけを保存する
+            self.store.update(missing, period=HISTORY_PERIOD, before=self.today.strftime("%Y-%m-%d"))
+            history = self.store.load_recent(chunk, HISTORY_PERIOD)
+        merged = merge_live(history, self.fetcher(chunk), chunk, self.today, self.scale)
+        present = set(merged.columns.get_level_values(0))
+        stale = sum(t not in present for t in chunk)
+        if stale:
+            # 当日の暫定足が取れなかった銘柄は、この巡回では判定しない
+            metrics.count("live_missing_today", stale)
+        return merged
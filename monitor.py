@@ -1,91 +1,217 @@
-import yfinance as yf
-import pandas as pd
+import os
 import time
-import requests
+import pandas as pd
 from datetime import datetime, time as dt_time, timezone, timedelta
 
+from alert_store import AlertStore
+from discord_notify import DiscordQueue, DiscordWebhook
+from instrumentation import RunMetrics
+from intraday import IntradayBuffer
+from scheduler import MinuteScheduler
+from streaming import MACD
+
 # ==========================================
 # 🛠️ 設定：ExcelとDiscord
 # ==========================================
 EXCEL_FILE = "list.xlsx"
 COLUMN_NAME = "銘柄コード"
-DISCORD_WEBHOOK_URL = "https://discordapp.com/api/webhooks/1472281747000393902/Fbclh0R3R55w6ZnzhenJ24coaUPKy42abh3uPO-fRjfQulk9OwAq-Cf8cJQOe2U4SFme
-"
+DISCORD_WEBHOOK_URL = "https://discordapp.com/api/webhooks/1472281747000393902/Fbclh0R3R55w6ZnzhenJ24coaUPKy42abh3uPO-fRjfQulk9OwAq-Cf8cJQOe2U4SFme"
+REPORT_PATH = "monitor_report.json"  # 巡回の遅延・締め切り超過などの計測値を毎巡上書き保存する
 
-notified_history = {}
+ALERT_TTL_MIN = 30  # 同じ銘柄・同じ種別のシグナルを再通知しない分数
+NOTIFY_DRAIN_SEC = 30  # 終了時に、積んだままの通知を送り切るのを待つ秒数の上限
+
+JST = timezone(timedelta(hours=9))
+
+# 通知は送信キューに積むだけにして、監視ループを Discord の応答待ちやレート制限で止めない
+notifier = DiscordQueue(DiscordWebhook(DISCORD_WEBHOOK_URL))
+
+# 監視銘柄の当日1分足（毎巡、前回以降のバーだけを一括取得して追記する）
+bars = IntradayBuffer()
+
+# 銘柄ごとの確定済み1分足までのMACD状態 {ticker: {"macd": MACD, "last": 最後に足し込んだバーの時刻}}
+macd_states = {}
+
+# 巡回の遅延・所要時間・締め切り超過・後回しにした銘柄数
+metrics = RunMetrics()
+
+def load_tickers(path=EXCEL_FILE, column=COLUMN_NAME):
+    df = pd.read_excel(path)
+    return [str(t) + ".T" if ".T" not in str(t) else str(t) for t in df[column].dropna()]
 
-def load_tickers():
-    try:
-        df = pd.read_excel(EXCEL_FILE)
-        return [str(t) + ".T" if ".T" not in str(t) else str(t) for t in df[COLUMN_NAME].dropna()]
-    except: return []
 
-def is_market_open():
+class Watchlist:
+    """監視リスト(Excel)を、ファイルの更新時刻(mtime)が変わったときだけ読み直す"""
+
+    def __init__(self, path=EXCEL_FILE, column=COLUMN_NAME):
+        self.path = path
+        self.column = column
+        self.mtime = None
+        self.tickers = []
+
+    def load(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime != self.mtime:
+                self.tickers = load_tickers(self.path, self.column)
+                self.mtime = mtime
+                print(f"📄 監視リストを読み込みました: {len(self.tickers)} 銘柄")
+        except Exception as e:
+            # 読めなかったときは前回のリストで監視を続ける（保存途中のファイルなど）
+            print(f"監視リスト読込エラー: {e}")
+            metrics.error("watchlist", e)
+        return self.tickers
+
+
+def is_market_open(now=None):
     """日本株の開催時間（前場・後場）か判定"""
-    now = datetime.now(timezone(timedelta(hours=9))).time()
+    now = (now or datetime.now(JST)).time()
     # 前場: 09:00 - 12:00
     zenba = (now >= dt_time(9, 0) and now <= dt_time(12, 0))
     # 後場: 12:30 - 15:00
     goba = (now >= dt_time(12, 30) and now <= dt_time(15, 0))
     return zenba or goba
 
-def monitor():
+def current_macd(ticker, close):
+    """当日1分足の最終バー時点の (MACD, シグナル) を返す
+
+    確定済みのバーは前回の状態に新しい分だけ足し込み、場中でまだ動く最終バーは状態を変えずに計算する。
+    前回最後に足し込んだバーが見当たらない（日付が変わった・データが差し替わった）ときは当日分から作り直す。
+    """
+    times, values = close.index, close.to_numpy(dtype=float)
+    state = macd_states.get(ticker)
+    start = 0
+    if state is not None:
+        pos = times.searchsorted(state["last"])
+        if pos < len(times) - 1 and times[pos] == state["last"]:
+            start = pos + 1
+        else:
+            state = None
+    if state is None:
+        state = macd_states[ticker] = {"macd": MACD(12, 26, 9), "last": None}
+    for x in values[start:-1]:
+        state["macd"].update(x)
+    if len(values) > 1:
+        state["last"] = times[-2]
+    return state["macd"].peek(values[-1])
+
+
+def check_ticker(ticker, df):
+    """1分足から急騰・急落シグナルを判定し、(通知メッセージ, 種別キー) を返す（該当なしは空文字）"""
+    if len(df) < 20:
+        return "", ""
+
+    curr_p = df['Close'].iloc[-1]
+
+    # --- 1分足専用判定ロジック ---
+    # 1. 10分間の騰落率 (急騰 > 1.2%, 急落 < -1.2%)
+    change = (df['Close'].iloc[-1] - df['Close'].iloc[-10]) / df['Close'].iloc[-10]
+
+    # 2. 3分間のヨコヨコ判定 (値幅が0.2%以内)
+    is_square = (df['High'].tail(3).max() - df['Low'].tail(3).min()) / curr_p < 0.002
+
+    # 3. MACD判定
+    macd_val, sig_val = current_macd(ticker, df['Close'])
+
+    # 買いチャンス：急騰 ＋ ヨコヨコ ＋ MACD上向き
+    if change > 0.012 and is_square and macd_val > sig_val:
+        msg = f"🚀 **【1分足・急騰】 {ticker}**\nヨコヨコで力を溜めています。ブレイク間近！\n現在値: {int(curr_p)}円"
+        return msg, "BUY"
+
+    # 空売りチャンス：急落 ＋ ヨコヨコ ＋ MACD下向き
+    if change < -0.012 and is_square and macd_val < sig_val:
+        msg = f"📉 **【1分足・急落】 {ticker}**\n下げ止まりからの続落予兆。空売り準備！\n現在値: {int(curr_p)}円"
+        return msg, "SELL"
+
+    return "", ""
+
+
+def run_cycle(tickers, alerts, deadline=None, clock=time.time):
+    """監視リスト全銘柄を1巡チェックし、条件成立かつ30分以内に未通知ならDiscordへ送る
+
+    alerts は通知済みシグナルの記録（AlertStore）。
+    deadline（clock と同じ基準の時刻）を過ぎたら残りの銘柄は判定せず、そのリストを返す。
+    """
+    try:
+        # 🚀 1分足データを全銘柄まとめて取得 (前回取得分より新しいバーだけ)
+        bars.update(tickers)
+    except Exception as e:
+        # 古いバーのまま判定すると同じシグナルを出し直すので、この巡回は見送る
+        print(f"1分足取得エラー: {e}")
+        metrics.error("fetch", e)
+        return []
+
+    deferred = []
+    candidates = {}
+    for i, ticker in enumerate(tickers):
+        if deadline is not None and clock() > deadline:
+            deferred = tickers[i:]
+            print(f"⏱️ 締め切り超過: {len(deferred)} 銘柄を次の巡回に回します")
+            break
+        try:
+            msg, key = check_ticker(ticker, bars.frame(ticker))
+            if msg:
+                candidates[f"intraday:{ticker}_{key}"] = (ticker, msg)
+        except Exception as e:
+            print(f"エラー ({ticker}): {e}")
+            metrics.error("check", e)
+
+    # --- 通知 --- (30分以内に通知済みのものは除き、残りをまとめて記録してから送る)
+    try:
+        new_keys = alerts.claim(list(candidates), ttl=ALERT_TTL_MIN * 60)
+    except Exception as e:
+        # 記録が使えなくても通知は落とさない（重複の方が見逃しよりまし）
+        print(f"通知履歴エラー: {e}")
+        metrics.error("alerts", e)
+        new_keys = list(candidates)
+    for hist_key in new_keys:
+        ticker, msg = candidates[hist_key]
+        notifier.put(msg)
+        print(f"✅ 通知: {ticker}")
+
+    # 監視リストから外れた銘柄のMACD状態は捨てる
+    for ticker in set(macd_states) - set(tickers):
+        del macd_states[ticker]
+
+    # 通知は送信スレッドが送る。ここで送り終わりを待つと、レート制限や再試行で次の巡回が遅れる
+    return deferred
+
+
+def monitor(scheduler=None, watchlist=None, report_path=REPORT_PATH):
+    """1分足の確定ごとに巡回する。締め切りに間に合わなかった銘柄は次の巡回で先に判定する"""
     print("🦅 1分足・デイトレ監視ボット稼働中...")
-    
-    while True:
-        if not is_market_open():
-            print("💤 市場時間外または昼休みのため待機中...")
-            time.sleep(60)
-            continue
-
-        tickers = load_tickers()
-        for ticker in tickers:
-            try:
-                # 🚀 1分足データを取得 (yfinanceの制限で直近7日分のみ取得可能)
-                df = yf.Ticker(ticker).history(period="1d", interval="1m")
-                if len(df) < 20: continue
-                
-                curr_p = df['Close'].iloc[-1]
-                
-                # --- 1分足専用判定ロジック ---
-                # 1. 10分間の騰落率 (急騰 > 1.2%, 急落 < -1.2%)
-                change = (df['Close'].iloc[-1] - df['Close'].iloc[-10]) / df['Close'].iloc[-10]
-                
-                # 2. 3分間のヨコヨコ判定 (値幅が0.2%以内)
-                is_square = (df['High'].tail(3).max() - df['Low'].tail(3).min()) / curr_p < 0.002
-                
-                # 3. MACD判定
-                ema12, ema26 = df['Close'].ewm(span=12).mean(), df['Close'].ewm(span=26).mean()
-                macd = ema12 - ema26
-                signal = macd.ewm(span=9).mean()
-
-                # --- 通知 ---
-                msg = ""
-                key = ""
-                
-                # 買いチャンス：急騰 ＋ ヨコヨコ ＋ MACD上向き
-                if change > 0.012 and is_square and macd.iloc[-1] > signal.iloc[-1]:
-                    msg = f"🚀 **【1分足・急騰】 {ticker}**\nヨコヨコで力を溜めています。ブレイク間近！\n現在値: {int(curr_p)}円"
-                    key = "BUY"
-                
-                # 空売りチャンス：急落 ＋ ヨコヨコ ＋ MACD下向き
-                elif change < -0.012 and is_square and macd.iloc[-1] < signal.iloc[-1]:
-                    msg = f"📉 **【1分足・急落】 {ticker}**\n下げ止まりからの続落予兆。空売り準備！\n現在値: {int(curr_p)}円"
-                    key = "SELL"
-
-                if msg:
-                    hist_key = f"{ticker}_{key}"
-                    last_time = notified_history.get(hist_key)
-                    if last_time is None or (datetime.now() - last_time) > timedelta(minutes=30):
-                        requests.post(DISCORD_WEBHOOK_URL, json={"content": msg})
-                        notified_history[hist_key] = datetime.now()
-                        print(f"✅ 通知: {ticker}")
-
-            except Exception as e:
-                print(f"エラー ({ticker}): {e}")
-
-        # 1分ごとにループ
-        time.sleep(60)
+    scheduler = scheduler or MinuteScheduler(metrics=metrics)
+    watchlist = watchlist or Watchlist()
+    # 通知済みシグナルの記録（再起動後も残り、期限切れは自動で消える）
+    alerts = AlertStore()
+    deferred = []
+
+    def market_open(fire):
+        if is_market_open(datetime.fromtimestamp(fire, JST)):
+            return True
+        print("💤 市場時間外または昼休みのため待機中...")
+        return False
+
+    def cycle(deadline):
+        nonlocal deferred
+        tickers = watchlist.load()
+        listed = set(tickers)
+        first = [t for t in deferred if t in listed]
+        moved = set(first)
+        deferred = run_cycle(first + [t for t in tickers if t not in moved], alerts, deadline=deadline, clock=scheduler.clock)
+        metrics.count("deferred_tickers", len(deferred))
+
+    def write_report():
+        if report_path:
+            metrics.write(report_path)
+
+    try:
+        scheduler.run(cycle, should_run=market_open, after=write_report)
+    finally:
+        # 止めるときだけ、積んだままの通知の送信を待つ（待つのは NOTIFY_DRAIN_SEC 秒まで）
+        if not notifier.flush(timeout=NOTIFY_DRAIN_SEC):
+            print(f"⚠️ 送り切れなかった通知があります（{NOTIFY_DRAIN_SEC}秒待って終了）")
+        alerts.close()
 
 if __name__ == "__main__":
-    monitor()
\ No newline at end of file
+    monitor()
@@ -1,35 +1,134 @@
-import io
-import time
+import argparse
+import os
+from collections import Counter
+from functools import partial
+from contextlib import contextmanager
 from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
 import numpy as np
 import pandas as pd
-import requests
 import yfinance as yf
 
+from alert_store import AlertStore
+from candlestick import candle_flags, candle_patterns, describe, pattern_codes, shift_bars
+from discord_notify import DiscordWebhook
+from downloader import ChunkDownloader, split_chunks
+from checkpoint import CHECKPOINT_PATH, PatrolCheckpoint
+from instrumentation import REPORT_PATH, metrics, profiled
+from midday import LiveBars
+from ohlcv_panel import OHLCVPanel
+from ohlcv_store import OHLCVStore
+from panel_pool import SCAN_WORKERS, PanelPool
+from rule_plan import RULE_STATS_PATH, Condition, Indicator, PlanValues, Rule, RulePlan, RuleStats
+from shard import (SHARD_DIR, latest_run, load_partials, parse_shard, partial_path, remove_partials, select_shard,
+                   shard_file, snapshot_path as shard_snapshot_path, universe_key, write_partial)
+from snapshot import SNAPSHOT_PATH, Snapshot, snapshot, write_snapshot
+from timeframes import DAILY, Timeframes
+from universe import load_universe
+
 # ==============================================================================
 # --- 設定項目 ---
 # ==============================================================================
 # 取得したDiscordのWebhook URLを設定してください
 DISCORD_WEBHOOK_URL = "https://discord.com/api/webhooks/1472281747000393902/Fbclh0R3R55w6ZnzhenJ24coaUPKy42abh3uPO-fRjfQulk9OwAq-Cf8cJQOe2U4SFme"
 
-# パトロール巡回タイミングの設定 (11:00時点の中間巡回なら True, 大引け後なら False)
+# パトロール巡回タイミングの設定 (11:00時点の中間巡回なら True, 大引け後なら False。実行時は --midday でも切り替え可)
 IS_MIDDAY_PATROL = False  # Trueにすると、当日出来高のフィルター倍率が「2.0倍」から「0.6倍」に緩和されます
+# 中間巡回で当日出来高を経過時間から終日分に換算する（換算した出来高は大引け後と同じ「2.0倍」で判定。--project-volume）
+PROJECT_MIDDAY_VOLUME = False
+
+
+def required_volume_ratio():
+    """当日出来高フィルターの倍率（中間巡回は途中までの出来高なので緩める。終日換算するなら大引け後と同じ）"""
+    return 0.6 if IS_MIDDAY_PATROL and not PROJECT_MIDDAY_VOLUME else 2.0
+
 
 # ==============================================================================
 # --- テクニカル指標計算関数群（高速ベクトル演算ベース） ---
 # ==============================================================================
+def _rci_windows(values, period):
+    """(銘柄数, 日数) の2次元配列に対し、全ウィンドウのRCIを一括計算する内部関数"""
+    n_rows, n_days = values.shape
+    out = np.full((n_rows, n_days), np.nan)
+    if n_days < period:
+        return out
+
+    windows = np.lib.stride_tricks.sliding_window_view(values, period, axis=1)
+    time_ranks = np.arange(period, 0, -1)
+    denom = period * (period**2 - 1)
+
+    # 比較テンソル (行, ウィンドウ, period, period) が巨大化しないよう行をブロック分割
+    block = max(1, (1 << 24) // (windows.shape[1] * period * period))
+    for r in range(0, n_rows, block):
+        w = windows[r:r+block]
+        # 降順・method='max' の順位 = ウィンドウ内で自分以上の値を持つ要素数
+        price_ranks = (w[..., None, :] >= w[..., :, None]).sum(axis=-1)
+        d2 = ((price_ranks - time_ranks) ** 2).sum(axis=-1)
+        rci = (1 - (6 * d2) / denom) * 100
+        rci[np.isnan(w).any(axis=-1)] = np.nan
+        out[r:r+block, period-1:] = rci
+    return out
+
+
+def _rci_sliding(values, period):
+    """銘柄数が多い行列向け: ウィンドウを1本ずつずらしながら順位だけを差分更新する内部関数
+
+    抜ける値・入る値と残りの値の比較だけで順位が更新できるため、1ステップ O(銘柄数×period)。
+    結果は _rci_windows と完全に一致する。
+    """
+    n_rows, n_days = values.shape
+    out = np.full((n_rows, n_days), np.nan)
+    if n_days < period:
+        return out
+    denom = period * (period**2 - 1)
+    slots = np.arange(period)
+
+    # リングバッファ: win[:, s] の値に対し、cnt[:, s] = ウィンドウ内で自分以上の値の数（= 降順max順位）
+    win = values[:, :period].copy()
+    cnt = (win[:, None, :] >= win[:, :, None]).sum(axis=-1)
+    nan_count = np.isnan(win).sum(axis=1)
+    oldest = 0
+    for t in range(period - 1, n_days):
+        if t >= period:
+            old, new = win[:, oldest].copy(), values[:, t]
+            cnt -= old[:, None] >= win
+            win[:, oldest] = new
+            cnt += new[:, None] >= win
+            cnt[:, oldest] = (win >= new[:, None]).sum(axis=1)
+            nan_count += np.isnan(new).astype(int) - np.isnan(old)
+            oldest = (oldest + 1) % period
+        time_ranks = period - (slots - oldest) % period
+        d2 = ((cnt - time_ranks) ** 2).sum(axis=1)
+        rci = (1 - (6 * d2) / denom) * 100
+        rci[nan_count > 0] = np.nan
+        out[:, t] = rci
+    return out
+
+
+def _rci_matrix(values, period):
+    """行数に応じて一括比較方式と差分更新方式を使い分ける"""
+    if values.shape[0] >= 16:
+        return _rci_sliding(values, period)
+    return _rci_windows(values, period)
+
+
 def calculate_rci(df_close, period):
-    """RCI (Rank Correlation Index) を計算する関数"""
-    def _rci_calc(window):
-        n = len(window)
-        if n < period:
-            return np.nan
-        price_ranks = pd.Series(window).rank(ascending=False, method='max').values
-        time_ranks = np.arange(n, 0, -1)
-        d2 = np.sum((price_ranks - time_ranks) ** 2)
-        return (1 - (6 * d2) / (n * (n**2 - 1))) * 100
+    """RCI (Rank Correlation Index) を計算する関数
 
-    return df_close.rolling(window=period).apply(_rci_calc, raw=True)
+    Series(日付) / DataFrame(日付×銘柄) / ndarray(銘柄×日数, 1次元も可) を受け付け、
+    スライディングウィンドウ上の順位付けをNumPyで一括処理する。
+    """
+    if isinstance(df_close, pd.DataFrame):
+        values = _rci_matrix(df_close.to_numpy(dtype=float).T, period)
+        return pd.DataFrame(values.T, index=df_close.index, columns=df_close.columns)
+    if isinstance(df_close, pd.Series):
+        values = _rci_matrix(df_close.to_numpy(dtype=float)[None, :], period)
+        return pd.Series(values[0], index=df_close.index, name=df_close.name)
+
+    arr = np.asarray(df_close, dtype=float)
+    values = _rci_matrix(np.atleast_2d(arr), period)
+    return values[0] if arr.ndim == 1 else values
 
 
 def calculate_psy(df_close, period=12):
@@ -40,21 +139,25 @@ def calculate_psy(df_close, period=12):
 
 
 def calculate_dmi(df_high, df_low, df_close, di_period=14, adx_period=9):
-    """DMI (+DI, -DI, ADX) を計算する関数（ADX期間=9で爆速化）"""
+    """DMI (+DI, -DI, ADX) を計算する関数（ADX期間=9で爆速化）
+
+    Series(日付) でも DataFrame(日付×銘柄) でも同じ式で全列を一括計算できる。
+    """
     up_move = df_high.diff()
     down_move = df_low.diff() * -1
 
-    plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0.0)
-    minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0.0)
+    plus_dm = up_move.where((up_move > down_move) & (up_move > 0), 0.0)
+    minus_dm = down_move.where((down_move > up_move) & (down_move > 0), 0.0)
 
     tr1 = df_high - df_low
     tr2 = (df_high - df_close.shift(1)).abs()
     tr3 = (df_low - df_close.shift(1)).abs()
-    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
+    # fmax は NaN を無視するため、先頭行は従来の concat().max(axis=1) と同じく tr1 になる
+    tr = np.fmax(np.fmax(tr1, tr2), tr3)
 
     tr_smooth = tr.rolling(window=di_period).sum()
-    plus_dm_smooth = pd.Series(plus_dm, index=df_close.index).rolling(window=di_period).sum()
-    minus_dm_smooth = pd.Series(minus_dm, index=df_close.index).rolling(window=di_period).sum()
+    plus_dm_smooth = plus_dm.rolling(window=di_period).sum()
+    minus_dm_smooth = minus_dm.rolling(window=di_period).sum()
 
     plus_di = (plus_dm_smooth / (tr_smooth + 1e-9)) * 100
     minus_di = (minus_dm_smooth / (tr_smooth + 1e-9)) * 100
@@ -66,235 +169,853 @@ def calculate_dmi(df_high, df_low, df_close, di_period=14, adx_period=9):
 
 
 # ==============================================================================
-# --- 酒田五法・ローソク足パターン判定関数 ---
+# --- 東証上場銘柄リストの取得 ---
 # ==============================================================================
-def detect_sakata_candlestick(open_p, high_p, low_p, close_p):
-    """直近のローソク足から酒田五法のエッセンスを判定する関数"""
-    body = abs(close_p - open_p)
-    total_range = high_p - low_p
-    if total_range == 0:
-        total_range = 1e-9
+def get_ticker_list():
+    """JPX公式からプライム・スタンダード銘柄のコードと銘柄名マッピングを取得（日次キャッシュ付き）"""
+    return load_universe()
+
 
-    upper_shaved = high_p - max(open_p, close_p)
-    lower_shaved = min(open_p, close_p) - low_p
+# ==============================================================================
+# --- Discord 通知管理 ---
+# ==============================================================================
+webhook = DiscordWebhook(DISCORD_WEBHOOK_URL)
 
-    if body <= (total_range * 0.1):
-        return True, True, "十字線(転換暗示)"
-    if lower_shaved >= (body * 2.0) and upper_shaved <= (body * 0.5):
-        return True, False, "下ヒゲ(底打ちシグナル)"
-    if upper_shaved >= (body * 2.0) and lower_shaved <= (body * 0.5):
-        return False, True, "上ヒゲ(天井警戒シグナル)"
 
-    return False, False, ""
+def send_discord(content):
+    """Discordの2000文字制限に合わせて改行位置で分割し、レート制限に従って順に送信する。全て届けば True"""
+    if not content:
+        return True
+    if not webhook.send(content):
+        metrics.error("discord", webhook.last_error)
+        return False
+    return True
 
 
 # ==============================================================================
-# --- 東証上場銘柄リストの取得 ---
+# --- 銘柄単位の判定ロジック ---
 # ==============================================================================
-def get_ticker_list():
-    """JPX公式からプライム・スタンダード銘柄のコードと銘柄名マッピングを取得"""
-    headers = {"User-Agent": "Mozilla/5.0"}
-    url = "https://www.jpx.co.jp/markets/statistics-equities/misc/tvdivq0000001vg2-att/data_j.xls"
-    try:
-        res = requests.get(url, headers=headers, timeout=20)
-        df = pd.read_excel(io.BytesIO(res.content))
-        target_df = df[df['市場・商品区分'].str.contains('プライム|スタンダード', na=False)]
-        return {f"{row['コード']}.T": row['銘柄名'] for _, row in target_df.iterrows()}
-    except Exception as e:
-        print(f"銘柄リスト取得失敗、バックアップを適用します: {e}")
-        return {"7203.T": "トヨタ自動車", "9984.T": "ソフトバンクG", "8306.T": "三菱UFJ"}
+RULE_LABELS = {
+    "A": "🏹 ルールA：【最優先】大底からの反転初動（即買い・鉄板）",
+    "B": "📈 ルールB：反転予兆（監視強化フラグ・マイフォルダー登録）",
+    "C": "🛑 ルールC：利益確定・下落警戒",
+}
+
+MIN_BARS = 65  # 判定に必要な最低本数（3ヶ月平均出来高60本 + 余裕）
 
 
 # ==============================================================================
-# --- Discord 通知管理 ---
+# --- 売買ルールの宣言的な定義（指標・条件式・優先順位） ---
 # ==============================================================================
-def send_discord(content):
-    """Discordの2000文字制限を回避しながら安全に分割送信する関数"""
-    if not content:
-        return
-    for i in range(0, len(content), 1900):
+# 指標: 末尾の行列（項目→(行×銘柄)）から計算し、条件式からは出力名の属性（c.rci9 など）で参照する。
+# cost は計測値が溜まるまでに使う1銘柄あたりの計算秒数の見込み
+INDICATORS = (
+    Indicator("rci9", ["rci9"], lambda t: [calculate_rci(t["Close"], 9).to_numpy()], cost=2e-5),
+    Indicator("rci27", ["rci27"], lambda t: [calculate_rci(t["Close"], 27).to_numpy()], cost=4e-5),
+    Indicator("psy12", ["psy"], lambda t: [calculate_psy(t["Close"], 12).to_numpy()], cost=1e-5),
+    Indicator("dmi", ["pdi", "mdi"],
+              lambda t: [x.to_numpy() for x in calculate_dmi(t["High"], t["Low"], t["Close"], di_period=14, adx_period=9)[:2]],
+              cost=1e-4),
+    # 条件式では使わず、ヒットした銘柄の通知テキスト（VWAP上下）にだけ使う
+    Indicator("vwap25", ["vwap25"],
+              lambda t: [((t["Close"] * t["Volume"]).rolling(25).sum() / t["Volume"].rolling(25).sum()).to_numpy()],
+              cost=2e-5),
+    # 週足・月足: 同じ日足から timeframes.Timeframes で作った行列で計算する（追加のダウンロードなし）
+    Indicator("rci9_w", ["rci9_w"], lambda t: [calculate_rci(t["Close"], 9).to_numpy()], cost=2e-5, timeframe="1wk"),
+    Indicator("rci27_w", ["rci27_w"], lambda t: [calculate_rci(t["Close"], 27).to_numpy()], cost=4e-5, timeframe="1wk"),
+    Indicator("psy12_w", ["psy_w"], lambda t: [calculate_psy(t["Close"], 12).to_numpy()], cost=1e-5, timeframe="1wk"),
+    Indicator("dmi_w", ["pdi_w", "mdi_w"],
+              lambda t: [x.to_numpy() for x in calculate_dmi(t["High"], t["Low"], t["Close"], di_period=14, adx_period=9)[:2]],
+              cost=1e-4, timeframe="1wk"),
+    Indicator("rci9_m", ["rci9_m"], lambda t: [calculate_rci(t["Close"], 9).to_numpy()], cost=2e-5, timeframe="1mo"),
+)
+# 週足・月足の指標（スナップショットの列名 → 出力名）。1年分の日足で月足 RCI9 の前月値まで求まる
+TIMEFRAME_COLUMNS = {
+    "rci9_w": "rci9_w", "rci27_w": "rci27_w", "psy12_w": "psy_w", "plus_di_w": "pdi_w", "minus_di_w": "mdi_w",
+    "rci9_m": "rci9_m",
+}
+
+
+def _dmi_narrowing(c, p):
+    return np.abs(c.pdi - c.mdi) < np.abs(p.pdi - p.mdi)
+
+
+# ルール: 並び順が優先順位（A→B→C）。c は当日値、p は前日値
+# 週足・月足の出力（c.rci27_w など。p は前週・前月の値）も条件に使えるが、行列判定（panel / staged）専用。
+# 銘柄ごとループ方式と rule_flags（バックテスト）は日足の時系列だけで判定する
+RULES = (
+    # --- 🏹 ルールA：大底からの反転初動 ---
+    Rule("A", [
+        Condition("rci27", ["rci27"], lambda c, p: c.rci27 >= -50),
+        Condition("rci9", ["rci9"], lambda c, p: ((p.rci9 <= -85) & (c.rci9 > p.rci9)) | ((p.rci9 < -50) & (c.rci9 >= -50))),
+        Condition("psy", ["psy"], lambda c, p: ((p.psy <= 26) & (c.psy > p.psy)) | ((p.psy <= 34) & (c.psy > p.psy))),
+        Condition("dmi", ["pdi", "mdi"], lambda c, p: _dmi_narrowing(c, p) | ((p.pdi < p.mdi) & (c.pdi >= c.mdi))),
+    ]),
+    # --- 📈 ルールB：反転予兆 ---
+    Rule("B", [
+        Condition("rci9", ["rci9"], lambda c, p: c.rci9 <= -80),
+        Condition("psy", ["psy"], lambda c, p: (25 <= c.psy) & (c.psy <= 35)),
+        Condition("dmi", ["pdi", "mdi"],
+                  lambda c, p: _dmi_narrowing(c, p) & np.where(c.pdi < c.mdi, p.pdi - p.mdi > 0, p.mdi - p.pdi > 0)),
+    ]),
+    # --- 🛑 ルールC：利益確定・下落警戒（いずれか1つ） ---
+    Rule("C", [
+        Condition("rci9_turn", ["rci9"], lambda c, p: (p.rci9 >= 85) & (c.rci9 < p.rci9)),
+        Condition("dc", ["rci9", "rci27"], lambda c, p: (p.rci9 > p.rci27) & (c.rci9 <= c.rci27) & (c.rci9 >= 70)),
+        Condition("psy", ["psy"], lambda c, p: (p.psy >= 75) & (c.psy < p.psy)),
+        Condition("rci27_turn", ["rci27"], lambda c, p: (p.rci27 >= 90) & (c.rci27 < p.rci27)),
+    ], mode="any"),
+)
+
+# 通知テキストに RCI を int() で載せるため、値の無い銘柄はルールが成立しても通知しない
+PRINTABLE = Condition("printable", ["rci9", "rci27"], lambda c, p: np.isfinite(c.rci9) & np.isfinite(c.rci27))
+
+# 行列判定で使う評価計画（統計は run_patrol が RULE_STATS_PATH から読み込み、終了時に保存する）
+rule_plan = RulePlan(INDICATORS, RULES, gate=PRINTABLE)
+
+
+def format_info_text(name, ticker, curr_price, avg_range_7d, c_rci9, c_rci27, c_vwap, candle_name):
+    """通知用テキスト作成（情報収集効率化のため7日平均値幅を追加）"""
+    candle_info = f" 【酒田五法: {candle_name}】" if candle_name else ""
+    vwap_status = " (VWAP下)" if curr_price < c_vwap else " (VWAP上)"
+    return f"・{name}({ticker}) {int(curr_price)}円 [7日平値幅:{int(avg_range_7d)}円] [RCI9:{int(c_rci9)}/RCI27:{int(c_rci27)}]{vwap_status}{candle_info}"
+
+
+def ticker_filter_step(df):
+    """1銘柄分のOHLCV(dropna済み)に足切りフィルターを順に適用し、落ちたステップ名（全通過は None）を返す"""
+    if len(df) < MIN_BARS:
+        return "length"
+
+    high_s = df['High']
+    low_s = df['Low']
+    vol_s = df['Volume']
+
+    curr_price = df['Close'].iloc[-1]
+
+    # 🔹 変更条件: 1ロット5円刻み以上で動く銘柄（東証ルールに基づく株価3,000円超に限定）
+    if curr_price <= 3000:
+        return "price"
+
+    # 🔹 追加条件: 7日平均で300ポイント(300円)以上変動する銘柄選定
+    # (1日の高値 - 安値) の直近7日間平均を算出
+    daily_range = high_s - low_s
+    avg_range_7d = daily_range.tail(7).mean()
+    if avg_range_7d < 300.0:
+        return "range"
+
+    # ==========================================
+    # 🛑 必須前提：出来高トリプルフィルター
+    # ==========================================
+    # 1. 最低流動性: 3ヶ月（60営業日）平均出来高が 50万株以上
+    avg_vol_3m = vol_s.tail(60).mean()
+    if avg_vol_3m < 500000:
+        return "vol_3m"
+
+    # 2. エネルギー: 当日出来高が3ヶ月平均の 2.0倍以上 (中間巡回時は0.6倍以上)
+    required_ratio = required_volume_ratio()
+    if vol_s.iloc[-1] < (avg_vol_3m * required_ratio):
+        return "vol_today"
+
+    # 3. 資金の定着: 直近5日間の移動平均出来高が3ヶ月平均の 1.2倍以上
+    avg_vol_5d = vol_s.tail(5).mean()
+    if avg_vol_5d < (avg_vol_3m * 1.2):
+        return "vol_5d"
+
+    return None
+
+
+def ticker_indicators(df):
+    """1銘柄分のテクニカル指標（マスピ2仕様）を計算し、判定に使う当日・前日の値を返す"""
+    close_s = df['Close']
+    high_s = df['High']
+    low_s = df['Low']
+    vol_s = df['Volume']
+
+    rci9 = calculate_rci(close_s, 9)
+    rci27 = calculate_rci(close_s, 27)
+    psy12 = calculate_psy(close_s, 12)
+    plus_di, minus_di, _ = calculate_dmi(high_s, low_s, close_s, di_period=14, adx_period=9)
+
+    # 25日VWAPの計算
+    vwap25 = (close_s * vol_s).rolling(25).sum() / vol_s.rolling(25).sum()
+
+    return {
+        "c_rci9": rci9.iloc[-1], "p_rci9": rci9.iloc[-2],
+        "c_rci27": rci27.iloc[-1], "p_rci27": rci27.iloc[-2],
+        "c_psy": psy12.iloc[-1], "p_psy": psy12.iloc[-2],
+        "c_pdi": plus_di.iloc[-1], "c_mdi": minus_di.iloc[-1],
+        "p_pdi": plus_di.iloc[-2], "p_mdi": minus_di.iloc[-2],
+        "c_vwap": vwap25.iloc[-1],
+    }
+
+
+def ticker_rules(df, ticker, name, ind):
+    """指標値と最終ローソク足から売買ルールを判定し、(ルールキー, 通知テキスト) か None を返す"""
+    close_s = df['Close']
+    high_s = df['High']
+    low_s = df['Low']
+    curr_price = close_s.iloc[-1]
+    avg_range_7d = (high_s - low_s).tail(7).mean()
+
+    c_rci9, p_rci9 = ind["c_rci9"], ind["p_rci9"]
+    c_rci27, p_rci27 = ind["c_rci27"], ind["p_rci27"]
+    c_psy, p_psy = ind["c_psy"], ind["p_psy"]
+    c_pdi, c_mdi = ind["c_pdi"], ind["c_mdi"]
+    p_pdi, p_mdi = ind["p_pdi"], ind["p_mdi"]
+    c_vwap = ind["c_vwap"]
+
+    # ==========================================
+    # --- 酒田五法・最終ローソク足判定（包み足は前日の足と比べる） ---
+    # ==========================================
+    is_bull_candle, is_bear_candle, candle_name = (
+        x[-1] for x in candle_flags(df['Open'].iloc[-2:], high_s.iloc[-2:], low_s.iloc[-2:], close_s.iloc[-2:]))
+
+    info_text = format_info_text(name, ticker, curr_price, avg_range_7d, c_rci9, c_rci27, c_vwap, candle_name)
+
+    # ==========================================
+    # 🎯 売買ルール判定ロジック（RULES の並び順 = 優先順位）
+    # ==========================================
+    c = SimpleNamespace(rci9=c_rci9, rci27=c_rci27, psy=c_psy, pdi=c_pdi, mdi=c_mdi)
+    p = SimpleNamespace(rci9=p_rci9, rci27=p_rci27, psy=p_psy, pdi=p_pdi, mdi=p_mdi)
+    key = next((rule.key for rule in RULES if rule.holds(c, p)), None)
+    if key is None:
+        return None
+    if key == "A" and is_bull_candle:
+        info_text += " ✨[酒田五法一致]"
+    if key == "C" and is_bear_candle:
+        info_text += " ⚠️[天井警戒一致]"
+    return key, info_text
+
+
+def evaluate_ticker(df, ticker, name):
+    """1銘柄分のOHLCV(dropna済み)からルール判定し、(ルールキー, 通知テキスト) か None を返す"""
+    with metrics.stage("filter"):
+        step = ticker_filter_step(df)
+    if step:
+        metrics.add_funnel({step: 1})
+        return None
+    with metrics.stage("indicators"):
+        ind = ticker_indicators(df)
+    with metrics.stage("rules"):
+        return ticker_rules(df, ticker, name, ind)
+
+
+def scan_chunk(data, chunk, ticker_map):
+    """従来の銘柄ごとループでチャンクを判定し、[(ticker, ルールキー, 通知テキスト)] を返す"""
+    hits = []
+    # 従来の判定と同じ値になるよう、価格は float64 のまま持つ
+    panel = OHLCVPanel.from_frame(data, chunk, dtype=float)
+    for ticker in chunk:
         try:
-            requests.post(DISCORD_WEBHOOK_URL, json={"content": content[i:i+1900]}, timeout=10)
+            if ticker not in panel.columns:
+                metrics.add_funnel({"missing": 1})
+                continue
+            df = panel.ticker_frame(ticker)
+            metrics.count("dropna_rows", panel.n_bars - len(df))
+            hit = evaluate_ticker(df, ticker, ticker_map[ticker])
+            if hit:
+                hits.append((ticker, *hit))
         except Exception as e:
-            print(f"Discord送信エラー: {e}")
-        time.sleep(1)
+            metrics.error("ticker_eval", e)
+            continue
+    return hits
+
+
+# ==============================================================================
+# --- パネル一括判定ロジック（全銘柄を日付×銘柄の行列で同時計算） ---
+# ==============================================================================
+def build_panel(data, tickers):
+    """yf.download(group_by='ticker') の結果を 項目→(日付×銘柄) のワイド行列に変換する
+
+    銘柄ごとの dropna() と同じ結果になるよう、各列の有効行を末尾へ詰めて右揃えにする。
+    戻り値は (項目→DataFrame の辞書, 銘柄ごとの有効本数 Series)。価格は float64 のまま扱う。
+    """
+    panel = OHLCVPanel.from_frame(data, tickers, dtype=float)
+    if not panel:
+        return {}, pd.Series(dtype=int)
+    return panel.tail(panel.n_bars), pd.Series(panel.lengths, index=panel.tickers)
+
+
+# 足切りフィルター: (段階名, 表示名, 通過条件)。条件は末尾の行列から作った集計値 x で判定する。
+# 足切り件数のレポートが段階ごとに意味を持つよう、並び順のとおりに適用する
+FILTERS = (
+    ("length", "本数不足", lambda x: x.lengths >= x.min_bars),
+    ("price", "株価3,000円以下", lambda x: x.close > 3000),
+    ("range", "7日平均値幅300円未満", lambda x: ~(x.avg_range_7d < 300.0)),
+    ("vol_3m", "3ヶ月平均出来高50万株未満", lambda x: ~(x.avg_vol_3m < 500000)),
+    # 当日出来高が3ヶ月平均の 2.0倍以上 (中間巡回時は0.6倍以上)
+    ("vol_today", "当日出来高の急増なし", lambda x: ~(x.vol_today < x.avg_vol_3m * required_volume_ratio())),
+    ("vol_5d", "5日平均出来高の定着なし", lambda x: ~(x.avg_vol_5d < x.avg_vol_3m * 1.2)),
+)
+FILTER_STEPS = {step: label for step, label, _ in FILTERS}
+
+
+def prefilter_panel(tail, lengths, min_bars=MIN_BARS):
+    """株価・値幅・出来高トリプルフィルター（FILTERS）を全銘柄へ一括適用する
+
+    tail は 項目→(日付×銘柄) の行列（末尾60本以上）。戻り値は (生存マスク, 段階ごとの除外数,
+    銘柄ごとに最初に落ちた段階名の配列（通過は ""）)。
+    除外数は FILTERS の順に、前段を通過した銘柄のうち落ちた数を数える。
+    """
+    h, l, c, v = (np.asarray(tail[f], dtype=float) for f in ("High", "Low", "Close", "Volume"))
+    x = SimpleNamespace(
+        lengths=np.asarray(lengths), min_bars=min_bars, close=c[-1], vol_today=v[-1],
+        avg_range_7d=(h[-7:] - l[-7:]).mean(axis=0),
+        avg_vol_3m=v[-60:].mean(axis=0),
+        avg_vol_5d=v[-5:].mean(axis=0),
+    )
+    survive = np.ones(c.shape[1], dtype=bool)
+    failed = np.full(c.shape[1], "", dtype=object)
+    removed = {}
+    for step, _, test in FILTERS:
+        dropped = survive & ~test(x)
+        removed[step] = int(dropped.sum())
+        failed[dropped] = step
+        survive &= ~dropped
+    return survive, removed, failed
+
+
+def rule_flags(rci9, rci27, psy12, plus_di, minus_di):
+    """指標の時系列(日付×銘柄)から、各バーでルールA/B/Cの条件が成立しているかを返す
+
+    RULES の全条件を全バーで評価する（A→B→C の優先順位は呼び出し側で付ける）。
+    前日値との比較を使うため、先頭バーは常に False になる。
+    """
+    c = SimpleNamespace(**{name: np.asarray(x, dtype=float) for name, x in
+                           zip(("rci9", "rci27", "psy", "pdi", "mdi"), (rci9, rci27, psy12, plus_di, minus_di))})
+    p = SimpleNamespace(**{name: shift_bars(x) for name, x in vars(c).items()})
+    return tuple(rule.holds(c, p) for rule in RULES)
+
+
+def timeframe_latest(tail, timeframes):
+    """週足・月足の指標の最新値を全列について計算し、{スナップショットの列名: 配列} で返す"""
+    values = PlanValues(tail, [ind for ind in INDICATORS if ind.timeframe != DAILY], timeframes)
+    curr, _ = values.take(TIMEFRAME_COLUMNS.values(), np.arange(values.n))
+    return {col: getattr(curr, out) for col, out in TIMEFRAME_COLUMNS.items()}
+
+
+def panel_latest(tail, timeframes=None):
+    """末尾 MIN_BARS 本の行列から、全列の最新バーの指標・ローソク足・ルール判定を一括計算する
+
+    戻り値は銘柄を索引とする DataFrame（1行1銘柄）。rule 列は A→B→C の優先順位で付けた
+    ルールキーで、通知テキストに int() 変換できない銘柄は従来どおり "" にする。
+    timeframes（同じ銘柄の Timeframes）を渡すと、週足・月足の指標の列（TIMEFRAME_COLUMNS）も加える。
+    """
+    close_df, high_df, low_df, vol_df = (tail[f] for f in ("Close", "High", "Low", "Volume"))
+    o, h, l, c, v = (tail[f].to_numpy() for f in ("Open", "High", "Low", "Close", "Volume"))
+
+    rci9 = calculate_rci(close_df, 9).to_numpy()
+    rci27 = calculate_rci(close_df, 27).to_numpy()
+    psy12 = calculate_psy(close_df, 12).to_numpy()
+    plus_di, minus_di, _ = calculate_dmi(high_df, low_df, close_df, di_period=14, adx_period=9)
+    plus_di, minus_di = plus_di.to_numpy(), minus_di.to_numpy()
+    vwap25 = ((close_df * vol_df).rolling(25).sum() / vol_df.rolling(25).sum()).to_numpy()
+
+    is_bull_candle, is_bear_candle, candle_name = (x[-1] for x in candle_flags(o[-2:], h[-2:], l[-2:], c[-2:]))
+    # 複数本のパターン（三兵・明星・はらみ線・毛抜きなど）は最長で3本を使う
+    codes = pattern_codes(candle_patterns(o[-3:], h[-3:], l[-3:], c[-3:]))[-1]
+    rule_a, rule_b, rule_c = flags = [x[-1] for x in rule_flags(rci9, rci27, psy12, plus_di, minus_di)]
+    printable = PRINTABLE.test(SimpleNamespace(rci9=rci9[-1], rci27=rci27[-1]), None)
+    rule_key = np.where(printable, np.select(flags, [rule.key for rule in RULES], ""), "")
+
+    avg_vol_3m = v[-60:].mean(axis=0)
+    latest = pd.DataFrame({
+        "close": c[-1],
+        "avg_range_7d": (h[-7:] - l[-7:]).mean(axis=0),
+        "avg_vol_3m": avg_vol_3m,
+        "vol_ratio": v[-1] / avg_vol_3m,
+        "rci9": rci9[-1],
+        "rci27": rci27[-1],
+        "psy12": psy12[-1],
+        "plus_di": plus_di[-1],
+        "minus_di": minus_di[-1],
+        "vwap25": vwap25[-1],
+        "candle": candle_name,
+        "bull_candle": is_bull_candle,
+        "bear_candle": is_bear_candle,
+        "patterns": [describe(code) for code in codes],
+        "rule_a": rule_a,
+        "rule_b": rule_b,
+        "rule_c": rule_c,
+        "rule": rule_key,
+    }, index=close_df.columns)
+    if timeframes is not None:
+        latest = latest.assign(**timeframe_latest(tail, timeframes))
+    return latest
+
+
+def plan_hits(tail, survive, timeframes=None):
+    """rule_plan で survive の銘柄を判定し、ヒットした銘柄だけ panel_latest と同じ列（通知テキスト用）で返す
+
+    指標は条件の評価に必要になった銘柄の分だけ計算し、通知テキストの値もその計算結果を使う。
+    """
+    keys, values = rule_plan.evaluate(tail, survive, timeframes)
+    cols = np.flatnonzero(keys != "")
+    o, h, l, c = (tail[f].to_numpy()[:, cols] for f in ("Open", "High", "Low", "Close"))
+    is_bull_candle, is_bear_candle, candle_name = (x[-1] for x in candle_flags(o[-2:], h[-2:], l[-2:], c[-2:]))
+    curr, _ = values.take(("rci9", "rci27", "vwap25"), cols)
+    return pd.DataFrame({
+        "close": c[-1],
+        "avg_range_7d": (h[-7:] - l[-7:]).mean(axis=0),
+        "rci9": curr.rci9,
+        "rci27": curr.rci27,
+        "vwap25": curr.vwap25,
+        "candle": candle_name,
+        "bull_candle": is_bull_candle,
+        "bear_candle": is_bear_candle,
+        "rule": keys[cols],
+    }, index=tail["Close"].columns[cols])
+
+
+def evaluate_panel(panel, ticker_map):
+    """OHLCVPanel から全銘柄のフィルター・指標・ルールを一括判定する
+
+    戻り値は scan_chunk と同じ [(ticker, ルールキー, 通知テキスト)]（列順）。
+    スナップショットの記録中は、フィルターで落ちた銘柄の指標も計算して記録する。
+    記録しないときは rule_plan で判定し、指標は条件の評価に必要な銘柄の分だけ計算する。
+    週足・月足はこのパネルの日足から、使う指標が出てきた時点で作る（追加のダウンロードはしない）。
+    """
+    if not panel:
+        return []
+    if panel.n_bars < MIN_BARS:
+        metrics.add_funnel({"length": len(panel)})
+        return []
+
+    # 末尾 MIN_BARS 本だけで全指標の最終2本が確定する（RCI27/DMI14/VWAP25 より長い）
+    # float64 の行列に展開するのはこの末尾部分だけ
+    with metrics.stage("filter"):
+        tail = panel.tail(MIN_BARS)
+        survive, removed, failed = prefilter_panel(tail, panel.lengths)
+    timeframes = Timeframes(panel, tail)
+    metrics.add_funnel(removed)
+    if not survive.any() and not snapshot.enabled:
+        return []
+
+    with metrics.stage("indicators"):
+        if snapshot.enabled:
+            latest = panel_latest(tail, timeframes)
+            snapshot.add(latest.assign(filter=failed))
+            latest = latest[survive & (latest["rule"] != "").to_numpy()]
+        else:
+            latest = plan_hits(tail, survive, timeframes)
+
+    with metrics.stage("rules"):
+        hits = []
+        for ticker, row in latest.iterrows():
+            key = row["rule"]
+            info_text = format_info_text(ticker_map[ticker], ticker, row["close"], row["avg_range_7d"],
+                                         row["rci9"], row["rci27"], row["vwap25"], row["candle"])
+            if key == "A" and row["bull_candle"]:
+                info_text += " ✨[酒田五法一致]"
+            if key == "C" and row["bear_candle"]:
+                info_text += " ⚠️[天井警戒一致]"
+            hits.append((ticker, key, info_text))
+    return hits
+
+
+def chunk_panel(data, chunk, counter="dropna_rows"):
+    """チャンクを OHLCVPanel に変換し、dropna() 相当で落ちた行数を counter に記録する"""
+    panel = OHLCVPanel.from_frame(data, chunk)
+    if panel:
+        metrics.count(counter, int(panel.n_bars * len(panel) - panel.lengths.sum()))
+    return panel
+
+
+def submit_chunk_panel(pool, data, chunk, ticker_map):
+    """チャンクを OHLCVPanel に変換し、(evaluate_panel を pool へ投入した Future, データのあった銘柄) を返す"""
+    panel = chunk_panel(data, chunk)
+    metrics.add_funnel({"missing": len(chunk) - len(panel)})
+    return pool.submit(evaluate_panel, panel, {t: ticker_map[t] for t in panel.tickers}), panel.tickers
+
+
+def scan_chunk_panel(data, chunk, ticker_map):
+    """パネル一括モードでチャンクを判定し、scan_chunk と同じ形式で返す"""
+    pool = PanelPool(workers=1)
+    future, _ = submit_chunk_panel(pool, data, chunk, ticker_map)
+    return pool.result(future)
+
+
+# ==============================================================================
+# --- チェックポイント付きのチャンク実行（再開・取得エラーの取り直し） ---
+# ==============================================================================
+RETRY_CHUNK_SIZE = 20  # 取得エラーになったチャンクの銘柄は、最後にこの大きさに分けてもう一度だけ取り直す
+
+
+class _ChunkTrace:
+    """判定中にメインスレッドで記録された足切り件数とスナップショット行を、チャンクごとに取り分ける
+
+    逐次実行では投入時、ワーカー実行では結果の受け取り時に記録されるので、その両方を囲んで使う。
+    """
+
+    def __init__(self):
+        self.funnel = Counter()
+        self.rows = []
+
+    @contextmanager
+    def __call__(self):
+        funnel, n_rows = Counter(metrics.funnel), len(snapshot.frames)
+        try:
+            yield
+        finally:
+            self.funnel.update(Counter(metrics.funnel) - funnel)
+            self.rows.extend(snapshot.frames[n_rows:])
+
+
+def run_chunks(stage, tickers, fetch, submit, pool, downloader, checkpoint=None, chunk_size=100, progress="判定中",
+               error_stage="download"):
+    """tickers をチャンクごとに取得・判定し、全チャンクの結果を [(銘柄リスト, 結果)] で返す
+
+    submit(data, chunk) は (判定の Future, データのあった銘柄) を返し、結果は pool.result() で受け取る。
+    checkpoint があれば判定の終わったチャンクごとに、結果・足切り件数・スナップショット行と
+    銘柄ごとの状態を stage の名前で記録する。記録済みの銘柄は取得せず、前回の結果（足切り件数・
+    スナップショット行も）をそのまま使うので、途中で止まった巡回を再実行しても最終結果は変わらない。
+    取得エラーのチャンクの銘柄は最後に RETRY_CHUNK_SIZE ずつに分けて取り直し（1銘柄の不具合で
+    チャンク全体を失わないように）、それでも失敗した銘柄だけを除外する。
+    """
+    results, statuses = [], {}
+    if checkpoint is not None:
+        for chunk, (value, funnel, rows) in checkpoint.results(stage):
+            metrics.add_funnel(funnel)
+            for frame in rows:
+                snapshot.add(frame)
+            results.append((chunk, value))
+        statuses = checkpoint.statuses(stage)
+        if statuses:
+            metrics.count(f"resumed_{stage}", len(statuses))
+    todo = [t for t in tickers if t not in statuses]
+    retry = [t for t in tickers if statuses.get(t) == "failed"]
+
+    def finish(chunk, present, future, trace):
+        with trace():
+            value = pool.result(future)
+        if checkpoint is not None:
+            present = set(present)
+            checkpoint.record(stage, chunk, (value, dict(trace.funnel), trace.rows),
+                              {t: "ok" if t in present else "missing" for t in chunk})
+        results.append((chunk, value))
+
+    def scan(chunks, total, final):
+        pending = []
+        done = 0
+        for chunk, data, error in downloader.iter_fetch(fetch, chunks):
+            done += len(chunk)
+            print(f"{progress}: {done}/{total} 銘柄...")
+            if error is not None:
+                print(f"データ取得エラー: {error}")
+                metrics.error(error_stage, error)
+                if final:
+                    metrics.count("failed_tickers", len(chunk))
+                else:
+                    retry.extend(chunk)
+                if checkpoint is not None:
+                    checkpoint.mark(stage, chunk, "gave_up" if final else "failed", str(error)[:200])
+                continue
+            trace = _ChunkTrace()
+            with trace():
+                future, present = submit(data, chunk)
+            pending.append((chunk, present, future, trace))
+            # 判定の終わったチャンクから記録していく（途中で止まっても、そこまでの結果が残る）
+            while pending and pending[0][2].done():
+                finish(*pending.pop(0))
+        for item in pending:
+            finish(*item)
+
+    scan(split_chunks(todo, chunk_size), len(todo), final=False)
+    if retry:
+        retry.sort(key={t: n for n, t in enumerate(tickers)}.get)
+        print(f"取得エラーの {len(retry)} 銘柄を {RETRY_CHUNK_SIZE} 銘柄ずつ取り直します...")
+        metrics.count("retried_tickers", len(retry))
+        scan(split_chunks(retry, RETRY_CHUNK_SIZE), len(retry), final=True)
+    return results
+
+
+# ==============================================================================
+# --- 2段階パイプライン（短期データで足切り → 生き残りだけ長期データで判定） ---
+# ==============================================================================
+PREFILTER_PERIOD = "4mo"  # フィルター判定に必要な60本 + 余裕
+PREFILTER_BARS = 60
+
+
+def prefilter_chunk(data, chunk):
+    """短期データで価格・出来高フィルターを一括適用し、(生き残り銘柄, 段階ごとの除外数) を返す"""
+    panel = chunk_panel(data, chunk, "dropna_rows_prefilter")
+    return prefilter_stage(panel, missing=len(chunk) - len(panel))
+
+
+def prefilter_stage(panel, missing=0):
+    """prefilter_chunk の行列判定部分（ワーカープロセスでも実行できるよう OHLCVPanel だけを受け取る）
+
+    有効本数が60本未満の銘柄は短期データでは判定できないため、除外せず第2段階へ回す。
+    """
+    removed = {step: 0 for step in FILTER_STEPS}
+    removed["missing"] = missing
+    if not panel:
+        metrics.add_funnel(removed)
+        return [], removed
+
+    n_valid = panel.lengths
+    undecided = (n_valid > 0) & (n_valid < PREFILTER_BARS)
+    if panel.n_bars >= PREFILTER_BARS:
+        tail = panel.tail(PREFILTER_BARS)
+        survive, step_removed, failed = prefilter_panel(tail, n_valid, min_bars=PREFILTER_BARS)
+        step_removed["length"] -= int(undecided.sum())
+        removed.update(step_removed)
+        survive |= undecided
+        if snapshot.enabled:
+            # 足切りされた銘柄も、短期データの末尾60本で最新指標を記録しておく（生き残りは第2段階の値で上書き）
+            # 週足・月足の指標は短期データでは本数が足りないため、第2段階で判定した銘柄にだけ付く
+            with metrics.stage("snapshot"):
+                snapshot.add(panel_latest(tail).assign(filter=failed))
+    else:
+        survive = n_valid > 0
+    metrics.add_funnel(removed)
+    return [t for t, ok in zip(panel.tickers, survive) if ok], removed
+
+
+def run_staged_scan(tickers, ticker_map, fetch_short, fetch_long, chunk_size=100, downloader=None, pool=None,
+                    checkpoint=None):
+    """第1段階: 全銘柄を短期データで足切り / 第2段階: 生き残りだけ長期データで指標・ルール判定
+
+    fetch_short / fetch_long は銘柄リストを受け取り group_by='ticker' 形式のフレームを返す関数。
+    チャンクは downloader で並列取得し、届いた順に pool のワーカーへ判定を投入する
+    （結果は銘柄リスト順に並べ直す）。checkpoint があれば段階ごとに途中経過を記録・再開する（run_chunks）。
+    戻り値は (ヒット一覧, 段階ごとの件数レポート)。
+    """
+    downloader = downloader or ChunkDownloader()
+    pool = pool or PanelPool(workers=1)
+    fetch_short = metrics.timed_fetch("download_short", fetch_short)
+    fetch_long = metrics.timed_fetch("download", fetch_long)
+    order = {t: n for n, t in enumerate(tickers)}
+    report = {"universe": len(tickers), "stage1_removed": {step: 0 for step in ["missing", *FILTER_STEPS]}}
+
+    def submit_prefilter(data, chunk):
+        panel = chunk_panel(data, chunk, "dropna_rows_prefilter")
+        return pool.submit(prefilter_stage, panel, len(chunk) - len(panel)), panel.tickers
+
+    survivors = []
+    for _, (passed, removed) in run_chunks("stage1", tickers, fetch_short, submit_prefilter, pool, downloader,
+                                           checkpoint, chunk_size, "第1段階 足切り中", "download_short"):
+        survivors.extend(passed)
+        for step, n in removed.items():
+            report["stage1_removed"][step] += n
+    survivors.sort(key=order.get)
+    report["stage1_survivors"] = len(survivors)
+    print(f"第1段階完了: {len(tickers)} 銘柄 → {len(survivors)} 銘柄")
+
+    scanned = run_chunks("stage2", survivors, fetch_long, partial(submit_chunk_panel, pool, ticker_map=ticker_map),
+                         pool, downloader, checkpoint, chunk_size, "第2段階 判定中")
+    hits = [hit for _, chunk_hits in scanned for hit in chunk_hits]
+    hits.sort(key=lambda hit: order[hit[0]])
+    report["stage2_hits"] = len(hits)
+    report["stage2_removed"] = len(survivors) - len(hits)
+    return hits, report
+
+
+def print_stage_report(report):
+    """2段階パイプラインで各段階が何銘柄を除外したかを表示する"""
+    print(f"対象銘柄数: {report['universe']}")
+    removed = report["stage1_removed"]
+    print(f"  第1段階 データなし: -{removed['missing']}")
+    for step, label in FILTER_STEPS.items():
+        print(f"  第1段階 {label}: -{removed[step]}")
+    print(f"第1段階 通過: {report['stage1_survivors']}")
+    print(f"  第2段階 ルール非該当・本数不足: -{report['stage2_removed']}")
+    print(f"第2段階 ヒット: {report['stage2_hits']}")
 
 
 # ==============================================================================
 # --- メインロジック ---
 # ==============================================================================
-def main():
+# スキャン方式: "staged" = 短期データで足切り後に生き残りだけ判定（既定）
+#              "panel" = 行列一括計算 / "ticker" = 従来の銘柄ごとループ
+SCAN_MODE = "staged"
+# ローカルOHLCVストア: True なら保存済み履歴を読み、不足日だけを差分取得する
+USE_LOCAL_STORE = True
+# 通知済みシグナルの記録: True なら前回までに通知し、その後も続いているシグナルは詳細を省く
+USE_ALERT_STORE = True
+ALERT_TTL_HOURS = 96  # シグナルがこの時間（土日・連休をまたぐ長さ）途切れたら、再び新規として通知する
+# 途中経過の記録: True ならチャンクごとの結果を CHECKPOINT_PATH に記録し、異常終了後の再実行では続きから再開する
+USE_CHECKPOINT = True
+
+
+def patrol_name():
+    return "midday" if IS_MIDDAY_PATROL else "close"
+
+
+def split_repeated(hits, store):
+    """hits を (新規シグナル, 通知済みで継続中のシグナル, 新規分の記録キー) に分ける
+
+    継続中のシグナルは見るたびに期限を延ばすので、出続けている間は何日たっても再通知しない。
+    """
+    patrol = patrol_name()
+    keys = [f"patrol:{patrol}:{ticker}:{key}" for ticker, key, _ in hits]
+    new = set(store.claim(keys, ttl=ALERT_TTL_HOURS * 3600, refresh=True))
+    fresh = [hit for hit, k in zip(hits, keys) if k in new]
+    repeated = [hit for hit, k in zip(hits, keys) if k not in new]
+    return fresh, repeated, sorted(new)
+
+
+def make_fetchers(store=None):
+    """(短期データ取得関数, 1年データ取得関数) を返す。ストアがあれば差分更新したローカル履歴を使う"""
+    if store:
+        def fetch_short(chunk):
+            store.update(chunk, period="1y")
+            return store.load_recent(chunk, PREFILTER_PERIOD)
+        return fetch_short, lambda chunk: store.load_recent(chunk, "1y")
+
+    def download(period):
+        return lambda chunk: yf.download(chunk, period=period, interval="1d", progress=False, group_by='ticker')
+    return download(PREFILTER_PERIOD), download("1y")
+
+
+def main(report_path=REPORT_PATH, profile_path=None, snapshot_path=None, workers=SCAN_WORKERS, shard=None,
+         shard_dir=SHARD_DIR):
+    """パトロール本体。実行後、段階ごとの計測値を report_path に JSON で書き出す
+
+    snapshot_path を指定すると、全銘柄の最新指標・フィルター結果・ルール判定を
+    列ごとの .npy としてそこへ保存する（app.py のスクリーナーが読む）。その場合はフィルターで
+    落ちた銘柄も含めて全指標を計算するので、rule_plan による指標計算の省略は効かない。
+    workers は行列判定に使うプロセス数（1 なら逐次実行）。
+    shard=(i, N) なら銘柄リストを N 分割したうちの i 番目だけを判定し、通知はせずに部分結果を
+    shard_dir へ書き出す（N 個揃ったら merge_shards() で1回分の通知にまとめる）。
+    """
+    with profiled(profile_path):
+        run_patrol(snapshot_path, workers, shard, shard_dir)
+    if report_path:
+        metrics.write(report_path, extra={"scan_mode": SCAN_MODE, "midday": IS_MIDDAY_PATROL,
+                                          "project_volume": IS_MIDDAY_PATROL and PROJECT_MIDDAY_VOLUME, "workers": workers,
+                                          "shard": f"{shard[0]}/{shard[1]}" if shard else None})
+        print(f"実行レポートを {report_path} に保存しました。")
+
+
+def run_patrol(snapshot_path=None, workers=1, shard=None, shard_dir=SHARD_DIR):
+    metrics.reset()
+    # 銘柄ごとループ方式は最新指標を行列で持たないため、スナップショットは記録しない
+    snapshot.reset(enabled=bool(snapshot_path) and SCAN_MODE != "ticker")
     jst = timezone(timedelta(hours=9))
     current_time_str = datetime.now(jst).strftime('%Y/%m/%d %H:%M')
     print(f"[{current_time_str}] パトロールを開始します...")
+    # 前回までの条件通過率・指標計算時間で評価順を決める（ワーカーはプール起動時の値を引き継ぐ）
+    rule_plan.stats = RuleStats.load(RULE_STATS_PATH)
 
-    ticker_map = get_ticker_list()
+    with metrics.stage("universe"):
+        ticker_map = get_ticker_list()
     tickers = list(ticker_map.keys())
+    order = {t: n for n, t in enumerate(tickers)}
+    full_key = universe_key(tickers)
+    if shard is not None:
+        tickers = select_shard(tickers, *shard)
+        print(f"分割巡回 {shard[0]}/{shard[1]}: {len(order)} 銘柄のうち {len(tickers)} 銘柄を判定します")
+    # 分割巡回では自分の担当分だけを数える（merge_shards で足し合わせると全銘柄数になる）
+    metrics.count("universe", len(tickers))
 
-    results = {
-        "🏹 ルールA：【最優先】大底からの反転初動（即買い・鉄板）": [],
-        "📈 ルールB：反転予兆（監視強化フラグ・マイフォルダー登録）": [],
-        "🛑 ルールC：利益確定・下落警戒": []
-    }
-    copy_lists = {"A": [], "B": [], "C": []}
+    store = OHLCVStore() if USE_LOCAL_STORE else None
+    fetch_short, fetch_long = make_fetchers(store)
+    scan_mode = SCAN_MODE
+    if IS_MIDDAY_PATROL and store is not None:
+        # 中間巡回: ストアの日足に当日の暫定足だけを重ねて判定する（1年分を取り直さないので、足切り用の短期取得も不要）
+        fetch_long = LiveBars(store, project_volume=PROJECT_MIDDAY_VOLUME)
+        scan_mode = "panel" if SCAN_MODE == "staged" else SCAN_MODE
+        if PROJECT_MIDDAY_VOLUME:
+            print(f"当日出来高を終日分に換算します（×{fetch_long.scale:.2f}）")
 
-    chunk_size = 100
-    for i in range(0, len(tickers), chunk_size):
-        chunk = tickers[i:i+chunk_size]
-        print(f"スキャン進行中: {i}/{len(tickers)} 銘柄...")
-        try:
-            data = yf.download(chunk, period="1y", interval="1d", progress=False, group_by='ticker')
-            
-            for ticker in chunk:
-                try:
-                    if ticker not in data.columns.get_level_values(0):
-                        continue
-                    
-                    df = data[ticker].dropna()
-                    if len(df) < 65:
-                        continue
-
-                    close_s = df['Close']
-                    high_s = df['High']
-                    low_s = df['Low']
-                    vol_s = df['Volume']
-
-                    curr_price = close_s.iloc[-1]
-
-                    # 🔹 変更条件: 1ロット5円刻み以上で動く銘柄（東証ルールに基づく株価3,000円超に限定）
-                    if curr_price <= 3000:
-                        continue
-
-                    # 🔹 追加条件: 7日平均で300ポイント(300円)以上変動する銘柄選定
-                    # (1日の高値 - 安値) の直近7日間平均を算出
-                    daily_range = high_s - low_s
-                    avg_range_7d = daily_range.tail(7).mean()
-                    if avg_range_7d < 300.0:
-                        continue
-
-                    # ==========================================
-                    # 🛑 必須前提：出来高トリプルフィルター
-                    # ==========================================
-                    # 1. 最低流動性: 3ヶ月（60営業日）平均出来高が 50万株以上
-                    avg_vol_3m = vol_s.tail(60).mean()
-                    if avg_vol_3m < 500000:
-                        continue
-
-                    # 2. エネルギー: 当日出来高が3ヶ月平均の 2.0倍以上 (中間巡回時は0.6倍以上)
-                    required_ratio = 0.6 if IS_MIDDAY_PATROL else 2.0
-                    if vol_s.iloc[-1] < (avg_vol_3m * required_ratio):
-                        continue
-
-                    # 3. 資金の定着: 直近5日間の移動平均出来高が3ヶ月平均の 1.2倍以上
-                    avg_vol_5d = vol_s.tail(5).mean()
-                    if avg_vol_5d < (avg_vol_3m * 1.2):
-                        continue
-
-                    # ==========================================
-                    # --- テクニカルインジケーター計算（マスピ2仕様） ---
-                    # ==========================================
-                    rci9 = calculate_rci(close_s, 9)
-                    rci27 = calculate_rci(close_s, 27)
-                    psy12 = calculate_psy(close_s, 12)
-                    plus_di, minus_di, _ = calculate_dmi(high_s, low_s, close_s, di_period=14, adx_period=9)
-
-                    c_rci9, p_rci9 = rci9.iloc[-1], rci9.iloc[-2]
-                    c_rci27, p_rci27 = rci27.iloc[-1], rci27.iloc[-2]
-                    c_psy, p_psy = psy12.iloc[-1], psy12.iloc[-2]
-                    c_pdi, c_mdi = plus_di.iloc[-1], minus_di.iloc[-1]
-                    p_pdi, p_mdi = plus_di.iloc[-2], minus_di.iloc[-2]
-
-                    # 25日VWAPの計算
-                    vwap25 = (close_s * vol_s).rolling(25).sum() / vol_s.rolling(25).sum()
-                    c_vwap = vwap25.iloc[-1]
-
-                    # ==========================================
-                    # --- 酒田五法・最終ローソク足判定 ---
-                    # ==========================================
-                    is_bull_candle, is_bear_candle, candle_name = detect_sakata_candlestick(
-                        df['Open'].iloc[-1], high_s.iloc[-1], low_s.iloc[-1], curr_price
-                    )
-                    
-                    is_engulfing_bull = (close_s.iloc[-1] > df['Open'].iloc[-1]) and \
-                                        (df['Open'].iloc[-1] <= close_s.iloc[-2]) and \
-                                        (close_s.iloc[-1] >= df['Open'].iloc[-2]) and \
-                                        (close_s.iloc[-2] < df['Open'].iloc[-2])
-                                        
-                    is_engulfing_bear = (close_s.iloc[-1] < df['Open'].iloc[-1]) and \
-                                        (df['Open'].iloc[-1] >= close_s.iloc[-2]) and \
-                                        (close_s.iloc[-1] <= df['Open'].iloc[-2]) and \
-                                        (close_s.iloc[-2] > df['Open'].iloc[-2])
-
-                    if is_engulfing_bull:
-                        is_bull_candle, candle_name = True, "陽線の包み足(抱き線)"
-                    if is_engulfing_bear:
-                        is_bear_candle, candle_name = True, "陰線の包み足(抱き線)"
-
-                    # 通知用テキスト作成（情報収集効率化のため7日平均値幅を追加）
-                    candle_info = f" 【酒田五法: {candle_name}】" if candle_name else ""
-                    vwap_status = " (VWAP下)" if curr_price < c_vwap else " (VWAP上)"
-                    info_text = f"・{ticker_map[ticker]}({ticker}) {int(curr_price)}円 [7日平値幅:{int(avg_range_7d)}円] [RCI9:{int(c_rci9)}/RCI27:{int(c_rci27)}]{vwap_status}{candle_info}"
-                    code_raw = ticker.replace(".T", "")
-
-                    # ==========================================
-                    # 🎯 売買ルール判定ロジック
-                    # ==========================================
-                    
-                    # --- 🏹 ルールA：大底からの反転初動 ---
-                    cond_a_rci27 = (c_rci27 >= -50)
-                    cond_a_rci9 = (p_rci9 <= -85 and c_rci9 > p_rci9) or (p_rci9 < -50 and c_rci9 >= -50)
-                    cond_a_psy = (p_psy <= 26 and c_psy > p_psy) or (p_psy <= 34 and c_psy > p_psy)
-                    cond_a_dmi = (abs(c_pdi - c_mdi) < abs(p_pdi - p_mdi)) or (p_pdi < p_mdi and c_pdi >= c_mdi)
-
-                    if cond_a_rci27 and cond_a_rci9 and cond_a_psy and cond_a_dmi:
-                        if is_bull_candle:
-                            info_text += " ✨[酒田五法一致]"
-                        results["🏹 ルールA：【最優先】大底からの反転初動（即買い・鉄板）"].append(info_text)
-                        copy_lists["A"].append(code_raw)
-                        continue
-
-                    # --- 📈 ルールB：反転予兆 ---
-                    cond_b_rci9 = (c_rci9 <= -80)
-                    cond_b_psy = (25 <= c_psy <= 35)
-                    cond_b_dmi = (abs(c_pdi - c_mdi) < abs(p_pdi - p_mdi)) and (p_pdi - p_mdi > 0 if c_pdi < c_mdi else p_mdi - p_pdi > 0)
-
-                    if cond_b_rci9 and cond_b_psy and cond_b_dmi:
-                        results["📈 ルールB：反転予兆（監視強化フラグ・マイフォルダー登録）"].append(info_text)
-                        copy_lists["B"].append(code_raw)
-                        continue
-
-                    # --- 🛑 ルールC：利益確定・下落警戒 ---
-                    cond_c_rci9_turn = (p_rci9 >= 85 and c_rci9 < p_rci9)
-                    cond_c_dc = (p_rci9 > p_rci27 and c_rci9 <= c_rci27 and c_rci9 >= 70)
-                    cond_c_psy = (p_psy >= 75 and c_psy < p_psy)
-                    cond_c_rci27_turn = (p_rci27 >= 90 and c_rci27 < p_rci27)
-
-                    if cond_c_rci9_turn or cond_c_dc or cond_c_psy or cond_c_rci27_turn:
-                        if is_bear_candle:
-                            info_text += " ⚠️[天井警戒一致]"
-                        results["🛑 ルールC：利益確定・下落警戒"].append(info_text)
-                        copy_lists["C"].append(code_raw)
-
-                except Exception:
-                    continue
-        except Exception as e:
-            print(f"データ取得エラー: {e}")
-        time.sleep(1)
+    downloader = ChunkDownloader()
+    checkpoint = None
+    if USE_CHECKPOINT:
+        # 同じ日・同じ巡回種別・同じ銘柄リストの途中経過があれば、そこから再開する
+        run_key = f"{datetime.now(jst):%Y-%m-%d}:{patrol_name()}:{scan_mode}:{universe_key(tickers)}"
+        checkpoint = PatrolCheckpoint(shard_file(CHECKPOINT_PATH, *shard) if shard else CHECKPOINT_PATH, run_key)
+        if checkpoint.resumed:
+            print("前回の途中経過が見つかりました。続きから再開します。")
+
+    # 判定用のワーカープロセスは、ダウンロード用スレッドが動き出す前に起動しておく
+    with PanelPool(workers if scan_mode != "ticker" else 1) as pool:
+        if scan_mode == "staged":
+            hits, report = run_staged_scan(tickers, ticker_map, fetch_short, fetch_long, downloader=downloader, pool=pool,
+                                           checkpoint=checkpoint)
+            print_stage_report(report)
+        else:
+            if scan_mode == "panel":
+                submit = partial(submit_chunk_panel, pool, ticker_map=ticker_map)
+            else:
+                def submit(data, chunk):
+                    # 銘柄ごとループ方式のプールは workers=1 なので、submit の場で判定される
+                    present = set(data.columns.get_level_values(0)) if isinstance(data.columns, pd.MultiIndex) else set()
+                    return pool.submit(scan_chunk, data, chunk, ticker_map), [t for t in chunk if t in present]
+            scanned = run_chunks("scan", tickers, metrics.timed_fetch("download", fetch_long), submit, pool, downloader,
+                                 checkpoint, progress="スキャン進行中")
+            hits = [hit for _, chunk_hits in scanned for hit in chunk_hits]
+            hits.sort(key=lambda hit: order[hit[0]])
+    if metrics.counters["failed_tickers"]:
+        print(f"取り直しても取得できなかった銘柄: {metrics.counters['failed_tickers']}")
+
+    if shard is not None:
+        # 条件通過率の記録・通知・通知履歴は、全分割の結果を揃えた merge_shards でまとめて行う
+        path = write_shard(shard, shard_dir, hits, order, ticker_map,
+                           {"started_at": current_time_str, "scan_mode": scan_mode, "universe": len(order),
+                            "universe_key": full_key, "tickers": len(tickers)})
+        if checkpoint is not None:
+            checkpoint.clear()
+            checkpoint.close()
+        print(f"分割巡回 {shard[0]}/{shard[1]} の部分結果を {path} に保存しました。")
+        return
+
+    if rule_plan.stats.absorb(metrics.to_dict()):
+        rule_plan.stats.save(RULE_STATS_PATH)
+
+    if snapshot.enabled:
+        with metrics.stage("snapshot"):
+            info = snapshot.write(snapshot_path, names=ticker_map,
+                                  meta={"midday": IS_MIDDAY_PATROL, "scan_mode": scan_mode})
+        metrics.count("snapshot_rows", info["rows"])
+        print(f"指標スナップショット({info['rows']} 銘柄)を {snapshot_path} に保存しました。")
+
+    sent = deliver(hits, current_time_str)
+    if checkpoint is not None:
+        # 通知まで終わった巡回の途中経過は消す（届かなかった場合は残し、再実行で判定をやり直さずに送り直す）
+        if sent:
+            checkpoint.clear()
+        checkpoint.close()
+    if sent:
+        print("パトロール完了・通知を送信しました。")
+    elif checkpoint is not None:
+        print("⚠️ パトロールは完了しましたが、通知を送れませんでした。途中経過を残したので、再実行すると判定をやり直さずに送り直します。")
+    else:
+        print("⚠️ パトロールは完了しましたが、通知を送れませんでした。")
+
+
+def build_message(hits, repeated, current_time_str, notice=None):
+    """Discord へ送るパトロール結果の本文を組み立てる（repeated は通知済みで継続中のシグナル）"""
+    results = {label: [] for label in RULE_LABELS.values()}
+    copy_lists = {"A": [], "B": [], "C": []}
+    for ticker, key, info_text in hits:
+        results[RULE_LABELS[key]].append(info_text)
+        copy_lists[key].append(ticker.replace(".T", ""))
+        metrics.count(f"hits_{key}")
 
-    # ==========================================
-    # --- Discord 送信メッセージの構築 ---
-    # ==========================================
     patrol_type = "【前場・中間巡回】" if IS_MIDDAY_PATROL else "【大引け後・確定巡回】"
+    if IS_MIDDAY_PATROL and PROJECT_MIDDAY_VOLUME:
+        patrol_type += "（当日出来高は終日換算）"
     msg = f"📋 **テス流・ハイブリッド投資戦略パトロール (マスピ2・値幅特化仕様)**\n"
     msg += f"巡回種別: {patrol_type} / 実行日時: {current_time_str}\n"
+    if notice:
+        msg += f"{notice}\n"
     msg += f"📌 *抽出フィルター: 株価3,000円超(呼値5円以上)、7日平均値幅300円以上、3ヶ月平均出来高50万株以上、当日出来高急増クリア銘柄*\n\n"
 
-    has_any_result = False
+    has_any_result = bool(repeated)
     for cat, items in results.items():
         if items:
             has_any_result = True
             msg += f"**{cat}**\n" + "\n".join(items) + "\n\n"
 
+    if repeated:
+        msg += "🔁 **継続中のシグナル（通知済みのため詳細省略）**\n"
+        for key in RULE_LABELS:
+            codes = [ticker.replace(".T", "") for ticker, k, _ in repeated if k == key]
+            if codes:
+                msg += f"ルール{key}: {', '.join(codes)}\n"
+        msg += "\n"
+
     msg += "--- 📋 マスピ2一括登録用コードリスト ---\n"
     for key, label in [("A", "ルールA（即買い）"), ("B", "ルールB（監視登録）"), ("C", "ルールC（利確・空売り）")]:
         if copy_lists[key]:
@@ -303,10 +1024,169 @@ def main():
 
     if not has_any_result:
         msg += "🔍 条件（株価3,000円超・7日平均値幅300円以上・出来高トリプルフィルター）をすべて満たすスクリーニング合致銘柄はありませんでした。"
+    return msg
+
+
+def deliver(hits, current_time_str, notice=None):
+    """通知済みで継続中のシグナルを分けてから本文を組み立て、Discord へ送る。届けば True"""
+    repeated, claimed = [], []
+    alert_store = AlertStore() if USE_ALERT_STORE else None
+    if alert_store is not None:
+        try:
+            hits, repeated, claimed = split_repeated(hits, alert_store)
+            metrics.count("repeated_hits", len(repeated))
+        except Exception as e:
+            print(f"通知履歴エラー: {e}")
+            metrics.error("alerts", e)
+
+    msg = build_message(hits, repeated, current_time_str, notice)
+    with metrics.stage("discord"):
+        sent = send_discord(msg)
+    if alert_store is not None:
+        if not sent and claimed:
+            # 届かなかったシグナルは次回も新規として扱う
+            alert_store.forget(claimed)
+        alert_store.close()
+    return sent
+
+
+# ==============================================================================
+# --- 分割巡回（銘柄リストを N 分割して別々のプロセス・マシンで判定し、最後に1通へまとめる） ---
+# ==============================================================================
+def write_shard(shard, shard_dir, hits, order, names, meta):
+    """分割巡回の結果を shard_dir に書き出し、部分結果ファイルのパスを返す
+
+    部分結果はルールごとのヒット [銘柄リスト全体での位置, 銘柄, 詳細行] と実行レポート（足切り件数・
+    カウンター・段階時間）だけの小さな JSON。スナップショットを記録していれば、その分割の分を別ディレクトリに書く。
+    """
+    index, count = shard
+    snapshot_rows = 0
+    if snapshot.enabled:
+        with metrics.stage("snapshot"):
+            snapshot_rows = snapshot.write(shard_snapshot_path(shard_dir, index, count), names=names,
+                                           meta={"midday": IS_MIDDAY_PATROL, "scan_mode": meta["scan_mode"]})["rows"]
+        metrics.count("snapshot_rows", snapshot_rows)
+    grouped = {key: [] for key in RULE_LABELS}
+    for ticker, key, info_text in hits:
+        grouped[key].append([order[ticker], ticker, info_text])
+    path = partial_path(shard_dir, index, count)
+    write_partial(path, {
+        # 同じ日・同じ巡回種別・同じ分割数の部分結果を1回の巡回としてまとめる（started_at は '%Y/%m/%d %H:%M'）
+        "run_key": f"{meta['started_at'][:10]}:{patrol_name()}:{count}",
+        "shard": index,
+        "shards": count,
+        "patrol": patrol_name(),
+        "midday": IS_MIDDAY_PATROL,
+        "project_volume": PROJECT_MIDDAY_VOLUME,
+        **meta,
+        "hits": grouped,
+        "snapshot_rows": snapshot_rows,
+        "report": metrics.to_dict(),
+    })
+    return path
+
+
+def merge_shards(shard_dir=SHARD_DIR, snapshot_path=None, report_path=REPORT_PATH):
+    """shard_dir の部分結果（最新の巡回の分）を1回の巡回の結果にまとめ、Discord へ通知する
+
+    通知本文・スナップショット・実行レポートは、分割せずに実行した場合と同じ形になる。
+    届かなかった分割があっても届いた分だけで通知し、欠けている分割を本文の冒頭に書く。
+    通知が届いたら部分結果を消す（届かなければ残すので、もう一度実行すれば送り直せる）。届けば True。
+    """
+    global IS_MIDDAY_PATROL, PROJECT_MIDDAY_VOLUME
+    metrics.reset()
+    partials, missing = latest_run(load_partials(shard_dir))
+    if not partials:
+        print(f"{shard_dir} に部分結果がありません。")
+        return False
+    first = partials[0]
+    # 見出しと通知履歴の区別は、分割巡回を実行したときの巡回種別に合わせる
+    IS_MIDDAY_PATROL, PROJECT_MIDDAY_VOLUME = first["midday"], first["project_volume"]
+    print(f"分割巡回の部分結果 {len(partials)}/{first['shards']} 件をまとめます...")
+    for partial in partials:
+        metrics.merge(partial["report"])
+    metrics.count("shards", len(partials))
+
+    notice = None
+    if missing:
+        metrics.count("missing_shards", len(missing))
+        notice = (f"⚠️ 分割巡回 {first['shards']} 件のうち {', '.join(map(str, missing))} 番の結果が届いていないため、"
+                  f"その分の銘柄は判定されていません")
+        print(notice)
+    if len({p["universe_key"] for p in partials}) > 1:
+        metrics.count("universe_mismatch")
+        print("分割ごとに取得した銘柄リストが異なります（実行中に上場銘柄一覧が更新された可能性があります）。")
+    if metrics.counters["failed_tickers"]:
+        print(f"取り直しても取得できなかった銘柄: {metrics.counters['failed_tickers']}")
+
+    rule_plan.stats = RuleStats.load(RULE_STATS_PATH)
+    if rule_plan.stats.absorb(metrics.to_dict()):
+        rule_plan.stats.save(RULE_STATS_PATH)
+
+    hits = sorted((pos, ticker, key, info_text)
+                  for p in partials for key, rows in p["hits"].items() for pos, ticker, info_text in rows)
+    hits = [(ticker, key, info_text) for _, ticker, key, info_text in hits]
+
+    if snapshot_path:
+        paths = [shard_snapshot_path(shard_dir, p["shard"], p["shards"]) for p in partials]
+        frames = [Snapshot(path).frame() for path in paths if os.path.exists(os.path.join(path, "meta.json"))]
+        if frames:
+            with metrics.stage("snapshot"):
+                info = write_snapshot(pd.concat(frames), snapshot_path,
+                                      meta={"midday": IS_MIDDAY_PATROL, "scan_mode": first["scan_mode"],
+                                            "shards": first["shards"]})
+            print(f"指標スナップショット({info['rows']} 銘柄)を {snapshot_path} に保存しました。")
+
+    sent = deliver(hits, min(p["started_at"] for p in partials), notice)
+    if sent:
+        remove_partials(partials)
+    if report_path:
+        metrics.write(report_path, extra={"scan_mode": first["scan_mode"], "midday": IS_MIDDAY_PATROL,
+                                          "project_volume": IS_MIDDAY_PATROL and PROJECT_MIDDAY_VOLUME,
+                                          "shards": first["shards"], "merged_shards": [p["shard"] for p in partials]})
+        print(f"実行レポートを {report_path} に保存しました。")
+    if sent:
+        print("分割巡回の結果をまとめ、通知を送信しました。")
+    else:
+        print(f"⚠️ 分割巡回の結果をまとめましたが、通知を送れませんでした。部分結果を {shard_dir} に残したので、"
+              f"--merge を再実行すると送り直します。")
+    return sent
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="東証プライム・スタンダード銘柄のパトロール")
+    parser.add_argument("--report", default=REPORT_PATH, help="実行レポート(JSON)の出力先。空文字で出力しない")
+    parser.add_argument("--profile", default=None, help="cProfile の結果(pstats)を保存するパス")
+    parser.add_argument("--snapshot", nargs="?", const=SNAPSHOT_PATH, default=None, metavar="DIR",
+                        help=f"指標スナップショット（app.py のスクリーナー用）を保存する。保存先の省略時は {SNAPSHOT_PATH}。"
+                             "全銘柄の全指標を計算するので、指定しない巡回より遅くなる（大引け後の定期巡回では指定する）")
+    parser.add_argument("--workers", type=int, default=SCAN_WORKERS, help="判定に使うプロセス数。1で逐次実行")
+    parser.add_argument("--midday", action="store_true", default=IS_MIDDAY_PATROL,
+                        help="中間巡回として実行する（ストアの日足に当日の暫定足を重ね、出来高倍率を0.6倍に緩和）")
+    parser.add_argument("--project-volume", action="store_true", default=PROJECT_MIDDAY_VOLUME,
+                        help="中間巡回で当日出来高を経過時間から終日分に換算する（倍率は2.0倍のまま）")
+    sharding = parser.add_mutually_exclusive_group()
+    sharding.add_argument("--shard", type=parse_shard, default=None, metavar="i/N",
+                          help="銘柄リストを銘柄コードのハッシュで N 分割し、i 番目だけを判定して部分結果を --shard-dir に書き出す（通知しない）")
+    sharding.add_argument("--merge", action="store_true",
+                          help="--shard-dir の部分結果をまとめて通知する（実行レポートと、--snapshot 指定時はスナップショットも全銘柄分を書き出す）")
+    parser.add_argument("--shard-dir", default=SHARD_DIR, help="分割巡回の部分結果を置くディレクトリ")
+    return parser.parse_args(argv)
+
 
-    send_discord(msg)
-    print("パトロール完了・通知を送信しました。")
+def run_cli(argv=None):
+    """コマンドラインの引数どおりに巡回（--merge なら部分結果のまとめ）を実行する"""
+    global IS_MIDDAY_PATROL, PROJECT_MIDDAY_VOLUME
+    args = parse_args(argv)
+    # ワーカープロセスはプール起動時のモジュール変数を引き継ぐので、run_patrol より前に設定する
+    IS_MIDDAY_PATROL = args.midday
+    PROJECT_MIDDAY_VOLUME = args.project_volume
+    if args.merge:
+        merge_shards(args.shard_dir, snapshot_path=args.snapshot, report_path=args.report)
+    else:
+        main(report_path=args.report, profile_path=args.profile, snapshot_path=args.snapshot, workers=args.workers,
+             shard=args.shard, shard_dir=args.shard_dir)
 
 
 if __name__ == "__main__":
-    main()
+    run_cli()
@@ -0,0 +1,210 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+import requests
+from lxml import etree
+
+# ==============================================================================
+# --- 設定項目 ---
+# ==============================================================================
+NEWS_CACHE_PATH = "news_cache.sqlite"
+MAX_WORKERS = 8          # 記事ページを同時に取得する上限
+TIMEOUT_SEC = 5          # 1リクエストあたりのタイムアウト
+CACHE_MAX_AGE_DAYS = 14  # これより古いキャッシュは削除する（ファイルを一定サイズに保つ）
+FEED_BYTES = 16 * 1024   # パーサーへ一度に流すバイト数（目的の要素が見つかった時点で打ち切る）
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+
+# ==============================================================================
+# --- ETag / Last-Modified 対応のHTTPキャッシュ ---
+# ==============================================================================
+class HTTPCache:
+    """URL ごとに本文と検証子（ETag / Last-Modified）を SQLite に保存するキャッシュ
+
+    次回の取得では検証子を付けた条件付きリクエストを送り、304 Not Modified なら保存済みの本文を使う。
+    記事取得のワーカースレッドから呼ばれるため、接続は共有しロックで直列化する。
+    """
+
+    def __init__(self, path=NEWS_CACHE_PATH, clock=time.time, max_age_days=CACHE_MAX_AGE_DAYS):
+        self.path = path
+        self.clock = clock
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.lock = threading.RLock()
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body BLOB NOT NULL, fetched REAL NOT NULL)")
+        with self.lock:
+            self.conn.execute("DELETE FROM pages WHERE fetched < ?", (clock() - max_age_days * 86400,))
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, url):
+        """(etag, last_modified, body) か None を返す"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT etag, last_modified, body FROM pages WHERE url = ?", (url,)).fetchone()
+
+    def put(self, url, etag, last_modified, body):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, body, fetched) VALUES (?, ?, ?, ?, ?)",
+                (url, etag, last_modified, body, self.clock()))
+
+    def touch(self, url):
+        with self.lock:
+            self.conn.execute("UPDATE pages SET fetched = ? WHERE url = ?", (self.clock(), url))
+
+
+# ==============================================================================
+# --- 必要な要素だけを拾うパーサー（木を作らない lxml のターゲットパーサー） ---
+# ==============================================================================
+class _LinkCollector:
+    """href が pattern に一致する <a> の (テキスト, href) を文書順に集める"""
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.links = []
+        self.current = None
+        self.done = False
+
+    def start(self, tag, attrib):
+        if tag == "a" and self.current is None and self.pattern.search(attrib.get("href", "")):
+            self.current = (attrib["href"], [])
+
+    def data(self, text):
+        if self.current is not None:
+            self.current[1].append(text)
+
+    def end(self, tag):
+        if tag == "a" and self.current is not None:
+            href, texts = self.current
+            # BeautifulSoup の get_text(strip=True) と同じく、テキスト片ごとに空白を除いて連結する
+            self.links.append(("".join(t.strip() for t in texts), href))
+            self.current = None
+
+    def close(self):
+        return self.links
+
+
+class _FirstParagraph:
+    """class 属性が pattern に一致する最初の <p> のテキストを集め、見つかったら done にする"""
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.texts = None
+        self.depth = 0
+        self.done = False
+
+    def start(self, tag, attrib):
+        if self.done:
+            return
+        if self.texts is not None:
+            self.depth += tag == "p"
+        elif tag == "p" and self.pattern.search(attrib.get("class", "")):
+            self.texts = []
+
+    def data(self, text):
+        if self.texts is not None and not self.done:
+            self.texts.append(text)
+
+    def end(self, tag):
+        if self.texts is None or self.done or tag != "p":
+            return
+        if self.depth:
+            self.depth -= 1
+        else:
+            self.done = True
+
+    def close(self):
+        return "".join(t.strip() for t in self.texts) if self.texts is not None else None
+
+
+def parse_with(target, body):
+    """body（bytes）を target に流し、target.done になった時点で残りを読まずに結果を返す"""
+    parser = etree.HTMLParser(target=target)
+    for i in range(0, len(body), FEED_BYTES):
+        parser.feed(body[i:i+FEED_BYTES])
+        if target.done:
+            break
+    return parser.close()
+
+
+def find_links(body, pattern):
+    return parse_with(_LinkCollector(re.compile(pattern)), body)
+
+
+def find_first_paragraph(body, pattern):
+    return parse_with(_FirstParagraph(re.compile(pattern)), body)
+
+
+def content_key(*parts):
+    """重複判定用のハッシュキー（辞書同士の線形比較の代わりに set で引く）"""
+    return hashlib.sha1("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+# ==============================================================================
+# --- 並列ページ取得 ---
+# ==============================================================================
+class PageFetcher:
+    """コネクションプール付きのセッションで、複数ページを同時数の上限付きで並列取得する
+
+    cache を渡すと条件付きリクエストで再取得を省き、接続エラー・タイムアウト時も保存済みの本文があればそれを使う。
+    """
+
+    def __init__(self, cache=None, max_workers=MAX_WORKERS, timeout=TIMEOUT_SEC, session=None):
+        self.cache = cache
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = USER_AGENT
+
+    def fetch(self, url, timeout=None):
+        """url の本文(bytes)を返す。キャッシュが新しければ 304 を受けて保存済みの本文を返す"""
+        cached = self.cache.get(url) if self.cache else None
+        headers = {}
+        if cached:
+            etag, last_modified, _ = cached
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        try:
+            response = self.session.get(url, headers=headers, timeout=timeout or self.timeout)
+        except (requests.ConnectionError, requests.Timeout):
+            if cached:
+                return cached[2]
+            raise
+        if response.status_code == 304 and cached:
+            self.cache.touch(url)
+            return cached[2]
+        response.raise_for_status()
+        if self.cache and (response.headers.get("ETag") or response.headers.get("Last-Modified")):
+            self.cache.put(url, response.headers.get("ETag"), response.headers.get("Last-Modified"), response.content)
+        return response.content
+
+    def fetch_many(self, urls):
+        """urls を並列に取得し、{url: 本文(bytes) または 例外} を返す（同じ URL は1回だけ取得する）"""
+        urls = list(dict.fromkeys(urls))
+
+        def fetch_one(url):
+            try:
+                return self.fetch(url)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(urls)))) as pool:
+            return dict(zip(urls, pool.map(fetch_one, urls)))
+
+
+def absolute_links(links, base_url):
+    """(テキスト, href) の href を base_url 基準の絶対 URL にする"""
+    return [(text, urljoin(base_url, href)) for text, href in links]
@@ -1,67 +1,72 @@
 # -*- coding: utf-8 -*-
-import requests
-import re
-from bs4 import BeautifulSoup
 from datetime import datetime, timezone, timedelta
 
+from discord_notify import DiscordWebhook
+from news_fetcher import HTTPCache, PageFetcher, absolute_links, content_key, find_first_paragraph, find_links
+
 # ==========================================
 # 🛠️ 設定：Discord Webhook URL
 # ==========================================
 DISCORD_WEBHOOK_URL = "https://discordapp.com/api/webhooks/1472281747000393902/Fbclh0R3R55w6ZnzhenJ24coaUPKy42abh3uPO-fRjfQulk9OwAq-Cf8cJQOe2U4SFme"
 
-def get_yahoo_news_with_summary():
-    """Yahoo!経済ニュースのタイトル、リンク、および簡単な本文(要約)を取得"""
-    url = "https://news.yahoo.co.jp/categories/business"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-    }
+NEWS_URL = "https://news.yahoo.co.jp/categories/business"
+MAX_TOPICS = 3
+DEFAULT_SUMMARY = "詳細内容はリンク先をご確認ください。"
+
+def get_yahoo_news_with_summary(url=NEWS_URL, fetcher=None, limit=MAX_TOPICS):
+    """Yahoo!経済ニュースのタイトル、リンク、および簡単な本文(要約)を取得
+
+    一覧から重複を除いた先頭 limit 件を選び、個別ページはまとめて並列取得する。
+    fetcher（PageFetcher）を省略するとローカルのHTTPキャッシュ付きで取得する。
+    """
+    if fetcher is None:
+        cache = HTTPCache()
+        try:
+            return get_yahoo_news_with_summary(url, PageFetcher(cache), limit)
+        finally:
+            cache.close()
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.content, "html.parser")
-        news_list = []
-        
+        body = fetcher.fetch(url, timeout=10)
+
         # 経済カテゴリーの主要トピックス（pickup）のリンクを集める
-        topics = soup.find_all("a", href=re.compile(r"/pickup/"))
-        if not topics:
-            topics = soup.find_all("a", href=re.compile(r"/articles/"))
-        
-        session = requests.Session()
-        
-        for a_tag in topics:
-            title = a_tag.get_text(strip=True)
-            link = a_tag.get("href", "")
-            
+        topics = find_links(body, r"/pickup/") or find_links(body, r"/articles/")
+
+        candidates, seen = [], set()
+        for title, link in absolute_links(topics, url):
             # ナビゲーション用の短いノイズテキストを除外
             if len(title) < 12:
                 continue
-                
-            # 💡 ニュースの個別ページにアクセスして、本文の最初の数行(要約)を取得する
-            summary_text = "詳細内容はリンク先をご確認ください。"
-            try:
-                detail_res = session.get(link, headers=headers, timeout=5)
-                detail_soup = BeautifulSoup(detail_res.content, "html.parser")
-                
-                # Yahoo!ニュースの本文（リード文）が格納されているクラスを狙い撃ち
-                paragraphs = detail_soup.find_all("p", class_=re.compile(r"yjmt|highLight|Paragraph"))
-                if paragraphs:
-                    # 最初の段落のテキストを抽出し、長すぎる場合は100文字でカット
-                    summary_text = paragraphs[0].get_text(strip=True)
-                    if len(summary_text) > 100:
-                        summary_text = summary_text[:100] + "..."
-            except Exception as e:
-                print(f"詳細ページの取得失敗(スキップします): {e}")
-
-            if {"title": title, "link": link, "summary": summary_text} not in news_list:
-                news_list.append({"title": title, "link": link, "summary": summary_text})
-                
-            if len(news_list) >= 3:
+            key = content_key(title, link)
+            if key not in seen:
+                seen.add(key)
+                candidates.append((title, link))
+            if len(candidates) >= limit:
                 break
-                
-        return news_list
     except Exception as e:
         print(f"データ取得エラー: {e}")
         return []
 
+    # 💡 ニュースの個別ページを並列に取得して、本文の最初の数行(要約)を取り出す
+    pages = fetcher.fetch_many([link for _, link in candidates])
+    news_list = []
+    for title, link in candidates:
+        summary_text = DEFAULT_SUMMARY
+        try:
+            page = pages[link]
+            if isinstance(page, Exception):
+                raise page
+            # Yahoo!ニュースの本文（リード文）が格納されているクラスを狙い撃ち
+            paragraph = find_first_paragraph(page, r"yjmt|highLight|Paragraph")
+            if paragraph is not None:
+                # 最初の段落のテキストを抽出し、長すぎる場合は100文字でカット
+                summary_text = paragraph
+                if len(summary_text) > 100:
+                    summary_text = summary_text[:100] + "..."
+        except Exception as e:
+            print(f"詳細ページの取得失敗(スキップします): {e}")
+        news_list.append({"title": title, "link": link, "summary": summary_text})
+    return news_list
+
 def main():
     # 日本時間に変換
     jst_now = datetime.now(timezone(timedelta(hours=9)))
@@ -81,12 +86,12 @@ def main():
             message_content += f" 📝 **要約**: {item['summary']}\n"
             message_content += f"🔗 **リンク**: {item['link']}\n\n"
 
-    # Discordに送信
-    response = requests.post(DISCORD_WEBHOOK_URL, json={"content": message_content})
-    if response.status_code == 204:
+    # Discordに送信（2000文字を超える場合は改行位置で分割）
+    webhook = DiscordWebhook(DISCORD_WEBHOOK_URL)
+    if webhook.send(message_content):
         print("✅ 簡易要約付きニュースのDiscord送信が完了しました！")
     else:
-        print(f"❌ Discord送信エラー: {response.status_code}")
+        print(f"❌ Discord送信エラー: {webhook.last_error}")
 
 if __name__ == "__main__":
     main()
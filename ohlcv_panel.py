@@ -0,0 +1,190 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+# --- 設定項目 ---
+# ==============================================================================
+PRICE_FIELDS = ("Open", "High", "Low", "Close")
+FIELDS = PRICE_FIELDS + ("Volume",)
+# 価格の既定の型。auto_adjust の調整後株価は呼値単位に乗らない（1234.5678 円など）ので float32 では丸めが入る。
+# 相対誤差は 2**-24（約 6e-8、1万円で 0.001 円未満）で、パネル一括判定の指標には影響しない許容範囲とする。
+# 従来の銘柄ごとの判定のように float64 と同じ値が要るときは from_frame(..., dtype=float) を使う
+PRICE_DTYPE = np.float32
+
+
+# ==============================================================================
+# --- 配列ベースのOHLCVパネル ---
+# ==============================================================================
+def _take_columns(values, idx):
+    """values の列位置 idx（-1 は欠損列）を取り出す
+
+    yfinance の (ticker, 項目) 列は銘柄ごとに同じ項目順で並ぶので、1項目の列位置は等間隔になる。
+    その場合は変換中に項目ごとの float64 のコピーを作らないよう、ストライドのビューで返す。
+    """
+    if len(idx) and idx[0] >= 0:
+        step = int(idx[1] - idx[0]) if len(idx) > 1 else 1
+        if step > 0 and (np.diff(idx) == step).all():
+            return values[:, idx[0]::step][:, :len(idx)]
+    return np.where(idx >= 0, values[:, idx], np.nan)
+
+
+class OHLCVPanel:
+    """複数銘柄の日足を、項目ごとの連続した配列で持つパネル
+
+    yf.download(group_by='ticker') の MultiIndex 列フレームの代わりに使う。
+    - prices: (4, 銘柄, 日数) の PRICE_DTYPE（既定 float32）。Open/High/Low/Close
+    - volume: (銘柄, 日数) の int64
+    - lengths: 銘柄ごとの有効本数（5項目すべて揃った日数 = dropna() 後の行数）
+    - valid: 元の日付のうち有効だった日のビット列（np.packbits）。日付の復元用
+    各銘柄の有効な行は末尾へ詰めた右揃えで持ち、先頭の空きは価格 NaN・出来高 0 にする。
+    そのため末尾 n 本の切り出しは全銘柄共通の位置になり、1銘柄の切り出しはコピーなしのビューになる。
+    """
+
+    def __init__(self, tickers, dates, prices, volume, lengths, valid):
+        self.tickers = list(tickers)
+        self.columns = {t: j for j, t in enumerate(self.tickers)}
+        self.dates = pd.DatetimeIndex(dates)
+        self.prices = prices
+        self.volume = volume
+        self.lengths = lengths
+        self.valid = valid
+
+    def __len__(self):
+        return len(self.tickers)
+
+    @property
+    def n_bars(self):
+        return self.prices.shape[2]
+
+    @property
+    def nbytes(self):
+        return self.prices.nbytes + self.volume.nbytes + self.lengths.nbytes + self.valid.nbytes
+
+    # --------------------------------------------------------------------------
+    # yfinance 形式との変換
+    # --------------------------------------------------------------------------
+    @classmethod
+    def from_frame(cls, data, tickers=None, dtype=PRICE_DTYPE):
+        """yf.download(group_by='ticker') の結果からパネルを作る（tickers の順。データの無い銘柄は除く）"""
+        present = list(dict.fromkeys(data.columns.get_level_values(0))) if len(data.columns) else []
+        if tickers is not None:
+            present_set = set(present)
+            present = [t for t in tickers if t in present_set]
+        n_days, n = len(data), len(present)
+
+        # 項目ごとの xs() より速いよう、全体を1回だけ配列にして列位置で取り出す
+        # （float64 だけのフレームならコピーせずビューになる）
+        values = data.to_numpy(dtype=float, copy=False) if n else np.empty((n_days, 0))
+        idx = {f: data.columns.get_indexer(pd.MultiIndex.from_arrays([present, [f] * n])) if n else np.empty(0, int)
+               for f in FIELDS}
+        arrays = {f: _take_columns(values, idx[f]) for f in FIELDS}
+        return cls.from_arrays(present, data.index, arrays, dtype)
+
+    @classmethod
+    def from_arrays(cls, tickers, dates, arrays, dtype=PRICE_DTYPE):
+        """項目→(日付×銘柄) の日付揃えの配列（欠損は NaN）から、右揃えのパネルを作る"""
+        n_days, n = len(dates), len(tickers)
+        valid = np.ones((n_days, n), dtype=bool)
+        for f in FIELDS:
+            valid &= ~np.isnan(arrays[f])
+        lengths = valid.sum(axis=0).astype(np.int64)
+
+        # 安定ソートで「欠損行→有効行」の順に並べ替えると、有効行が元の順序のまま末尾に詰まる
+        order = np.argsort(valid, axis=0, kind="stable")
+        pad = np.arange(n_days)[:, None] < (n_days - lengths)
+        prices = np.empty((len(PRICE_FIELDS), n, n_days), dtype=dtype)
+        for k, f in enumerate(PRICE_FIELDS):
+            packed = np.take_along_axis(arrays[f], order, axis=0)
+            packed[pad] = np.nan
+            prices[k] = packed.T
+        packed = np.take_along_axis(arrays["Volume"], order, axis=0)
+        packed[pad] = 0
+        volume = np.ascontiguousarray(np.rint(packed.T), dtype=np.int64)
+        return cls(tickers, dates, prices, volume, lengths, np.packbits(valid.T, axis=1))
+
+    def aligned(self):
+        """項目→(日付×銘柄) の日付揃えの float64 配列（無効日は NaN）に戻す。from_arrays の逆"""
+        n = self.n_bars
+        valid = np.unpackbits(self.valid, axis=1, count=n).astype(bool).T if len(self) else np.zeros((n, 0), bool)
+        # 有効日は、右揃えの配列で (先頭の空き + 何番目の有効日か) の位置にある
+        pos = np.where(valid, np.cumsum(valid, axis=0) - 1 + (n - self.lengths), 0)
+        arrays = {f: np.take_along_axis(self.prices[k].T.astype(float), pos, axis=0)
+                  for k, f in enumerate(PRICE_FIELDS)}
+        arrays["Volume"] = np.take_along_axis(self.volume.T.astype(float), pos, axis=0)
+        for a in arrays.values():
+            a[~valid] = np.nan
+        return arrays
+
+    def valid_mask(self, j):
+        """j 番目の銘柄が有効だった日の bool 配列（dates と同じ長さ）"""
+        return np.unpackbits(self.valid[j], count=self.n_bars).astype(bool)
+
+    def to_frame(self):
+        """yf.download(group_by='ticker') と同じ (ticker, 項目) 列・日付索引のフレームに戻す（無効日は NaN）"""
+        frames = {}
+        for j, ticker in enumerate(self.tickers):
+            df = pd.DataFrame(np.nan, index=self.dates, columns=list(FIELDS))
+            df.loc[self.valid_mask(j)] = self.ticker_frame(ticker).to_numpy()
+            frames[ticker] = df
+        if not frames:
+            return pd.DataFrame(index=self.dates, columns=pd.MultiIndex.from_tuples([], names=["Ticker", "Price"]))
+        return pd.concat(frames, axis=1, names=["Ticker", "Price"])
+
+    # --------------------------------------------------------------------------
+    # 切り出し
+    # --------------------------------------------------------------------------
+    def bars(self, ticker):
+        """1銘柄の有効な行を 項目→配列 の辞書で返す（元配列のビューでコピーしない）"""
+        j = self.columns[ticker]
+        start = self.n_bars - self.lengths[j]
+        bars = {f: self.prices[k, j, start:] for k, f in enumerate(PRICE_FIELDS)}
+        bars["Volume"] = self.volume[j, start:]
+        return bars
+
+    def ticker_frame(self, ticker):
+        """1銘柄分の float64 の OHLCV（data[ticker].dropna() 相当、索引は有効な日付）"""
+        j = self.columns[ticker]
+        bars = self.bars(ticker)
+        return pd.DataFrame({f: bars[f].astype(float) for f in FIELDS}, index=self.dates[self.valid_mask(j)])
+
+    def tail(self, n):
+        """全銘柄の末尾 n 本を 項目→(行×銘柄) の float64 DataFrame にする（build_panel と同じ右揃え）
+
+        有効本数が n に満たない銘柄の空きは、出来高も含めて NaN にする。
+        """
+        n = min(n, self.n_bars)
+        rows = np.arange(self.n_bars - n, self.n_bars)
+        pad = rows[:, None] < (self.n_bars - self.lengths)
+        tail = {f: pd.DataFrame(self.prices[k, :, -n:].T.astype(float), columns=self.tickers)
+                for k, f in enumerate(PRICE_FIELDS)}
+        volume = self.volume[:, self.n_bars - n:].T.astype(float)
+        volume[pad] = np.nan
+        tail["Volume"] = pd.DataFrame(volume, columns=self.tickers)
+        return tail
+
+    # --------------------------------------------------------------------------
+    # 保存・読み込み（ワーカープロセスへの受け渡し用）
+    # --------------------------------------------------------------------------
+    def save(self, path):
+        """配列ごとの .npy と銘柄・日付の JSON をディレクトリ path に保存する"""
+        os.makedirs(path, exist_ok=True)
+        for name in ("prices", "volume", "lengths", "valid"):
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name), allow_pickle=False)
+        with open(os.path.join(path, "index.json"), "w", encoding="utf-8") as f:
+            json.dump({"tickers": self.tickers, "dates": self.dates.asi8.tolist(),
+                       "tz": str(self.dates.tz) if self.dates.tz else None}, f)
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        """save() したパネルを読み込む。mmap_mode="r" なら配列はメモリマップ（読み取り専用）"""
+        with open(os.path.join(path, "index.json"), encoding="utf-8") as f:
+            index = json.load(f)
+        dates = pd.DatetimeIndex(np.asarray(index["dates"], dtype="datetime64[ns]"))
+        if index["tz"]:
+            dates = dates.tz_localize("UTC").tz_convert(index["tz"])
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode, allow_pickle=False)
+                  for name in ("prices", "volume", "lengths", "valid")}
+        return cls(index["tickers"], dates, **arrays)
@@ -0,0 +1,208 @@
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+# ==============================================================================
+# --- 設定項目 ---
+# ==============================================================================
+STORE_PATH = "ohlcv_store.sqlite"
+FIELDS = ("Open", "High", "Low", "Close", "Volume")
+
+# 差分取得時に再取得する重複本数（最終本は場中の暫定値の可能性があるため、その1本前で調整を検知）
+OVERLAP_BARS = 2
+# 重複バーの終値がこの相対誤差を超えてずれていたら、分割・配当調整とみなして全期間を取り直す
+ADJUST_TOLERANCE = 1e-3
+
+
+# ==============================================================================
+# --- データ取得関数（差し替え可能） ---
+# ==============================================================================
+def yf_fetcher(tickers, start=None, period=None):
+    """yfinance から group_by='ticker' 形式の日足を取得する標準フェッチャー"""
+    return yf.download(tickers, start=start, period=period, interval="1d",
+                       progress=False, group_by='ticker', auto_adjust=True)
+
+
+def _to_long(data, tickers):
+    """(ticker, 項目) 列の横持ちフレームを ticker/date/OHLCV の縦持ちに変換する"""
+    if data is None or data.empty:
+        return pd.DataFrame(columns=["ticker", "date", *FIELDS])
+    if not isinstance(data.columns, pd.MultiIndex):
+        data = pd.concat({tickers[0]: data}, axis=1)
+
+    long = data.stack(level=0, future_stack=True).dropna(how="all")
+    long = long.reindex(columns=list(FIELDS))
+    long.index.names = ["date", "ticker"]
+    long = long.reset_index()
+    long["date"] = pd.to_datetime(long["date"]).dt.strftime("%Y-%m-%d")
+    return long[["ticker", "date", *FIELDS]]
+
+
+# ==============================================================================
+# --- ローカルOHLCVストア ---
+# ==============================================================================
+class OHLCVStore:
+    """銘柄×日付をキーに日足を SQLite に保存し、不足分だけ差分取得するストア"""
+
+    def __init__(self, path=STORE_PATH, fetcher=yf_fetcher):
+        self.path = path
+        self.fetcher = fetcher
+        # 並列ダウンローダーのワーカースレッドからも呼ばれるため、接続は共有しロックで直列化する
+        # （同じマシンで分割巡回を複数プロセス動かすときは、他プロセスの書き込みが終わるまで待つ）
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.lock = threading.RLock()
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS bars ("
+            " ticker TEXT NOT NULL, date TEXT NOT NULL,"
+            " open REAL, high REAL, low REAL, close REAL, volume REAL,"
+            " PRIMARY KEY (ticker, date))"
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    # --------------------------------------------------------------------------
+    # 読み書き
+    # --------------------------------------------------------------------------
+    def save(self, data, tickers, before=None):
+        """取得したフレームをストアへ書き込む（同じ日付は上書き）。before（'YYYY-MM-DD'）以降の行は書かない"""
+        long = _to_long(data, tickers)
+        if before:
+            long = long[long["date"] < before]
+        if long.empty:
+            return 0
+        rows = long.astype(object).where(long.notna(), None).itertuples(index=False, name=None)
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self.conn.commit()
+        return len(long)
+
+    def delete(self, tickers):
+        with self.lock:
+            self.conn.executemany("DELETE FROM bars WHERE ticker = ?", [(t,) for t in tickers])
+            self.conn.commit()
+
+    def tickers(self):
+        """保存済みの全銘柄コードを返す"""
+        with self.lock:
+            rows = self.conn.execute("SELECT DISTINCT ticker FROM bars ORDER BY ticker").fetchall()
+        return [r[0] for r in rows]
+
+    def last_dates(self, tickers, offset=0):
+        """各銘柄の最新から offset 本前の保存日付を返す（未保存の銘柄は含まない）"""
+        placeholders = ",".join("?" * len(tickers))
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT ticker, date FROM ("
+                " SELECT ticker, date, ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY date DESC) AS rn"
+                f" FROM bars WHERE ticker IN ({placeholders})"
+                ") WHERE rn = ?",
+                [*tickers, offset + 1],
+            ).fetchall()
+        return dict(rows)
+
+    def load(self, tickers, start=None):
+        """ストアから yf.download(group_by='ticker') と同じ形式のフレームを組み立てる"""
+        placeholders = ",".join("?" * len(tickers))
+        sql = f"SELECT * FROM bars WHERE ticker IN ({placeholders})"
+        params = list(tickers)
+        if start:
+            sql += " AND date >= ?"
+            params.append(start)
+        with self.lock:
+            long = pd.read_sql_query(sql, self.conn, params=params)
+        if long.empty:
+            return pd.DataFrame()
+
+        long.columns = ["ticker", "date", *FIELDS]
+        long["date"] = pd.to_datetime(long["date"])
+        wide = long.pivot(index="date", columns="ticker", values=list(FIELDS)).sort_index()
+        wide = wide.swaplevel(axis=1)
+        stored = set(long["ticker"])
+        present = [t for t in tickers if t in stored]
+        return wide.reindex(columns=pd.MultiIndex.from_product([present, FIELDS]))
+
+    # --------------------------------------------------------------------------
+    # 差分更新
+    # --------------------------------------------------------------------------
+    def update(self, tickers, period="1y", before=None):
+        """保存済みの最終バー以降だけを取得してストアを最新化し、統計を返す
+
+        未保存の銘柄と、重複バーの終値が変わっていた（分割・配当調整が入った）銘柄は
+        period 分を取り直す。before（'YYYY-MM-DD'）を渡すと、その日以降のバーは保存しない
+        （場中に取得した当日の暫定足をストアへ残さないため）。
+        """
+        stats = {"incremental": 0, "full": 0, "repaired": 0, "rows": 0}
+        anchors = self.last_dates(tickers, offset=OVERLAP_BARS - 1)
+        full = [t for t in tickers if t not in anchors]
+
+        # 同じ開始日の銘柄をまとめて1回で取得する
+        by_start = {}
+        for t, d in anchors.items():
+            by_start.setdefault(d, []).append(t)
+
+        for start, group in by_start.items():
+            data = self.fetcher(group, start=start)
+            adjusted = self._adjusted_tickers(data, group, start)
+            fresh = [t for t in group if t not in adjusted]
+            stats["rows"] += self.save(_select(data, fresh), fresh, before) if fresh else 0
+            stats["incremental"] += len(fresh)
+            stats["repaired"] += len(adjusted)
+            full.extend(adjusted)
+
+        if full:
+            stats["rows"] += self.repair(full, period, before)
+            stats["full"] += len(full)
+        return stats
+
+    def repair(self, tickers, period="1y", before=None):
+        """指定銘柄の保存データを破棄し、period 分を取り直す（コーポレートアクション対応）"""
+        data = self.fetcher(tickers, period=period)
+        self.delete(tickers)
+        return self.save(data, tickers, before)
+
+    def _adjusted_tickers(self, data, tickers, start):
+        """重複取得した開始日の終値が保存値とずれている銘柄を返す"""
+        fetched = _to_long(data, tickers)
+        fetched = fetched[fetched["date"] == start].set_index("ticker")["Close"]
+        placeholders = ",".join("?" * len(tickers))
+        with self.lock:
+            stored = pd.read_sql_query(
+                f"SELECT ticker, close FROM bars WHERE date = ? AND ticker IN ({placeholders})",
+                self.conn, params=[start, *tickers],
+            ).set_index("ticker")["close"]
+        both = pd.concat([stored, fetched], axis=1, keys=["stored", "fetched"]).dropna()
+        diff = np.abs(both["fetched"] - both["stored"]) > np.abs(both["stored"]) * ADJUST_TOLERANCE
+        return list(both.index[diff])
+
+    def load_recent(self, tickers, period="1y"):
+        """直近 period 相当のデータだけを読み出す"""
+        start = (datetime.now() - _period_delta(period)).strftime("%Y-%m-%d")
+        return self.load(tickers, start=start)
+
+    def update_and_load(self, tickers, period="1y"):
+        """差分更新したうえで、直近 period 相当のデータを読み出す"""
+        stats = self.update(tickers, period=period)
+        return self.load_recent(tickers, period), stats
+
+
+def _select(data, tickers):
+    if isinstance(data.columns, pd.MultiIndex):
+        fetched = set(data.columns.get_level_values(0))
+        keep = [t for t in tickers if t in fetched]
+        return data.loc[:, keep]
+    return data
+
+
+def _period_delta(period):
+    """yfinance の period 表記 (例: '1y', '6mo', '90d') を timedelta に変換する"""
+    units = {"y": 365, "mo": 30, "d": 1}
+    for unit, days in units.items():
+        if period.endswith(unit):
+            return timedelta(days=int(period[:-len(unit)]) * days)
+    raise ValueError(f"未対応の期間指定です: {period}")
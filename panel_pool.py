@@ -0,0 +1,93 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from instrumentation import metrics
+from ohlcv_panel import OHLCVPanel
+from snapshot import snapshot
+
+# ==============================================================================
+# --- 設定項目 ---
+# ==============================================================================
+SCAN_WORKERS = os.cpu_count() or 1   # 判定に使うプロセス数（1 なら従来どおり同じプロセスで逐次判定）
+
+
+# ==============================================================================
+# --- ワーカー側の処理 ---
+# ==============================================================================
+def _run(func, path, args, record_snapshot):
+    """ワーカー側: パネルをメモリマップで開いて func を実行し、(結果, 計測値, スナップショット行) を返す"""
+    metrics.reset()
+    snapshot.reset(enabled=record_snapshot)
+    result = func(OHLCVPanel.load(path, mmap_mode="r"), *args)
+    return result, metrics.to_dict(), snapshot.to_frame() if record_snapshot else None
+
+
+# ==============================================================================
+# --- 判定用プロセスプール ---
+# ==============================================================================
+class PanelPool:
+    """チャンクごとの行列判定をワーカープロセスへ振り分けるプール
+
+    OHLCVPanel は pickle して送らず、一時ディレクトリに OHLCVPanel.save() で書いてワーカーが
+    メモリマップで開く（送るのはパスだけ）。ワーカー内で記録された計測値と
+    スナップショット行は result() で親プロセスの metrics / snapshot へ取り込む。
+    workers が 1 以下なら submit() はその場で実行するので、結果・計測値とも逐次実行と同じになる。
+
+    fork が使える環境では with に入った時点で（ダウンロード用スレッドが動き出す前に）
+    ワーカーを起動する。モジュール変数の設定値はその時点の値がワーカーへ引き継がれる。
+    """
+
+    def __init__(self, workers=SCAN_WORKERS):
+        self.workers = workers
+        self.executor = None
+        self.directory = None
+        self.submitted = 0
+
+    def __enter__(self):
+        if self.workers > 1:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("fork" if "fork" in methods else None)
+            self.directory = tempfile.mkdtemp(prefix="panel_pool_")
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            self.executor.submit(int).result()
+        return self
+
+    def __exit__(self, *exc):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.executor = self.directory = None
+        return False
+
+    def submit(self, func, panel, *args):
+        """func(panel, *args) を実行する Future を返す（panel は OHLCVPanel）。結果は result() で受け取る"""
+        if self.executor is None or not panel:
+            future = Future()
+            try:
+                future.set_result((func(panel, *args), None, None))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        path = os.path.join(self.directory, f"panel_{self.submitted}")
+        panel.save(path)
+        self.submitted += 1
+        future = self.executor.submit(_run, func, path, args, snapshot.enabled)
+        future.panel_path = path
+        return future
+
+    def result(self, future):
+        """Future の結果を返し、ワーカーで記録された計測値とスナップショット行を取り込む"""
+        try:
+            value, report, rows = future.result()
+        finally:
+            path = getattr(future, "panel_path", None)
+            if path is not None:
+                shutil.rmtree(path, ignore_errors=True)
+        if report is not None:
+            metrics.merge(report)
+        if rows is not None:
+            snapshot.add(rows)
+        return value
@@ -0,0 +1,276 @@
+import json
+import os
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import metrics
+
+# ==============================================================================
+# --- 設定項目 ---
+# ==============================================================================
+RULE_STATS_PATH = "rule_stats.json"
+STATS_DECAY = 0.8        # 保存済みの統計に掛ける減衰率（直近の相場での通過率を重く見る）
+PRIOR_RATE = 0.5         # 統計が無い条件の通過率の見込み
+PRIOR_WEIGHT = 20        # 見込みの重み（この列数分の観測があるものとして扱う）
+EVAL_COST = 1e-6         # 指標計算を除いた条件式1列あたりの評価コスト（秒）の見込み
+
+
+# ==============================================================================
+# --- 宣言的なルール定義の部品 ---
+# ==============================================================================
+class Indicator:
+    """末尾の行列（項目→(行×銘柄) DataFrame）から計算する指標
+
+    compute は行列を受け取り、outputs と同じ数の (行×銘柄) 配列を返す。
+    cost は計測値が無いうちに使う 1列あたりの計算秒数の見込み。
+    timeframe は計算に使う足種（"1d" / "1wk" / "1mo"）。週足・月足は日足から作った行列を受け取る。
+    """
+
+    def __init__(self, name, outputs, compute, cost, timeframe="1d"):
+        self.name = name
+        self.outputs = tuple(outputs)
+        self.compute = compute
+        self.cost = cost
+        self.timeframe = timeframe
+
+
+class Condition:
+    """ルールを構成する条件式。test(c, p) は当日値 c・前日値 p（指標名の属性を持つ）から bool 配列を返す"""
+
+    def __init__(self, name, needs, test):
+        self.name = name
+        self.needs = tuple(needs)
+        self.test = test
+
+
+class Rule:
+    """条件式の集まり。mode="all" は全条件、"any" はいずれかの条件が成り立てば成立する"""
+
+    def __init__(self, key, conditions, mode="all"):
+        self.key = key
+        self.conditions = list(conditions)
+        self.mode = mode
+
+    def holds(self, c, p):
+        """全条件を評価して成立マスクを返す（時系列全体を一括で判定する用途）"""
+        masks = [np.asarray(cond.test(c, p), dtype=bool) for cond in self.conditions]
+        return np.logical_and.reduce(masks) if self.mode == "all" else np.logical_or.reduce(masks)
+
+
+# ==============================================================================
+# --- 通過率・計算コストの統計（実行をまたいで保存） ---
+# ==============================================================================
+class RuleStats:
+    """条件ごとの通過率と、指標ごとの1列あたり計算秒数を集計する
+
+    1回の実行中は metrics のカウンター（plan.<ルール>.<条件>.evaluated / .passed、
+    plan.<指標>.columns）と段階時間（plan.<指標>）に記録し、終了時に absorb() で取り込む。
+    ワーカープロセスの記録も metrics.merge() 経由で同じ形で集まる。
+    """
+
+    def __init__(self, conditions=None, indicators=None):
+        self.conditions = conditions or {}   # "A.rci9" -> [評価列数, 通過列数]
+        self.indicators = indicators or {}   # "dmi" -> [計算列数, 秒数]
+
+    @classmethod
+    def load(cls, path=RULE_STATS_PATH):
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            return cls(data.get("conditions"), data.get("indicators"))
+        except (OSError, ValueError) as e:
+            if os.path.exists(path):
+                print(f"ルール統計の読み込みに失敗しました（初期値で続行）: {e}")
+            return cls()
+
+    def save(self, path=RULE_STATS_PATH):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"conditions": self.conditions, "indicators": self.indicators}, f, ensure_ascii=False, indent=2)
+
+    def pass_rate(self, key):
+        evaluated, passed = self.conditions.get(key, (0, 0))
+        return (passed + PRIOR_RATE * PRIOR_WEIGHT) / (evaluated + PRIOR_WEIGHT)
+
+    def cost(self, indicator):
+        columns, seconds = self.indicators.get(indicator.name, (0, 0.0))
+        return seconds / columns if columns else indicator.cost
+
+    def absorb(self, report, decay=STATS_DECAY):
+        """metrics.to_dict() の plan.* の記録を、既存の統計を decay 倍してから足し込む
+
+        plan.* の記録が無い（評価計画を使わなかった）実行では何もせず False を返す。
+        """
+        counters, stages = report["counters"], report["stages"]
+        seen = {}
+        for name, n in counters.items():
+            parts = name.split(".")
+            if parts[0] != "plan":
+                continue
+            if parts[-1] in ("evaluated", "passed") and len(parts) == 4:
+                seen.setdefault(("c", f"{parts[1]}.{parts[2]}"), [0, 0])[parts[-1] == "passed"] += n
+            elif parts[-1] == "columns" and len(parts) == 3:
+                seen.setdefault(("i", parts[1]), [0, 0.0])[0] += n
+                seen[("i", parts[1])][1] += stages.get(f"plan.{parts[1]}", {}).get("cpu", 0.0)
+        if not seen:
+            return False
+        for table in (self.conditions, self.indicators):
+            for key, (a, b) in table.items():
+                table[key] = [a * decay, b * decay]
+        for (kind, key), (a, b) in seen.items():
+            table = self.conditions if kind == "c" else self.indicators
+            old = table.get(key, [0, 0])
+            table[key] = [old[0] + a, old[1] + b]
+        return True
+
+
+# ==============================================================================
+# --- 評価計画 ---
+# ==============================================================================
+class PlanValues:
+    """指標を必要になった銘柄の分だけ計算し、最終2本（前日・当日）を保持する
+
+    週足・月足の指標は、timeframes（足種→行列。timeframes.Timeframes）から初めて使う時に行列を取り出す。
+    週足・月足の「前日値」は1本前の週・月の値になる。
+    """
+
+    def __init__(self, prices, indicators, timeframes=None):
+        self.timeframes = timeframes
+        self.arrays_by_tf = {"1d": {f: np.asarray(df, dtype=float) for f, df in prices.items()}}
+        self.n = self.arrays_by_tf["1d"]["Close"].shape[1]
+        self.by_output = {out: ind for ind in indicators for out in ind.outputs}
+        self.values = {out: np.full((2, self.n), np.nan) for out in self.by_output}
+        self.done = {ind.name: np.zeros(self.n, dtype=bool) for ind in indicators}
+
+    def indicators_for(self, needs):
+        return list({self.by_output[n].name: self.by_output[n] for n in needs}.values())
+
+    def missing(self, needs, cols):
+        """needs のうち cols の一部でも計算が済んでいない指標の一覧"""
+        return [ind for ind in self.indicators_for(needs) if not self.done[ind.name][cols].all()]
+
+    def arrays(self, timeframe):
+        if timeframe not in self.arrays_by_tf:
+            if self.timeframes is None:
+                raise ValueError(f"足種 {timeframe} の指標には timeframes が必要です")
+            self.arrays_by_tf[timeframe] = {f: np.asarray(df, dtype=float)
+                                            for f, df in self.timeframes[timeframe].items()}
+        return self.arrays_by_tf[timeframe]
+
+    def compute(self, ind, cols):
+        """ind を cols のうち未計算の銘柄の分だけ計算する（1回の呼び出しでまとめて計算する）"""
+        todo = cols[~self.done[ind.name][cols]]
+        if not len(todo):
+            return
+        # 列名の付いた DataFrame を iloc で切り出すより、配列から作り直すほうが速い
+        sub = {f: pd.DataFrame(a[:, todo]) for f, a in self.arrays(ind.timeframe).items()}
+        wall, cpu = time.perf_counter(), time.thread_time()
+        outputs = ind.compute(sub)
+        metrics.add_time(f"plan.{ind.name}", time.perf_counter() - wall, time.thread_time() - cpu)
+        metrics.count(f"plan.{ind.name}.columns", len(todo))
+        for out, arr in zip(ind.outputs, outputs):
+            arr = np.asarray(arr, dtype=float)
+            # 週足・月足は本数が2本に満たないこともある（値の無い側は NaN のまま）
+            self.values[out][2 - len(arr[-2:]):, todo] = arr[-2:]
+        self.done[ind.name][todo] = True
+
+    def take(self, needs, cols):
+        """cols の (当日値, 前日値) を、出力名の属性で引ける形にして返す（未計算の指標はここで計算する）"""
+        for ind in self.missing(needs, cols):
+            self.compute(ind, cols)
+        c = SimpleNamespace(**{n: self.values[n][1, cols] for n in needs})
+        p = SimpleNamespace(**{n: self.values[n][0, cols] for n in needs})
+        return c, p
+
+
+class _RuleState:
+    """評価途中のルール1つ分（判定の付いていない銘柄と、まだ評価していない条件）"""
+
+    def __init__(self, rule, cols):
+        self.rule = rule
+        self.cols = cols
+        self.held = []
+        self.pending = list(rule.conditions)
+
+    @property
+    def finished(self):
+        return not self.pending or not len(self.cols)
+
+    @property
+    def hits(self):
+        if self.rule.mode == "all":
+            return self.cols if not self.pending else self.cols[:0]
+        return np.concatenate(self.held) if self.held else self.cols[:0]
+
+
+class RulePlan:
+    """ルール定義を、指標を遅延計算しながら条件を安い順・絞り込みの強い順に評価する計画にまとめたもの
+
+    全ルールのまだ評価していない条件から、「1銘柄あたりの見込みコスト ÷ その条件で判定が確定する確率」
+    （all は不成立、any は成立で確定）が最小のものを1つずつ評価し、判定の付いた銘柄を候補から外す。
+    見込みコストには未計算の指標の計算時間を含むので、高価な指標はどのルールでも安い条件で
+    候補が絞られた後に回る。指標を計算するときは、その指標を使う条件が残っている全ルールの候補を
+    まとめて1回で計算する（呼び出しごとの固定費を抑えるため）。
+    ルールの優先順位は並び順で、先のルールが成立した銘柄は後のルールの候補から外す。
+    gate は最後に全ルール共通で課す条件。結果は全条件を全銘柄で評価した場合と同じになる。
+    """
+
+    def __init__(self, indicators, rules, gate=None, stats=None):
+        self.indicators = list(indicators)
+        self.rules = list(rules)
+        self.gate = gate
+        self.stats = stats or RuleStats()
+
+    def _score(self, state, cond, values):
+        cost = EVAL_COST + sum(self.stats.cost(ind) for ind in values.missing(cond.needs, state.cols))
+        rate = self.stats.pass_rate(f"{state.rule.key}.{cond.name}")
+        decisive = 1 - rate if state.rule.mode == "all" else rate
+        return cost / max(decisive, 1e-3)
+
+    def evaluate(self, prices, candidates, timeframes=None):
+        """candidates（bool 配列）の銘柄を判定し、(ルールキーの配列（不成立は ""）, PlanValues) を返す
+
+        prices は日足の行列。週足・月足の指標を使うルールがあれば timeframes に同じ銘柄の足種→行列を渡す。
+        PlanValues.take() で、計算済みの指標値（未計算なら計算して）を通知テキスト用に取り出せる。
+        """
+        values = PlanValues(prices, self.indicators, timeframes)
+        states = [_RuleState(rule, np.flatnonzero(candidates)) for rule in self.rules]
+        while True:
+            choices = [(self._score(st, cond, values), i, j, cond)
+                       for i, st in enumerate(states) if not st.finished
+                       for j, cond in enumerate(st.pending)]
+            if not choices:
+                break
+            _, i, _, cond = min(choices, key=lambda x: x[:3])
+            state = states[i]
+            for ind in values.missing(cond.needs, state.cols):
+                users = [st.cols for st in states if not st.finished and
+                         any(ind in values.indicators_for(cd.needs) for cd in st.pending)]
+                values.compute(ind, np.unique(np.concatenate(users)))
+            state.pending.remove(cond)
+
+            mask = np.asarray(cond.test(*values.take(cond.needs, state.cols)), dtype=bool)
+            metrics.count(f"plan.{state.rule.key}.{cond.name}.evaluated", len(state.cols))
+            metrics.count(f"plan.{state.rule.key}.{cond.name}.passed", int(mask.sum()))
+            if state.rule.mode == "all":
+                state.cols = state.cols[mask]
+            else:
+                state.held.append(state.cols[mask])
+                state.cols = state.cols[~mask]
+
+            # 判定の確定したルールの成立銘柄は、優先順位の低いルールでは評価しなくてよい
+            for k, done in enumerate(states):
+                if done.finished:
+                    for later in states[k + 1:]:
+                        later.cols = np.setdiff1d(later.cols, done.hits, assume_unique=True)
+
+        keys = np.full(values.n, "", dtype=object)
+        for state in reversed(states):
+            keys[state.hits] = state.rule.key
+        if self.gate is not None:
+            hit = np.flatnonzero(keys != "")
+            if len(hit):
+                keys[hit[~np.asarray(self.gate.test(*values.take(self.gate.needs, hit)), dtype=bool)]] = ""
+        return keys, values
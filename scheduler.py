@@ -0,0 +1,73 @@
+import math
+import time
+
+# ==============================================================================
+# --- 設定項目 ---
+# ==============================================================================
+PERIOD_SEC = 60        # 1分足に合わせた起動間隔
+BAR_OFFSET_SEC = 5     # 分の切り替わり（足の確定）から何秒後に起動するか
+CYCLE_BUDGET_SEC = 50  # 1巡に使える秒数（起動時刻 + この秒数が締め切り）
+
+
+# ==============================================================================
+# --- 足の確定時刻に揃えて起動するスケジューラー ---
+# ==============================================================================
+class MinuteScheduler:
+    """毎分0秒から offset 秒後に job を起動し、締め切りと遅延を管理するスケジューラー
+
+    JST は UTC+9 時間ちょうどなので、エポック秒の分境界がそのまま JST の分境界になる。
+    「処理時間 + sleep(60)」と違い、起動時刻は毎回 分境界 + offset に揃うためずれが蓄積しない。
+    前の巡回が長引いて起動予定を過ぎた回は飛ばし（overrun として数える）、次の予定時刻から再開する。
+    clock / sleep を差し替えれば実時間を待たずに試せる。
+    """
+
+    def __init__(self, offset=BAR_OFFSET_SEC, period=PERIOD_SEC, budget=CYCLE_BUDGET_SEC,
+                 clock=time.time, sleep=time.sleep, metrics=None):
+        self.offset = offset
+        self.period = period
+        self.budget = budget
+        self.clock = clock
+        self.sleep = sleep
+        self.metrics = metrics
+
+    def next_fire(self, now):
+        """now 以降で最初の 分境界 + offset の時刻"""
+        fire = math.floor((now - self.offset) / self.period) * self.period + self.offset
+        return fire if fire >= now else fire + self.period
+
+    def run(self, job, should_run=lambda fire: True, cycles=None, after=None):
+        """予定時刻ごとに job(deadline) を呼ぶ。should_run(fire) が False の回は何もしない
+
+        after が指定されていれば、job の計測値を記録した後に毎回呼ぶ（レポート書き出し用）。
+        """
+        done = 0
+        fire = self.next_fire(self.clock())
+        while cycles is None or done < cycles:
+            now = self.clock()
+            if fire > now:
+                self.sleep(fire - now)
+            if should_run(fire):
+                started = self.clock()
+                deadline = fire + self.budget
+                job(deadline)
+                finished = self.clock()
+                self._record(lag=started - fire, elapsed=finished - started, overrun=finished > deadline)
+                if after is not None:
+                    after()
+            done += 1
+
+            # 次の予定時刻。長引いて過ぎてしまった回は飛ばす
+            following = max(self.next_fire(self.clock()), fire + self.period)
+            skipped = int((following - fire) // self.period) - 1
+            if skipped > 0 and self.metrics is not None:
+                self.metrics.count("skipped_slots", skipped)
+            fire = following
+
+    def _record(self, lag, elapsed, overrun):
+        if self.metrics is None:
+            return
+        self.metrics.count("cycles")
+        self.metrics.observe("lag_sec", lag)
+        self.metrics.observe("cycle_sec", elapsed)
+        if overrun:
+            self.metrics.count("overruns")
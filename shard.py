@@ -0,0 +1,110 @@
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+
+# ==============================================================================
+# --- 設定項目 ---
+# ==============================================================================
+SHARD_DIR = "patrol_shards"   # 分割巡回の部分結果（shard-i-of-N.json とスナップショット）を置くディレクトリ
+
+
+# ==============================================================================
+# --- 銘柄リストの分割 ---
+# ==============================================================================
+def parse_shard(spec):
+    """"i/N"（i は 1〜N）を (i, N) にする"""
+    match = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", spec or "")
+    if not match:
+        raise ValueError(f"分割指定は i/N の形式で指定してください: {spec!r}")
+    index, count = int(match.group(1)), int(match.group(2))
+    if not 1 <= index <= count:
+        raise ValueError(f"分割番号は 1〜{count} で指定してください: {spec!r}")
+    return index, count
+
+
+def shard_of(ticker, count):
+    """銘柄コードのハッシュから 1〜count の分割番号を決める
+
+    Python の hash() はプロセスごとに値が変わるので使わない。SHA-1 なら別のマシン・別の実行でも
+    同じ銘柄は同じ分割に入り、銘柄リストの増減があっても他の銘柄の割り当ては変わらない。
+    """
+    digest = hashlib.sha1(ticker.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+
+def select_shard(tickers, index, count):
+    """tickers のうち index 番目の分割に入る銘柄を、元の順序のまま返す"""
+    return [t for t in tickers if shard_of(t, count) == index]
+
+
+def universe_key(tickers):
+    """銘柄リストの識別子（分割ごとに取得した銘柄リストが同じだったかの確認用）"""
+    return hashlib.sha1("\n".join(tickers).encode("utf-8")).hexdigest()[:16]
+
+
+# ==============================================================================
+# --- 部分結果ファイル ---
+# ==============================================================================
+def partial_path(shard_dir, index, count):
+    return os.path.join(shard_dir, f"shard-{index}-of-{count}.json")
+
+
+def snapshot_path(shard_dir, index, count):
+    return os.path.join(shard_dir, f"snapshot-{index}-of-{count}")
+
+
+def shard_file(path, index, count):
+    """分割ごとに別にするファイル名（同じマシンで N プロセス動かしても途中経過が混ざらないように）"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard-{index}-of-{count}{ext}"
+
+
+def write_partial(path, partial):
+    """部分結果を JSON で書き出す（一時ファイルに書いてから差し替える）"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(partial, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def load_partials(shard_dir=SHARD_DIR):
+    """shard_dir にある部分結果をすべて読み込み、分割数・分割番号の順で返す"""
+    partials = []
+    for path in glob.glob(os.path.join(shard_dir, "shard-*-of-*.json")):
+        try:
+            with open(path, encoding="utf-8") as f:
+                partial = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"部分結果を読み込めませんでした: {path} ({e})")
+            continue
+        partial["path"] = path
+        partials.append(partial)
+    return sorted(partials, key=lambda p: (p["shards"], p["shard"]))
+
+
+def latest_run(partials):
+    """部分結果のうち最も新しい巡回の分を選び、(その巡回の部分結果, 欠けている分割番号) を返す
+
+    同じディレクトリに前回以前の巡回や別の分割数の結果が残っていても、それらは混ぜない。
+    """
+    if not partials:
+        return [], []
+    run_key = max(partials, key=lambda p: p["started_at"])["run_key"]
+    selected = [p for p in partials if p["run_key"] == run_key]
+    done = {p["shard"] for p in selected}
+    return selected, [i for i in range(1, selected[0]["shards"] + 1) if i not in done]
+
+
+def remove_partials(partials):
+    """通知まで終わった部分結果とそのスナップショットを消す"""
+    for partial in partials:
+        shard_dir = os.path.dirname(partial["path"])
+        shutil.rmtree(snapshot_path(shard_dir, partial["shard"], partial["shards"]), ignore_errors=True)
+        try:
+            os.remove(partial["path"])
+        except OSError:
+            pass
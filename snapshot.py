@@ -0,0 +1,114 @@
+import json
+import os
+import shutil
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+# --- 設定項目 ---
+# ==============================================================================
+SNAPSHOT_PATH = "indicator_snapshot"   # 列ごとの .npy と meta.json を置くディレクトリ
+
+JST = timezone(timedelta(hours=9))
+
+
+# ==============================================================================
+# --- 全銘柄の最新指標スナップショット（列指向・メモリマップで読める形式） ---
+# ==============================================================================
+class SnapshotCollector:
+    """パトロール中に計算した銘柄ごとの最新指標を集め、列ごとの .npy に書き出すレコーダー
+
+    チャンクごとに add() された行を貯め、同じ銘柄が複数回来た場合は後から来た行
+    （2段階パイプラインなら長期データでの判定結果）を採用する。
+    enabled が False の間は記録しない（呼び出し側も指標の追加計算を省く）。
+    """
+
+    def __init__(self):
+        self.reset(enabled=False)
+
+    def reset(self, enabled=True):
+        self.enabled = enabled
+        self.frames = []
+
+    def add(self, frame):
+        if self.enabled and len(frame):
+            self.frames.append(frame)
+
+    def to_frame(self):
+        if not self.frames:
+            return pd.DataFrame()
+        df = pd.concat(self.frames)
+        return df[~df.index.duplicated(keep="last")].sort_index()
+
+    def write(self, path=SNAPSHOT_PATH, names=None, meta=None):
+        df = self.to_frame()
+        if names is not None:
+            df.insert(0, "name", [names.get(t, "") for t in df.index])
+        return write_snapshot(df, path, meta)
+
+
+def write_snapshot(df, path=SNAPSHOT_PATH, meta=None):
+    """ticker を索引とする DataFrame を、銘柄コード順に並べた列ごとの .npy として保存する
+
+    文字列列は固定長 Unicode、bool・数値列はそのままの dtype で保存するので、
+    読み込み側は np.load(mmap_mode="r") でファイル全体を読まずに参照できる。
+    書き込みは一時ディレクトリに行ってから差し替える（読み込み中のアプリに途中状態を見せない）。
+    """
+    df = df.sort_index()
+    tmp = path + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    columns = {"ticker": df.index.to_numpy(dtype=str)}
+    for col in df.columns:
+        values = df[col].to_numpy()
+        columns[col] = values.astype(str) if values.dtype == object else values
+    for col, values in columns.items():
+        np.save(os.path.join(tmp, f"{col}.npy"), values, allow_pickle=False)
+
+    info = {
+        "created_at": datetime.now(JST).isoformat(timespec="seconds"),
+        "rows": len(df),
+        "columns": list(columns),
+        **(meta or {}),
+    }
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(info, f, ensure_ascii=False, indent=2)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+    return info
+
+
+class Snapshot:
+    """write_snapshot で保存したスナップショットの読み込み側（各列はメモリマップ）"""
+
+    def __init__(self, path=SNAPSHOT_PATH):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.columns = {col: np.load(os.path.join(path, f"{col}.npy"), mmap_mode="r", allow_pickle=False)
+                        for col in self.meta["columns"]}
+        self.tickers = self.columns["ticker"]
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def lookup(self, ticker):
+        """1銘柄分の値を {列名: 値} で返す。無ければ None（銘柄コード順の二分探索）"""
+        i = int(np.searchsorted(self.tickers, ticker))
+        if i >= len(self.tickers) or self.tickers[i] != ticker:
+            return None
+        return {col: values[i].item() for col, values in self.columns.items()}
+
+    def frame(self, columns=None):
+        """指定した列（省略時は全列）を ticker 索引の DataFrame にする"""
+        columns = [c for c in (columns or self.meta["columns"]) if c != "ticker"]
+        return pd.DataFrame({c: np.asarray(self.columns[c]) for c in columns},
+                            index=pd.Index(np.asarray(self.tickers), name="ticker"))
+
+
+# パトロール全体で共有する記録先（instrumentation.metrics と同じ使い方）
+snapshot = SnapshotCollector()
@@ -0,0 +1,264 @@
+import copy
+import json
+import math
+from collections import deque
+
+# ==============================================================================
+# --- 逐次更新型テクニカル指標（1本ずつ足し込み、全期間の再計算をしない） ---
+# ==============================================================================
+# 各クラスの update() は新しい1本を受け取って最新値を返す。値が揃う前は NaN を返し、
+# monitor_stocks の pandas 版（calculate_rci / calculate_psy / calculate_dmi / ewm）と
+# 同じ本数目から同じ値を出す。状態は dumps() / loads() で JSON にして再起動後も引き継げる。
+NAN = float("nan")
+
+
+def _fmax(a, b):
+    """np.fmax と同じく、片方が NaN ならもう片方を返す max"""
+    if a != a:
+        return b
+    if b != b:
+        return a
+    return a if a >= b else b
+
+
+class StreamingIndicator:
+    """逐次更新型指標の基底クラス"""
+
+    def update(self, *bar):
+        raise NotImplementedError
+
+    def peek(self, *bar):
+        """状態を変えずに、bar を足したときの値だけを返す（場中の暫定バー用）"""
+        return copy.deepcopy(self).update(*bar)
+
+    def to_dict(self):
+        return {"type": type(self).__name__, "state": {k: _encode(v) for k, v in vars(self).items()}}
+
+    @staticmethod
+    def from_dict(d):
+        cls = INDICATORS[d["type"]]
+        obj = cls.__new__(cls)
+        obj.__dict__.update({k: _decode(v) for k, v in d["state"].items()})
+        return obj
+
+
+class RollingSum(StreamingIndicator):
+    """直近 period 本の合計（pandas の rolling(period).sum() と同じく、NaN を含む間は NaN）
+
+    合計は抜ける値を引き、入る値を足して更新する。引き算の丸め誤差が長い系列で積み重ならないよう、
+    period 本ごとにウィンドウを足し直す（1本あたりの計算量は O(1) のまま）。
+    """
+
+    steps = 0   # 足し直してからの本数（この属性が無い古い保存状態は 0 から数える）
+
+    def __init__(self, period):
+        self.period = period
+        self.window = deque(maxlen=period)
+        self.total = 0.0
+        self.nans = 0
+
+    def update(self, x):
+        if len(self.window) == self.period:
+            old = self.window[0]
+            if old != old:
+                self.nans -= 1
+            else:
+                self.total -= old
+        self.window.append(x)
+        if x != x:
+            self.nans += 1
+        else:
+            self.total += x
+        self.steps += 1
+        if self.steps >= self.period:
+            self.steps = 0
+            self.total = math.fsum(v for v in self.window if v == v)
+        if len(self.window) < self.period or self.nans:
+            return NAN
+        return self.total
+
+
+# ==============================================================================
+# --- EMA / MACD ---
+# ==============================================================================
+class EMA(StreamingIndicator):
+    """指数移動平均。pandas の ewm(span=span, adjust=adjust).mean() と同じ漸化式で更新する"""
+
+    def __init__(self, span, adjust=True):
+        com = (span - 1) / 2.0
+        alpha = 1.0 / (1.0 + com)
+        self.old_wt_factor = 1.0 - alpha
+        self.new_wt = 1.0 if adjust else alpha
+        self.adjust = adjust
+        self.old_wt = 1.0
+        self.value = NAN
+
+    def update(self, x):
+        if self.value == self.value:
+            self.old_wt *= self.old_wt_factor
+            if x == x:
+                if self.value != x:
+                    self.value = (self.old_wt * self.value + self.new_wt * x) / (self.old_wt + self.new_wt)
+                self.old_wt = self.old_wt + self.new_wt if self.adjust else 1.0
+        elif x == x:
+            self.value = x
+        return self.value
+
+
+class MACD(StreamingIndicator):
+    """MACD とシグナル線。update(close) は (MACD, シグナル) を返す"""
+
+    def __init__(self, fast=12, slow=26, signal=9, adjust=True):
+        self.fast = EMA(fast, adjust)
+        self.slow = EMA(slow, adjust)
+        self.signal = EMA(signal, adjust)
+
+    def update(self, close):
+        macd = self.fast.update(close) - self.slow.update(close)
+        return macd, self.signal.update(macd)
+
+
+# ==============================================================================
+# --- RCI / PSY ---
+# ==============================================================================
+class RCI(StreamingIndicator):
+    """RCI。_rci_sliding と同じく、抜ける値・入る値との比較だけで順位を差分更新する（1本 O(period)）"""
+
+    def __init__(self, period):
+        self.period = period
+        self.win = []
+        self.cnt = []      # cnt[s] = ウィンドウ内で win[s] 以上の値の数（= 降順 method='max' の順位）
+        self.oldest = 0
+        self.nans = 0
+
+    def update(self, x):
+        x = float(x)
+        p, win, cnt = self.period, self.win, self.cnt
+        if len(win) < p:
+            win.append(x)
+            self.nans += int(x != x)
+            if len(win) < p:
+                return NAN
+            cnt[:] = [sum(w >= v for w in win) for v in win]
+        else:
+            o = self.oldest
+            old = win[o]
+            for s in range(p):
+                cnt[s] -= old >= win[s]
+            win[o] = x
+            for s in range(p):
+                cnt[s] += x >= win[s]
+            cnt[o] = sum(w >= x for w in win)
+            self.nans += int(x != x) - int(old != old)
+            self.oldest = (o + 1) % p
+        if self.nans:
+            return NAN
+        o = self.oldest
+        d2 = sum((cnt[s] - (p - (s - o) % p)) ** 2 for s in range(p))
+        return (1 - (6 * d2) / (p * (p**2 - 1))) * 100
+
+
+class PSY(StreamingIndicator):
+    """サイコロジカルライン（直近 period 本のうち前日比プラスの割合 × 100）"""
+
+    def __init__(self, period=12):
+        self.period = period
+        self.ups = RollingSum(period)
+        self.prev = NAN
+
+    def update(self, close):
+        up = 1.0 if close - self.prev > 0 else 0.0
+        self.prev = close
+        return self.ups.update(up) / self.period * 100
+
+
+# ==============================================================================
+# --- DMI / VWAP / 値幅 ---
+# ==============================================================================
+class DMI(StreamingIndicator):
+    """+DI / -DI / ADX。update(high, low, close) は (+DI, -DI, ADX) を返す"""
+
+    def __init__(self, di_period=14, adx_period=9):
+        self.adx_period = adx_period
+        self.tr = RollingSum(di_period)
+        self.plus_dm = RollingSum(di_period)
+        self.minus_dm = RollingSum(di_period)
+        self.dx = RollingSum(adx_period)
+        self.prev_high = self.prev_low = self.prev_close = NAN
+
+    def update(self, high, low, close):
+        up_move = high - self.prev_high
+        down_move = (low - self.prev_low) * -1
+        plus_dm = up_move if up_move > down_move and up_move > 0 else 0.0
+        minus_dm = down_move if down_move > up_move and down_move > 0 else 0.0
+        tr = _fmax(_fmax(high - low, abs(high - self.prev_close)), abs(low - self.prev_close))
+        self.prev_high, self.prev_low, self.prev_close = high, low, close
+
+        tr_smooth = self.tr.update(tr)
+        plus_di = (self.plus_dm.update(plus_dm) / (tr_smooth + 1e-9)) * 100
+        minus_di = (self.minus_dm.update(minus_dm) / (tr_smooth + 1e-9)) * 100
+        dx = abs(plus_di - minus_di) / (plus_di + minus_di + 1e-9) * 100
+        return plus_di, minus_di, self.dx.update(dx) / self.adx_period
+
+
+class VWAP(StreamingIndicator):
+    """直近 period 本の出来高加重平均価格（終値×出来高の合計 ÷ 出来高の合計）"""
+
+    def __init__(self, period=25):
+        self.amount = RollingSum(period)
+        self.volume = RollingSum(period)
+
+    def update(self, close, volume):
+        amount, total = self.amount.update(close * volume), self.volume.update(volume)
+        return amount / total if total else NAN
+
+
+class RollingRange(StreamingIndicator):
+    """直近 period 本の平均値幅（高値−安値）。本数が足りない間は揃っている分の平均（tail(period).mean() と同じ）"""
+
+    def __init__(self, period=7):
+        self.window = deque(maxlen=period)
+
+    def update(self, high, low):
+        self.window.append(high - low)
+        valid = [r for r in self.window if r == r]
+        return sum(valid) / len(valid) if valid else NAN
+
+
+# ==============================================================================
+# --- 状態の保存・復元 ---
+# ==============================================================================
+INDICATORS = {cls.__name__: cls for cls in (RollingSum, EMA, MACD, RCI, PSY, DMI, VWAP, RollingRange)}
+
+
+def _encode(v):
+    if isinstance(v, StreamingIndicator):
+        return v.to_dict()
+    if isinstance(v, deque):
+        return {"deque": [_encode(x) for x in v], "maxlen": v.maxlen}
+    if isinstance(v, dict):
+        return {"dict": {k: _encode(x) for k, x in v.items()}}
+    if isinstance(v, (list, tuple)):
+        return [_encode(x) for x in v]
+    return v
+
+
+def _decode(v):
+    if isinstance(v, dict):
+        if "deque" in v:
+            return deque([_decode(x) for x in v["deque"]], maxlen=v["maxlen"])
+        if "dict" in v:
+            return {k: _decode(x) for k, x in v["dict"].items()}
+        return StreamingIndicator.from_dict(v)
+    if isinstance(v, list):
+        return [_decode(x) for x in v]
+    return v
+
+
+def dumps(states):
+    """指標（またはそれを値に持つ dict / list）を JSON 文字列にする。NaN はそのまま保存される"""
+    return json.dumps(_encode(states))
+
+
+def loads(text):
+    return _decode(json.loads(text))
@@ -0,0 +1,127 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import alert_store
+from alert_store import AlertStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "alerts.sqlite")
+
+
+def claim_in_subprocess(path, keys, ttl=3600):
+    """別プロセスで同じファイルを開いて claim し、新規と判定されたキーを返す"""
+    code = ("import json, sys; from alert_store import AlertStore; "
+            "s = AlertStore(sys.argv[1]); print(json.dumps(s.claim(json.loads(sys.argv[2]), float(sys.argv[3]))))")
+    out = subprocess.run([sys.executable, "-c", code, path, json.dumps(keys), str(ttl)],
+                         cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout)
+
+
+def test_claim_dedupes_keys(path):
+    store = AlertStore(path, clock=Clock())
+    assert store.claim(["7203.T|golden", "7203.T|golden", "9984.T|golden"], ttl=60) == ["7203.T|golden", "9984.T|golden"]
+    assert store.claim(["9984.T|golden", "6758.T|golden"], ttl=60) == ["6758.T|golden"]
+    assert store.fresh(["7203.T|golden", "8306.T|golden"]) == ["8306.T|golden"]
+    assert len(store) == 3
+
+
+def test_keys_expire_after_ttl(path):
+    clock = Clock()
+    store = AlertStore(path, clock=clock)
+    store.claim(["a"], ttl=60)
+    store.claim(["b"], ttl=600)
+    clock.now += 60
+    assert store.fresh(["a", "b"]) == ["a"]
+    assert store.claim(["a", "b"], ttl=60) == ["a"]
+    clock.now += 60
+    assert store.claim(["a", "b"], ttl=60) == ["a"]
+    # 期限切れの行は claim のたびに削除される
+    rows = store.conn.execute("SELECT key FROM alerts ORDER BY key").fetchall()
+    assert rows == [("a",), ("b",)]
+    clock.now += 600
+    store.evict()
+    assert store.conn.execute("SELECT COUNT(*) FROM alerts").fetchone()[0] == 0
+
+
+def test_refresh_extends_expiry_without_renotifying(path):
+    clock = Clock()
+    store = AlertStore(path, clock=clock)
+    store.claim(["a"], ttl=60)
+    for _ in range(5):
+        clock.now += 50
+        assert store.claim(["a"], ttl=60, refresh=True) == []
+    assert store.conn.execute("SELECT sent FROM alerts WHERE key = 'a'").fetchone()[0] == 1_000_000.0
+    clock.now += 61
+    assert store.claim(["a"], ttl=60, refresh=True) == ["a"]
+
+
+def test_records_survive_reopen_and_other_processes(path):
+    store = AlertStore(path)
+    assert store.claim(["7203.T|golden", "9984.T|golden"], ttl=3600) == ["7203.T|golden", "9984.T|golden"]
+    store.close()
+
+    reopened = AlertStore(path)
+    assert reopened.fresh(["7203.T|golden", "6758.T|golden"]) == ["6758.T|golden"]
+    # 開いたままのストアと別プロセスが同じファイルを共有する
+    assert claim_in_subprocess(path, ["9984.T|golden", "6758.T|golden"]) == ["6758.T|golden"]
+    assert reopened.claim(["6758.T|golden", "8306.T|golden"], ttl=3600) == ["8306.T|golden"]
+    reopened.close()
+
+
+def test_concurrent_processes_never_claim_the_same_key(path):
+    AlertStore(path).close()
+    keys = [f"{1000 + i}.T|golden" for i in range(300)]
+    code = ("import json, sys; from alert_store import AlertStore; "
+            "print(json.dumps(AlertStore(sys.argv[1]).claim(json.loads(sys.argv[2]), 3600)))")
+    procs = [subprocess.Popen([sys.executable, "-c", code, path, json.dumps(keys[i * 50:] + keys[:i * 50])],
+                              cwd=ROOT, stdout=subprocess.PIPE, text=True) for i in range(4)]
+    claimed = [json.loads(p.communicate()[0]) for p in procs]
+    assert all(p.returncode == 0 for p in procs)
+    assert sorted(k for part in claimed for k in part) == sorted(keys)
+
+
+def test_forget_and_clear(path):
+    store = AlertStore(path, clock=Clock())
+    store.claim(["midday|7203.T", "midday|9984.T", "close|7203.T", "mid_day|1"], ttl=60)
+    store.forget(["midday|9984.T", "unknown"])
+    assert store.fresh(["midday|7203.T", "midday|9984.T"]) == ["midday|9984.T"]
+    # "_" や "%" は LIKE のワイルドカードとして扱わない
+    store.clear("mid_")
+    assert store.fresh(["mid_day|1", "midday|7203.T"]) == ["mid_day|1"]
+    store.clear("midday|")
+    assert len(store) == 1
+
+
+def test_max_rows_drops_oldest(path):
+    clock = Clock()
+    store = AlertStore(path, clock=clock, max_rows=3)
+    for key in "abcde":
+        clock.now += 1
+        store.claim([key], ttl=3600)
+    assert store.fresh(list("abcde")) == ["a", "b"]
+
+
+def test_many_keys_are_batched(path, monkeypatch):
+    monkeypatch.setattr(alert_store, "BATCH", 7)
+    store = AlertStore(path, clock=Clock())
+    keys = [str(i) for i in range(50)]
+    assert store.claim(keys[:30], ttl=60) == keys[:30]
+    assert store.claim(keys, ttl=60) == keys[30:]
+    store.forget(keys[:20])
+    assert store.fresh(keys) == keys[:20]
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from candlestick import PATTERN_LABELS, candle_patterns, describe, pattern_codes
+
+# パターンごとに (成立する足の並び, 最後の足だけ変えて成立しない並び)。足は (始値, 高値, 安値, 終値)
+CASES = {
+    "harami_bull": ([(110, 111, 99, 100), (102, 106, 101, 105)],
+                    [(110, 111, 99, 100), (102, 113, 101, 112)]),      # 2本目の実体が1本目からはみ出す
+    "harami_bear": ([(100, 111, 99, 110), (108, 109, 104, 105)],
+                    [(100, 111, 99, 110), (108, 109, 97, 98)]),
+    "tweezer_bottom": ([(110, 111, 95, 97), (97, 108, 95.2, 106)],
+                       [(110, 111, 95, 97), (97, 108, 93, 106)]),      # 安値が揃っていない
+    "tweezer_top": ([(100, 115, 99, 113), (113, 115.3, 104, 105)],
+                    [(100, 115, 99, 113), (113, 118, 104, 105)]),
+    "morning_star": ([(120, 121, 99, 100), (98, 99, 95, 97), (99, 116, 98, 115)],
+                     [(120, 121, 99, 100), (98, 99, 95, 97), (99, 109, 98, 108)]),  # 1本目の半値まで戻さない
+    "evening_star": ([(100, 121, 99, 120), (122, 125, 121, 123), (121, 122, 104, 105)],
+                     [(100, 121, 99, 120), (122, 125, 121, 123), (121, 122, 111, 112)]),
+    "three_white_soldiers": ([(100, 111, 99, 110), (105, 121, 104, 120), (115, 131, 114, 130)],
+                             [(100, 111, 99, 110), (105, 121, 104, 120), (125, 141, 124, 140)]),  # 窓を開けて寄り付く
+    "three_black_crows": ([(130, 131, 119, 120), (125, 126, 109, 110), (115, 116, 99, 100)],
+                          [(130, 131, 119, 120), (125, 126, 109, 110), (105, 106, 89, 90)]),
+}
+
+
+def ohlc(bars):
+    return [np.array(x, dtype=float) for x in zip(*bars)]
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_pattern_on_single_series(name):
+    positive, negative = CASES[name]
+    flags = candle_patterns(*ohlc(positive))[name]
+    assert flags.tolist() == [False] * (len(positive) - 1) + [True]
+    assert not candle_patterns(*ohlc(negative))[name].any()
+    # 前の足が足りない先頭のバーでは成立しない（最後の足だけ渡しても False）
+    assert not candle_patterns(*ohlc(positive[1:]))[name].any()
+    assert PATTERN_LABELS[name] in describe(pattern_codes(candle_patterns(*ohlc(positive)))[-1])
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_pattern_on_ticker_by_day_arrays(name):
+    positive, negative = CASES[name]
+    # (銘柄×日数) の2次元配列を axis=1 で判定しても、(日数×銘柄) を axis=0 で判定しても同じ
+    rows = [np.stack(x) for x in zip(ohlc(positive), ohlc(negative))]
+    by_ticker = candle_patterns(*rows, axis=1)[name]
+    by_day = candle_patterns(*(r.T for r in rows))[name]
+    assert by_ticker.shape == rows[0].shape
+    assert by_ticker[:, -1].tolist() == [True, False]
+    assert not by_ticker[:, :-1].any()
+    np.testing.assert_array_equal(by_day.T, by_ticker)
+
+
+OPPOSITE = {"harami_bull": "harami_bear", "tweezer_bottom": "tweezer_top", "morning_star": "evening_star",
+            "three_white_soldiers": "three_black_crows"}
+OPPOSITE.update({v: k for k, v in OPPOSITE.items()})
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_opposite_pattern_does_not_fire(name):
+    flags = candle_patterns(*ohlc(CASES[name][0]))
+    assert not flags[OPPOSITE[name]].any()
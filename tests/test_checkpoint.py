@@ -0,0 +1,126 @@
+import os
+import sqlite3
+from contextlib import ExitStack
+from functools import partial
+from unittest import mock
+
+import pytest
+
+import monitor_stocks
+from benchmark import FakeDiscord, FakeYFinance, _patch_patrol, _patrol_output, synthetic_ohlcv
+from checkpoint import PatrolCheckpoint
+from downloader import ChunkDownloader
+from instrumentation import metrics
+from panel_pool import PanelPool
+
+N_TICKERS = 400
+
+
+@pytest.fixture(scope="module")
+def panel():
+    # seed=3 はルールに掛かる銘柄があるデータ（通知本文の比較が空振りにならないように）
+    return synthetic_ohlcv(N_TICKERS, 260, seed=3)
+
+
+def run_patrol(workdir, panel, scan_mode, fake_yf):
+    """合成データ・わざと失敗するフェイクで main() を通し、(通知本文, スナップショット) を返す"""
+    os.makedirs(workdir, exist_ok=True)
+    discord = FakeDiscord()
+    ticker_map = {t: f"銘柄{t[:-2]}" for t in panel["Close"].columns}
+    with ExitStack() as stack:
+        _patch_patrol(stack, fake_yf, discord, ticker_map, scan_mode, str(workdir))
+        # 取得を1本ずつ順に行い、crash_after で止まる位置（記録済みのチャンク）を毎回同じにする
+        stack.enter_context(mock.patch.object(monitor_stocks, "ChunkDownloader",
+                                              partial(ChunkDownloader, max_workers=1, rate=None, retries=0)))
+        monitor_stocks.main(report_path=None, snapshot_path=os.path.join(workdir, "snapshot"), workers=1)
+    return _patrol_output(discord, os.path.join(workdir, "snapshot"))
+
+
+def checkpoint_rows(workdir):
+    with sqlite3.connect(os.path.join(workdir, "checkpoint.sqlite")) as conn:
+        return conn.execute("SELECT COUNT(*) FROM tickers").fetchone()[0]
+
+
+# ==============================================================================
+# (a) 途中で止まった巡回の再開
+# ==============================================================================
+@pytest.mark.parametrize("scan_mode", ["staged", "panel", "ticker"])
+def test_resumed_run_matches_uninterrupted_run(tmp_path, panel, scan_mode):
+    poison = ["1057.T", "1321.T"]
+    full_msg, full_snap = run_patrol(tmp_path / "full", panel, scan_mode, FakeYFinance(daily=panel, fail_tickers=poison))
+
+    resumed_dir = tmp_path / "resumed"
+    with pytest.raises(KeyboardInterrupt):
+        run_patrol(resumed_dir, panel, scan_mode, FakeYFinance(daily=panel, fail_tickers=poison, crash_after=2))
+    assert checkpoint_rows(resumed_dir) > 0
+
+    fake_yf = FakeYFinance(daily=panel, fail_tickers=poison)
+    resumed_msg, resumed_snap = run_patrol(resumed_dir, panel, scan_mode, fake_yf)
+    assert any(line.startswith("**🛑 ルールC") for line in full_msg)
+    assert resumed_msg == full_msg
+    if scan_mode == "ticker":
+        assert full_snap is None and resumed_snap is None
+    else:
+        assert resumed_snap.equals(full_snap)
+    # 記録済みのチャンクは取り直していない
+    assert metrics.counters["resumed_scan" if scan_mode != "staged" else "resumed_stage1"] > 0
+
+
+# ==============================================================================
+# (b) 取得エラーのチャンクの取り直し
+# ==============================================================================
+def test_failed_chunk_is_retried_in_sub_chunks(tmp_path):
+    tickers = [f"{1000 + i}.T" for i in range(250)]
+    poison = "1130.T"
+    calls = []
+
+    def fetch(chunk):
+        calls.append(list(chunk))
+        if poison in chunk:
+            raise ConnectionError("fake download failure")
+        return list(chunk)
+
+    def submit(data, chunk):
+        return pool.submit(lambda data, chunk: list(chunk), data, chunk), list(chunk)
+
+    metrics.reset()
+    checkpoint = PatrolCheckpoint(str(tmp_path / "checkpoint.sqlite"), "test")
+    with PanelPool(workers=1) as pool:
+        results = monitor_stocks.run_chunks("scan", tickers, fetch, submit, pool,
+                                            ChunkDownloader(rate=None, retries=0), checkpoint)
+
+    size = monitor_stocks.RETRY_CHUNK_SIZE
+    failed_chunk = tickers[100:200]
+    retried = [c for c in calls if c[0] in failed_chunk and len(c) <= size]
+    assert [len(c) for c in calls].count(100) == 2            # 1回目: 100銘柄チャンクのうち1つが失敗
+    assert sorted(t for c in retried for t in c) == sorted(failed_chunk)
+    assert all(len(c) == size for c in retried)
+
+    # 諦めたのは失敗銘柄を含む小分けチャンクの分だけで、他の銘柄はすべて判定されている
+    gave_up = next(c for c in retried if poison in c)
+    statuses = checkpoint.statuses("scan")
+    assert {t for t, s in statuses.items() if s == "gave_up"} == set(gave_up)
+    assert {t for t, s in statuses.items() if s == "ok"} == set(tickers) - set(gave_up)
+    assert sorted(t for _, value in results for t in value) == sorted(set(tickers) - set(gave_up))
+    assert metrics.counters["retried_tickers"] == len(failed_chunk)
+    assert metrics.counters["failed_tickers"] == size
+    assert metrics.errors["download:ConnectionError"] == 2
+    checkpoint.close()
+
+
+# ==============================================================================
+# (c) 通知の成否と途中経過の後始末
+# ==============================================================================
+@pytest.mark.parametrize("sent", [False, True])
+def test_checkpoint_kept_until_delivered(tmp_path, panel, sent):
+    printed = []
+    with mock.patch.object(monitor_stocks, "deliver", return_value=sent) as deliver, \
+            mock.patch.object(monitor_stocks, "print", lambda *a, **k: printed.append(" ".join(map(str, a))), create=True):
+        run_patrol(tmp_path, panel, "panel", FakeYFinance(daily=panel))
+    assert deliver.called
+    if sent:
+        assert checkpoint_rows(tmp_path) == 0
+        assert printed[-1] == "パトロール完了・通知を送信しました。"
+    else:
+        assert checkpoint_rows(tmp_path) == N_TICKERS
+        assert "通知を送れませんでした" in printed[-1] and "送り直します" in printed[-1]
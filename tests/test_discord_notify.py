@@ -0,0 +1,183 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from discord_notify import FENCE, MAX_CONTENT, DiscordQueue, DiscordWebhook, pack_messages, split_message
+
+
+# ==============================================================================
+# --- 分割 ---
+# ==============================================================================
+def code_blocks_balanced(piece):
+    return sum(line.lstrip().startswith(FENCE) for line in piece.split("\n")) % 2 == 0
+
+
+def test_plain_text_is_not_split_below_limit():
+    assert split_message("x" * 1995) == ["x" * 1995]
+    assert split_message("x" * MAX_CONTENT) == ["x" * MAX_CONTENT]
+
+
+def test_long_code_block_is_closed_and_reopened():
+    codes = ",".join(str(1000 + i) for i in range(900))
+    content = "header\n```\n" + codes + "\n```\nfooter"
+    pieces = split_message(content)
+    assert len(pieces) > 1
+    assert all(len(p) <= MAX_CONTENT for p in pieces)
+    assert all(code_blocks_balanced(p) for p in pieces)
+    lines = [line for p in pieces for line in p.split("\n") if line != FENCE]
+    assert lines[0] == "header" and lines[-1] == "footer"
+    assert "".join(lines[1:-1]) == codes   # 長すぎる1行だけは行の途中で切られる
+
+
+def test_no_empty_code_block_at_split_boundary():
+    # 開始行の直後で上限に達する / 閉じ行の直前で上限に達する
+    cases = ["a" * 1990 + "\n```\n" + "b" * 50 + "\n```",
+             "```\n" + "c" * 1992 + "\n```\ntail",
+             "```\n" + "\n".join("d" * 99 for _ in range(40)) + "\n```"]
+    for content in cases:
+        pieces = split_message(content)
+        assert all(len(p) <= MAX_CONTENT for p in pieces)
+        assert all(code_blocks_balanced(p) for p in pieces)
+        assert all(f"{FENCE}\n{FENCE}" not in p for p in pieces)
+        # 分割しても本文の行は失われない（開き直し・閉じの行を除けば元どおり）
+        lines = [line for p in pieces for line in p.split("\n") if line != FENCE]
+        assert lines == [line for line in content.split("\n") if line != FENCE]
+
+
+def test_pack_messages_fills_up_to_limit():
+    items = [f"通知{i} " + "x" * 300 for i in range(20)]
+    messages = pack_messages(items)
+    assert all(len(m) <= MAX_CONTENT for m in messages)
+    assert len(messages) == 4
+    assert "\n\n".join(messages) == "\n\n".join(items)
+
+
+# ==============================================================================
+# --- ローカルの HTTP サーバーを相手にした送信 ---
+# ==============================================================================
+class FakeDiscordServer(ThreadingHTTPServer):
+    """Webhook の代わりに 127.0.0.1 で応答するサーバー
+
+    responses に (ステータス, ヘッダー, 本文) を順に積んでおくと、その順に返す（尽きたら 204）。
+    受け取った JSON は received に残す。
+    """
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.responses = []
+        self.received = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/api/webhooks/1/token"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        status, headers, payload = server.responses.pop(0) if server.responses else (204, {}, None)
+        server.received.append((status, body))
+        data = json.dumps(payload).encode() if payload is not None else b""
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(data)))
+        if data:
+            self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = FakeDiscordServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_retries_after_429_then_splits(server):
+    server.responses = [(429, {"Retry-After": "0.05"}, {"message": "rate limited", "retry_after": 0.05})]
+    sleeps = []
+
+    def sleep(sec):
+        sleeps.append(sec)
+
+    content = "\n".join(f"行{i} " + "x" * 90 for i in range(50))   # 約4,800文字 → 3通
+    webhook = DiscordWebhook(server.url, backoff=0.0, sleep=sleep)
+    assert webhook.send(content)
+
+    statuses = [status for status, _ in server.received]
+    assert statuses[0] == 429 and statuses[1:] == [204] * 3
+    # 429 の後は retry_after だけ待ってから同じ内容を送り直す
+    assert server.received[0][1] == server.received[1][1]
+    assert sleeps and 0 < sleeps[0] <= 0.05
+    delivered = [body["content"] for status, body in server.received if status == 204]
+    assert delivered == split_message(content)
+    assert "\n".join(delivered) == content
+
+
+def test_server_errors_back_off_and_client_errors_fail_fast(server):
+    server.responses = [(500, {}, None), (502, {}, None)]
+    sleeps = []
+    webhook = DiscordWebhook(server.url, backoff=0.01, sleep=sleeps.append)
+    assert webhook.post({"content": "hello"})
+    assert [status for status, _ in server.received] == [500, 502, 204]
+    assert sleeps == [0.01, 0.02]
+
+    server.received.clear()
+    server.responses = [(400, {}, {"message": "bad request"})]
+    assert not webhook.post({"content": "bad"})
+    assert len(server.received) == 1
+    assert "HTTP 400" in str(webhook.last_error)
+
+
+def test_rate_limit_headers_delay_next_send(server):
+    server.responses = [(204, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "0.2"}, None)]
+    now = [0.0]
+    sleeps = []
+
+    def sleep(sec):
+        sleeps.append(sec)
+        now[0] += sec
+
+    webhook = DiscordWebhook(server.url, clock=lambda: now[0], sleep=sleep)
+    assert webhook.post({"content": "1"})
+    assert sleeps == []
+    assert webhook.post({"content": "2"})
+    assert sleeps == [pytest.approx(0.2)]
+
+
+def test_queue_batches_notifications(server):
+    webhook = DiscordWebhook(server.url)
+    with DiscordQueue(webhook) as notifier:
+        # 送信スレッドが最初の1件で待たされている間に積まれた分は、まとめて1通になる
+        webhook.blocked_until = webhook.clock() + 0.2
+        for i in range(5):
+            notifier.put(f"通知{i}")
+    contents = [body["content"] for _, body in server.received]
+    assert "\n\n".join(contents) == "\n\n".join(f"通知{i}" for i in range(5))
+    assert len(contents) == 1
+    assert notifier.failed == 0
+
+
+def test_queue_flush_timeout_does_not_wait_for_blocked_sends(server):
+    webhook = DiscordWebhook(server.url)
+    with DiscordQueue(webhook) as notifier:
+        webhook.blocked_until = webhook.clock() + 0.5
+        notifier.put("通知")
+        # レート制限で止まっている間は、timeout で打ち切って戻る（送信は続く）
+        started = webhook.clock()
+        assert notifier.flush(timeout=0.05) is False
+        assert webhook.clock() - started < 0.3
+        assert server.received == []
+        assert notifier.flush(timeout=5) is True
+    assert [body["content"] for _, body in server.received] == ["通知"]
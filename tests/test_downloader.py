@@ -0,0 +1,129 @@
+import threading
+
+import pandas as pd
+import pytest
+
+from benchmark import FakeYFinance, synthetic_ohlcv, to_yf_frame
+from downloader import ChunkDownloader, TokenBucket, split_chunks
+
+N_TICKERS = 23
+CHUNK_SIZE = 5
+
+
+@pytest.fixture(scope="module")
+def panel():
+    return synthetic_ohlcv(N_TICKERS, 30, seed=5)
+
+
+class FlakyYFinance(FakeYFinance):
+    """チャンクごとに最初の flaky[先頭銘柄] 回だけ通信エラーにする FakeYFinance"""
+
+    def __init__(self, daily, flaky, **kwargs):
+        super().__init__(daily=daily, **kwargs)
+        self.flaky = dict(flaky)
+        self.lock = threading.Lock()
+
+    def download(self, tickers, **kwargs):
+        with self.lock:
+            left = self.flaky.get(tickers[0], 0)
+            self.flaky[tickers[0]] = left - 1
+        if left > 0:
+            self.calls += 1
+            self.failures += 1
+            raise ConnectionError("fake transient failure")
+        return super().download(tickers, **kwargs)
+
+
+def make_downloader(sleeps, retries=3):
+    return ChunkDownloader(max_workers=2, rate=0, retries=retries, backoff=1.0, sleep=sleeps.append)
+
+
+def fetch_all(downloader, fake, chunks):
+    return {tuple(chunk): (data, error)
+            for chunk, data, error in downloader.iter_fetch(lambda c: fake.download(c, period="1mo"), chunks)}
+
+
+def test_transient_failures_are_retried_with_backoff(panel):
+    tickers = list(panel["Close"].columns)
+    chunks = split_chunks(tickers, CHUNK_SIZE)
+    fake = FlakyYFinance(panel, {chunks[1][0]: 2, chunks[3][0]: 1})
+    sleeps = []
+    results = fetch_all(make_downloader(sleeps), fake, chunks)
+
+    assert set(results) == {tuple(c) for c in chunks}
+    for chunk in chunks:
+        data, error = results[tuple(chunk)]
+        assert error is None
+        pd.testing.assert_frame_equal(data, to_yf_frame({f: df.iloc[-21:] for f, df in panel.items()}, chunk))
+    assert fake.failures == 3
+    assert fake.calls == len(chunks) + 3
+    # 再試行の待ちは 1, 2 秒と倍々に延びる
+    assert sorted(sleeps) == [1.0, 1.0, 2.0]
+
+
+def test_chunk_that_keeps_failing_is_returned_with_its_error(panel):
+    tickers = list(panel["Close"].columns)
+    chunks = split_chunks(tickers, CHUNK_SIZE)
+    fake = FakeYFinance(daily=panel, fail_tickers=[chunks[2][3]])
+    sleeps = []
+    results = fetch_all(make_downloader(sleeps, retries=2), fake, chunks)
+
+    data, error = results[tuple(chunks[2])]
+    assert data is None and isinstance(error, ConnectionError)
+    assert fake.failures == 3
+    assert sleeps == [1.0, 2.0]
+    # 失敗したチャンクがあっても残りのチャンクは取得できる
+    for chunk in chunks[:2] + chunks[3:]:
+        data, error = results[tuple(chunk)]
+        assert error is None and sorted(data.columns.get_level_values(0).unique()) == sorted(chunk)
+
+
+def test_partial_chunk_returns_only_listed_tickers(panel):
+    # 最後のチャンクは端数（23銘柄を5銘柄ずつ → 3銘柄）、上場廃止などでデータのない銘柄も混ざる
+    tickers = list(panel["Close"].columns) + ["9999.T", "9998.T"]
+    chunks = split_chunks(tickers, CHUNK_SIZE)
+    assert [len(c) for c in chunks] == [5, 5, 5, 5, 5]
+    fake = FakeYFinance(daily=panel)
+    results = fetch_all(make_downloader([]), fake, chunks)
+
+    data, error = results[tuple(chunks[-1])]
+    assert error is None
+    assert data.columns.get_level_values(0).unique().tolist() == tickers[20:23]
+    assert fake.calls == len(chunks)
+
+
+def test_chunks_are_pulled_lazily(panel):
+    # 消費側が遅くても、先取りするチャンクは max_workers の2倍まで
+    tickers = list(panel["Close"].columns)
+    pulled = []
+
+    def chunks():
+        for chunk in split_chunks(tickers, 1):
+            pulled.append(chunk)
+            yield chunk
+
+    fake = FakeYFinance(daily=panel)
+    downloader = make_downloader([])
+    seen = 0
+    for _ in downloader.iter_fetch(lambda c: fake.download(c, period="1mo"), chunks()):
+        seen += 1
+        assert len(pulled) <= seen + downloader.max_workers * 2
+    assert seen == N_TICKERS
+
+
+def test_token_bucket_waits_for_refill():
+    now = [0.0]
+    sleeps = []
+
+    def sleep(sec):
+        sleeps.append(sec)
+        now[0] += sec
+
+    bucket = TokenBucket(rate=2.0, capacity=3, clock=lambda: now[0], sleep=sleep)
+    for _ in range(5):
+        bucket.acquire()
+    assert sleeps == pytest.approx([0.5, 0.5])
+    now[0] += 10
+    for _ in range(3):
+        bucket.acquire()
+    assert len(sleeps) == 2
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+from benchmark import FakeYFinance, synthetic_ohlcv, to_yf_frame
+from intraday import REFETCH_MIN, IntradayBuffer
+
+HALTED = "1002.T"
+
+
+def minute_data(n_tickers=5, n_bars=240):
+    data = synthetic_ohlcv(n_tickers, n_bars, seed=1, end="2026-01-30 14:59", freq="min")
+    # 1銘柄は途中から約定が無い（売買停止・閑散）
+    halted = data["Close"].index > data["Close"].index[60]
+    for f in data:
+        data[f].loc[halted, HALTED] = np.nan
+    return data
+
+
+class CountingFetcher:
+    """FakeYFinance の1分足を返し、1回ごとの返した行数（銘柄×バー）を記録するフェッチャー"""
+
+    def __init__(self, fake):
+        self.fake = fake
+        self.rows = []
+
+    def __call__(self, tickers, start=None, period=None):
+        frame = self.fake.download(tickers, start=start, period=period, interval="1m")
+        self.rows.append(int(frame.xs("Close", axis=1, level=1).notna().to_numpy().sum()))
+        return frame
+
+
+def test_halted_ticker_does_not_widen_each_fetch():
+    data = minute_data()
+    tickers = list(data["Close"].columns)
+    minutes = data["Close"].index
+    fake = FakeYFinance(intraday=data, until=minutes[30])
+    fetcher = CountingFetcher(fake)
+    buffer = IntradayBuffer(fetcher=fetcher)
+    buffer.update(tickers)
+    for until in minutes[31:]:
+        fake.until = until
+        buffer.update(tickers)
+
+    # 止まった銘柄の最終バーに引きずられず、毎回の取得は直近数分ぶんだけ（時間が経っても増えない）
+    assert max(fetcher.rows[1:]) <= (REFETCH_MIN + 2) * len(tickers)
+    assert fetcher.rows[-1] == fetcher.rows[40]
+    # 取り込んだ結果は、まとめて取得した場合と同じ
+    full = to_yf_frame(data, tickers)
+    for ticker in tickers:
+        expected = full[ticker].dropna()
+        got = buffer.frame(ticker)
+        assert got.index.equals(expected.index)
+        np.testing.assert_allclose(got.to_numpy(), expected.to_numpy())
+    assert buffer.frame(HALTED).index[-1] == minutes[60]
+
+
+def test_provisional_last_bar_is_replaced():
+    data = minute_data(n_tickers=2)
+    tickers = list(data["Close"].columns)
+    minutes = data["Close"].index
+    fake = FakeYFinance(intraday=data, until=minutes[100])
+    provisional = {f: df.copy() for f, df in data.items()}
+    provisional["Close"].iloc[100] += 1.0   # 取得時点では未確定の最終バー
+    fake.intraday = provisional
+    buffer = IntradayBuffer(fetcher=lambda t, start=None, period=None: fake.download(t, start=start, period=period,
+                                                                                    interval="1m"))
+    buffer.update(tickers)
+    fake.intraday, fake.until = data, minutes[102]
+    buffer.update(tickers)
+    assert buffer.frame(tickers[0])["Close"].iloc[100] == data["Close"].iloc[100][tickers[0]]
+    assert pd.DatetimeIndex(buffer.frame(tickers[0]).index)[-1] == minutes[102]
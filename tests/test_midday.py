@@ -0,0 +1,86 @@
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark import synthetic_ohlcv, to_yf_frame
+from instrumentation import metrics
+from midday import JST, LiveBars
+from monitor_stocks import scan_chunk_panel
+from ohlcv_store import OHLCVStore
+
+NOW = datetime.now(JST).replace(hour=11, minute=0, second=0, microsecond=0)
+TODAY = NOW.strftime("%Y-%m-%d")
+
+
+@pytest.fixture
+def daily():
+    """今日までの毎日の日足（最終行が場中の暫定足にあたる）"""
+    return synthetic_ohlcv(6, 400, end=TODAY, freq="D")
+
+
+def make_fetcher(daily):
+    def fetch(tickers, start=None, period=None):
+        frame = to_yf_frame(daily, tickers)
+        return frame[frame.index >= pd.Timestamp(start)] if start else frame
+    return fetch
+
+
+def stored_dates(path, date):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM bars WHERE date = ?", (date,)).fetchone()[0]
+
+
+def test_midday_run_does_not_store_provisional_bar(tmp_path, daily):
+    path = str(tmp_path / "store.sqlite")
+    store = OHLCVStore(path, fetcher=make_fetcher(daily))
+    tickers = list(daily["Close"].columns)
+    # 半分の銘柄は前日までの履歴が保存済み、残りはストアに履歴が無い
+    store.save(to_yf_frame({f: df.iloc[:-1] for f, df in daily.items()}, tickers[:3]), tickers[:3])
+
+    live = LiveBars(store, fetcher=lambda chunk: to_yf_frame({f: df.iloc[-5:] for f, df in daily.items()}, chunk),
+                    now=NOW)
+    merged = live(tickers)
+
+    assert stored_dates(path, TODAY) == 0
+    yesterday = (NOW - pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+    assert stored_dates(path, yesterday) == len(tickers)
+    # 判定に使うフレームには当日の暫定足が入っている
+    assert pd.Timestamp(TODAY) in merged.index
+    assert np.allclose(merged.loc[pd.Timestamp(TODAY), (tickers[4], "Close")], daily["Close"].iloc[-1][tickers[4]])
+
+
+def test_update_before_skips_rows_from_that_day(tmp_path, daily):
+    store = OHLCVStore(str(tmp_path / "store.sqlite"), fetcher=make_fetcher(daily))
+    tickers = list(daily["Close"].columns)
+    store.update(tickers, period="1y", before=TODAY)
+    assert stored_dates(store.path, TODAY) == 0
+    # 日を改めて before なしで更新すれば当日分も保存される（差分取得の経路）
+    store.update(tickers, period="1y")
+    assert stored_dates(store.path, TODAY) == len(tickers)
+
+
+@pytest.mark.parametrize("live_tickers", [[], [1, 3]])
+def test_tickers_without_todays_bar_are_not_judged(tmp_path, daily, live_tickers):
+    """当日の暫定足が取れなかった銘柄（取得の空振り・一部欠け）は、前日の確定足のまま判定に回さない"""
+    store = OHLCVStore(str(tmp_path / "store.sqlite"), fetcher=make_fetcher(daily))
+    tickers = list(daily["Close"].columns)
+    store.save(to_yf_frame({f: df.iloc[:-1] for f, df in daily.items()}, tickers), tickers)
+    got = [tickers[i] for i in live_tickers]
+
+    def fetch(chunk):
+        if not got:
+            return pd.DataFrame()
+        return to_yf_frame({f: df.iloc[-5:] for f, df in daily.items()}, got)
+
+    metrics.reset()
+    merged = LiveBars(store, fetcher=fetch, now=NOW)(tickers)
+    assert list(dict.fromkeys(merged.columns.get_level_values(0))) == got
+    if got:
+        assert merged.loc[pd.Timestamp(TODAY), (got[0], "Close")] == pytest.approx(daily["Close"].iloc[-1][got[0]])
+    assert metrics.counters["live_missing_today"] == len(tickers) - len(got)
+    # 判定側は空のチャンクも「データなし」として扱う
+    ticker_map = {t: t for t in tickers}
+    assert scan_chunk_panel(merged, tickers, ticker_map) is not None
@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+import time
+from unittest import mock
+
+import pandas as pd
+
+import monitor
+from alert_store import AlertStore
+from discord_notify import DiscordQueue
+
+
+class StaticBars:
+    """IntradayBuffer の代わり（取得はせず、同じ1分足を返す）"""
+
+    def update(self, tickers):
+        pass
+
+    def frame(self, ticker):
+        return pd.DataFrame({"Close": [100.0] * 30, "High": [100.0] * 30, "Low": [100.0] * 30})
+
+
+class BlockedWebhook:
+    """レート制限が明けない Webhook（送信スレッドは wait_ready で止まる）"""
+
+    def __init__(self):
+        self.released = False
+        self.sent = []
+
+    def wait_ready(self):
+        while not self.released:
+            time.sleep(0.01)
+
+    def post(self, payload):
+        self.sent.append(payload["content"])
+        return True
+
+
+def test_run_cycle_does_not_wait_for_discord():
+    webhook = BlockedWebhook()
+    notifier = DiscordQueue(webhook)
+    with mock.patch.object(monitor, "bars", StaticBars()), \
+            mock.patch.object(monitor, "notifier", notifier), \
+            mock.patch.object(monitor, "check_ticker", lambda ticker, df: (f"通知 {ticker}", "BUY")):
+        started = time.monotonic()
+        assert monitor.run_cycle(["1111.T", "2222.T"], AlertStore(":memory:")) == []
+        assert time.monotonic() - started < 1.0
+        # 巡回は送信を待たずに戻り、通知は送信キューに残っている
+        assert notifier.flush(timeout=0.05) is False
+        webhook.released = True
+        assert notifier.flush(timeout=5) is True
+    notifier.close()
+    assert webhook.sent == ["通知 1111.T\n\n通知 2222.T"]
+
+
+def test_import_does_not_create_alert_store(tmp_path):
+    # benchmark.py などが import しただけで、作業ディレクトリに通知履歴のファイルを作らない
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", "import monitor"], cwd=tmp_path, check=True,
+                   env={**os.environ, "PYTHONPATH": root})
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,204 @@
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import news_summary
+from news_fetcher import HTTPCache, PageFetcher, _FirstParagraph, content_key, find_first_paragraph, parse_with
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "news")
+LEADS = {
+    "6500001": "日本銀行は金融政策決定会合で、政策金利を現状のまま据え置くことを決めた。",
+    "6500002": "半導体大手が発表した決算は、データセンター向けの需要が伸びて市場予想を上回った。",
+    "6500003": "原油先物が続伸した。" + "供給懸念が強まり、" * 20,
+    "6500004": "東証プライム市場の売買代金が今年最高となった。",
+}
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+# ==============================================================================
+# --- 保存したHTMLを返すローカルのサーバー ---
+# ==============================================================================
+class FakeNewsServer(ThreadingHTTPServer):
+    """一覧ページ(/categories/business)と記事ページ(/pickup/<id>)を返すサーバー
+
+    ETag / Last-Modified を付けて返し、条件付きリクエストには 304 を返す。
+    delay 秒だけ応答を遅らせられる（タイムアウトの再現用）。受けた (パス, ステータス) は requests に残す。
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.requests = []
+        self.delay = 0.0
+        self.validator = "etag"   # "etag" / "last_modified"
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def page(self, path):
+        if path == "/categories/business":
+            return fixture("business.html")
+        match = re.fullmatch(r"/pickup/(\d+)", path)
+        if match and match.group(1) in LEADS:
+            return fixture("article.html").format(title=match.group(1), lead=LEADS[match.group(1)])
+        return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        time.sleep(server.delay)
+        page = server.page(self.path)
+        if page is None:
+            status = 404
+            self.send_response(status)
+            self.end_headers()
+        else:
+            body = page.encode("utf-8")
+            etag = f'"{content_key(page)[:16]}"'
+            modified = "Wed, 01 Oct 2025 00:00:00 GMT"
+            if self.headers.get("If-None-Match") == etag or self.headers.get("If-Modified-Since") == modified:
+                status = 304
+                self.send_response(status)
+                self.end_headers()
+            else:
+                status = 200
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                if server.validator == "etag":
+                    self.send_header("ETag", etag)
+                else:
+                    self.send_header("Last-Modified", modified)
+                self.end_headers()
+                self.wfile.write(body)
+        server.requests.append((self.path, status))
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = FakeNewsServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = HTTPCache(str(tmp_path / "news_cache.sqlite"))
+    yield cache
+    cache.close()
+
+
+# ==============================================================================
+# --- 条件付きリクエスト・キャッシュ ---
+# ==============================================================================
+@pytest.mark.parametrize("validator", ["etag", "last_modified"])
+def test_not_modified_reuses_cached_body(server, cache, validator):
+    server.validator = validator
+    url = server.url + "/pickup/6500001"
+    first = PageFetcher(cache).fetch(url)
+    assert LEADS["6500001"].encode("utf-8") in first
+    # 別のプロセスで開き直したキャッシュでも、検証子付きで問い合わせて 304 の本文を使う
+    reopened = HTTPCache(cache.path)
+    try:
+        assert PageFetcher(reopened).fetch(url) == first
+    finally:
+        reopened.close()
+    assert server.requests == [("/pickup/6500001", 200), ("/pickup/6500001", 304)]
+
+
+def test_timeout_falls_back_to_stale_cache(server, cache):
+    url = server.url + "/pickup/6500002"
+    fetcher = PageFetcher(cache, timeout=0.2)
+    body = fetcher.fetch(url)
+    server.delay = 1.0
+    assert fetcher.fetch(url) == body
+    # キャッシュに無いページはそのままタイムアウトになる
+    with pytest.raises(requests.Timeout):
+        fetcher.fetch(server.url + "/pickup/6500003")
+
+
+def test_old_cache_rows_expire(tmp_path):
+    now = [1_000_000.0]
+    path = str(tmp_path / "news_cache.sqlite")
+    cache = HTTPCache(path, clock=lambda: now[0], max_age_days=14)
+    cache.put("http://example/a", '"a"', None, b"a")
+    cache.close()
+    now[0] += 15 * 86400
+    cache = HTTPCache(path, clock=lambda: now[0], max_age_days=14)
+    assert cache.get("http://example/a") is None
+    cache.close()
+
+
+# ==============================================================================
+# --- 必要な要素だけを拾うパーサー ---
+# ==============================================================================
+class CountingParagraph(_FirstParagraph):
+    def __init__(self, pattern):
+        super().__init__(pattern)
+        self.tags = 0
+
+    def start(self, tag, attrib):
+        self.tags += 1
+        super().start(tag, attrib)
+
+
+def test_first_paragraph_stops_reading_early():
+    lead = LEADS["6500001"]
+    page = fixture("article.html").format(title="t", lead=lead)
+    filler = "<div><p class='Paragraph'>続き</p></div>" * 20000   # 約 0.8MB の読まなくてよい部分
+    body = page.replace("</article>", "</article>" + filler).encode("utf-8")
+    target = CountingParagraph(re.compile(r"yjmt|highLight|Paragraph"))
+    text = parse_with(target, body)
+    assert text.startswith(lead) and text.endswith("詳しくはこちら。")
+    # 読んだのは先頭の FEED_BYTES 分だけ（全体では4万を超えるタグがある）
+    assert target.tags < 2000
+    assert find_first_paragraph(body, r"yjmt|highLight|Paragraph") == text
+    everything = CountingParagraph(re.compile(r"no-such-class"))
+    parse_with(everything, body)
+    assert everything.tags > 40000
+    assert find_first_paragraph(b"<html><body><p>none</p></body></html>", r"yjmt") is None
+
+
+# ==============================================================================
+# --- 一覧の重複除去と要約（news_summary） ---
+# ==============================================================================
+def test_news_summary_dedupes_and_fetches_each_page_once(server, cache):
+    fetcher = PageFetcher(cache)
+    news = news_summary.get_yahoo_news_with_summary(server.url + "/categories/business", fetcher=fetcher, limit=3)
+    # 同じ記事への2つ目のリンクと、短いナビゲーションのリンクは除く
+    assert [item["link"] for item in news] == [server.url + f"/pickup/650000{i}" for i in (1, 2, 3)]
+    assert news[0]["title"] == "日銀、政策金利を据え置き市場は円安に反応"
+    assert news[0]["summary"].startswith(LEADS["6500001"])
+    assert news[2]["summary"].endswith("...") and len(news[2]["summary"]) == 103
+    paths = [path for path, _ in server.requests]
+    assert sorted(paths) == sorted(set(paths))
+
+
+def test_unreachable_article_keeps_default_summary(server, cache):
+    fetcher = PageFetcher(cache, timeout=0.2)
+    original = server.page
+
+    def page(path):
+        return None if path == "/pickup/6500002" else original(path)
+
+    server.page = page
+    news = news_summary.get_yahoo_news_with_summary(server.url + "/categories/business", fetcher=fetcher, limit=3)
+    assert [item["summary"] == news_summary.DEFAULT_SUMMARY for item in news] == [False, True, False]
@@ -0,0 +1,102 @@
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark import synthetic_ohlcv, to_yf_frame
+import monitor_stocks
+from monitor_stocks import MIN_BARS, build_panel, scan_chunk
+from ohlcv_panel import OHLCVPanel
+
+# 1年分（245営業日）の日足。比率の検査なので銘柄数は全銘柄（約4,000）より少なくしてある
+N_TICKERS, N_DAYS = 1000, 245
+
+
+@pytest.fixture(scope="module")
+def frame():
+    frame = to_yf_frame(synthetic_ohlcv(N_TICKERS, N_DAYS))
+    frame.iloc[:30, frame.columns.get_loc(("1001.T", "Close"))] = np.nan   # 上場直後
+    frame.iloc[100:103, frame.columns.get_loc(("1002.T", "Volume"))] = np.nan  # 途中の欠損
+    return frame
+
+
+def frame_mb(frame):
+    return frame.memory_usage().sum() / 2**20
+
+
+def traced(func):
+    """func の戻り値と、実行中に確保されたメモリのピーク・終了時点の残り（MB）を返す"""
+    tracemalloc.start()
+    try:
+        result = func()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, current / 2**20, peak / 2**20
+
+
+def test_dtypes_and_roundtrip(frame):
+    panel = OHLCVPanel.from_frame(frame)
+    assert panel.prices.dtype == np.float32
+    assert panel.volume.dtype == np.int64
+    assert panel.prices.flags.c_contiguous and panel.volume.flags.c_contiguous
+    assert panel.lengths[panel.columns["1001.T"]] == N_DAYS - 30
+    assert panel.lengths[panel.columns["1002.T"]] == N_DAYS - 3
+    # 有効な行は yfinance 形式のフレームの dropna() と同じ値
+    for ticker in ("1000.T", "1001.T", "1002.T"):
+        pd.testing.assert_frame_equal(panel.ticker_frame(ticker), frame[ticker].dropna(), check_names=False)
+
+
+
+def test_adjusted_prices_keep_float64_on_ticker_path(frame, monkeypatch):
+    # auto_adjust の調整後株価は呼値単位に乗らないので、float32 では丸めが入る
+    adjusted = frame.iloc[:, :50].copy()
+    prices = [c for c in adjusted.columns if c[1] != "Volume"]
+    adjusted[prices] = adjusted[prices] * 0.8731234567
+    tickers = list(dict.fromkeys(adjusted.columns.get_level_values(0)))
+
+    compact = OHLCVPanel.from_frame(adjusted)
+    exact = adjusted[tickers[0]]["Close"].to_numpy()
+    close = compact.ticker_frame(tickers[0])["Close"].to_numpy()
+    assert not np.array_equal(close, exact)
+    np.testing.assert_allclose(close, exact, rtol=2**-24, atol=0)
+
+    # 従来の銘柄ごとの判定には dropna() と同じ float64 の値が渡る
+    seen = {}
+
+    def evaluate_ticker(df, ticker, name):
+        seen[ticker] = df
+
+    monkeypatch.setattr(monitor_stocks, "evaluate_ticker", evaluate_ticker)
+    scan_chunk(adjusted, tickers, {t: t for t in tickers})
+    assert list(seen) == tickers
+    for ticker in tickers:
+        pd.testing.assert_frame_equal(seen[ticker], adjusted[ticker].dropna(), check_names=False, check_exact=True)
+
+def test_ticker_slice_is_zero_copy(frame):
+    panel = OHLCVPanel.from_frame(frame)
+    bars = panel.bars("1001.T")
+    assert np.shares_memory(bars["Close"], panel.prices)
+    assert np.shares_memory(bars["Volume"], panel.volume)
+    assert len(bars["Close"]) == N_DAYS - 30
+
+
+def test_memory_footprint(frame):
+    """判定に必要な形で持つときのメモリ量の上限（受け入れ基準）
+
+    - パネル本体は float64 のフレームの 0.65 倍以下（価格 float32・出来高 int64 で 24/40 バイト）
+    - 判定時に持ち続ける量（パネル + 末尾 MIN_BARS 本の float64 行列）は、フレーム + float64 の
+      右揃え行列（build_panel）の半分以下
+    - 変換中のピークはフレームの 1.5 倍以下（項目ごとの float64 のコピーを作らない）
+    """
+    base = frame_mb(frame)
+    tickers = list(dict.fromkeys(frame.columns.get_level_values(0)))
+
+    _, matrices_mb, _ = traced(lambda: build_panel(frame, tickers))
+    panel, panel_mb, peak_mb = traced(lambda: OHLCVPanel.from_frame(frame, tickers))
+    _, tail_mb, _ = traced(lambda: panel.tail(MIN_BARS))
+
+    assert panel.nbytes / 2**20 <= 0.65 * base
+    assert (panel_mb + tail_mb) * 2 <= base + matrices_mb
+    assert peak_mb <= 1.5 * base
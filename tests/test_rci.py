@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+from numpy.testing import assert_allclose
+from pandas.testing import assert_frame_equal, assert_series_equal
+
+from monitor_stocks import calculate_rci
+
+
+def reference_rci(df_close, period):
+    """ベクトル化前の calculate_rci（rolling(period).apply で1ウィンドウずつ順位付け）"""
+    def _rci_calc(window):
+        n = len(window)
+        if n < period:
+            return np.nan
+        price_ranks = pd.Series(window).rank(ascending=False, method='max').values
+        time_ranks = np.arange(n, 0, -1)
+        d2 = np.sum((price_ranks - time_ranks) ** 2)
+        return (1 - (6 * d2) / (n * (n**2 - 1))) * 100
+
+    return df_close.rolling(window=period).apply(_rci_calc, raw=True)
+
+
+def make_close(n_days, n_tickers, seed=0):
+    """呼値5円に丸めた（同値が頻繁に出る）終値に、先頭の欠損と途中の欠損を混ぜた日付×銘柄フレーム"""
+    rng = np.random.default_rng(seed)
+    walk = 3000 * np.exp(np.cumsum(rng.normal(0, 0.01, (n_days, n_tickers)), axis=0))
+    close = pd.DataFrame(np.round(walk / 5) * 5, index=pd.bdate_range("2024-01-01", periods=n_days),
+                         columns=[f"{1000 + j}.T" for j in range(n_tickers)])
+    close.iloc[:7, 1] = np.nan          # 上場直後（先頭の欠損）
+    close.iloc[60:63, 2] = np.nan       # 売買停止（途中の欠損）
+    close.iloc[:, 3] = 3000.0           # 全期間同値
+    close.iloc[100, 0] = np.nan
+    return close
+
+
+@pytest.mark.parametrize("period", [9, 27])
+@pytest.mark.parametrize("n_tickers", [5, 20])   # 16銘柄以上は差分更新方式、未満は一括比較方式
+def test_dataframe_matches_reference(period, n_tickers):
+    close = make_close(160, n_tickers)
+    assert_frame_equal(calculate_rci(close, period), reference_rci(close, period))
+
+
+@pytest.mark.parametrize("period", [9, 27])
+def test_series_matches_reference(period):
+    close = make_close(160, 4)["1002.T"]
+    assert_series_equal(calculate_rci(close, period), reference_rci(close, period))
+
+
+@pytest.mark.parametrize("period", [9, 27])
+def test_ndarray_matches_reference(period):
+    close = make_close(160, 20)
+    expected = reference_rci(close, period).to_numpy().T
+    # (銘柄×日数) の2次元配列と、1銘柄分の1次元配列
+    assert_allclose(calculate_rci(close.to_numpy().T, period), expected, rtol=0, atol=1e-12, equal_nan=True)
+    assert_allclose(calculate_rci(close["1001.T"].to_numpy(), period), expected[1], rtol=0, atol=1e-12, equal_nan=True)
+
+
+def test_shorter_than_period_is_all_nan():
+    close = make_close(160, 4).iloc[:8]
+    assert calculate_rci(close, 9).isna().all().all()
@@ -0,0 +1,150 @@
+import os
+from datetime import datetime
+from unittest import mock
+
+import pandas as pd
+import pytest
+
+import monitor
+from alert_store import AlertStore
+from instrumentation import RunMetrics
+from monitor import JST, Watchlist
+from scheduler import MinuteScheduler
+
+
+class FakeClock:
+    """time.time / time.sleep の代わり。sleep は overshoot 秒だけ寝過ごす"""
+
+    def __init__(self, start, overshoot=0.0):
+        self.now = start
+        self.overshoot = overshoot
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, sec):
+        self.now += sec + self.overshoot
+
+
+def jst(*args):
+    return datetime(*args, tzinfo=JST).timestamp()
+
+
+def make_scheduler(clock, **kwargs):
+    metrics = RunMetrics()
+    return MinuteScheduler(clock=clock, sleep=clock.sleep, metrics=metrics, **kwargs), metrics
+
+
+def test_fires_at_offset_after_each_jst_minute():
+    clock = FakeClock(jst(2026, 1, 30, 10, 0, 37))
+    scheduler, metrics = make_scheduler(clock)
+    fired = []
+    scheduler.run(lambda deadline: fired.append((clock(), deadline)), cycles=3)
+    times = [datetime.fromtimestamp(t, JST) for t, _ in fired]
+    assert [t.strftime("%H:%M:%S") for t in times] == ["10:01:05", "10:02:05", "10:03:05"]
+    assert all(deadline == t + scheduler.budget for t, deadline in fired)
+    assert metrics.counters["cycles"] == 3
+    assert metrics.counters["overruns"] == 0
+
+
+def test_lag_overrun_and_skipped_slots_are_recorded():
+    clock = FakeClock(jst(2026, 1, 30, 10, 0, 0), overshoot=0.25)
+    scheduler, metrics = make_scheduler(clock)
+    durations = iter([10, 130, 10])
+
+    def job(deadline):
+        clock.now += next(durations)
+
+    fired = []
+    scheduler.run(lambda deadline: (fired.append(clock()), job(deadline)), cycles=3)
+    # 2回目が130秒かかったので、その間の予定（2回分）は飛ばして次の分から再開する
+    minutes = [datetime.fromtimestamp(t, JST).strftime("%H:%M") for t in fired]
+    assert minutes == ["10:00", "10:01", "10:04"]
+    assert metrics.counters["overruns"] == 1
+    assert metrics.counters["skipped_slots"] == 2
+    assert metrics.observations["lag_sec"]["max"] == pytest.approx(0.25)
+    assert metrics.observations["cycle_sec"]["max"] == pytest.approx(130)
+
+
+def test_should_run_false_skips_job_without_metrics():
+    clock = FakeClock(jst(2026, 1, 30, 11, 45, 0))
+    scheduler, metrics = make_scheduler(clock)
+    calls = []
+    scheduler.run(calls.append, should_run=lambda fire: False, cycles=2)
+    assert calls == [] and metrics.counters["cycles"] == 0
+
+
+class LimitedScheduler(MinuteScheduler):
+    """monitor() から呼ばれても cycles 回で止まるスケジューラー"""
+
+    def __init__(self, cycles, **kwargs):
+        super().__init__(**kwargs)
+        self.cycles = cycles
+
+    def run(self, job, **kwargs):
+        super().run(job, cycles=self.cycles, **kwargs)
+
+
+class StaticBars:
+    def update(self, tickers):
+        pass
+
+    def frame(self, ticker):
+        return pd.DataFrame()
+
+
+def test_unfinished_tickers_are_checked_first_next_cycle():
+    """締め切りを過ぎて判定できなかった銘柄は、次の巡回の先頭で判定する"""
+    clock = FakeClock(jst(2026, 1, 30, 10, 0, 0))
+    scheduler = LimitedScheduler(cycles=2, clock=clock, sleep=clock.sleep)
+    tickers = [f"{1000 + i}.T" for i in range(5)]
+    checked = []
+
+    def check_ticker(ticker, df):
+        checked.append(ticker)
+        clock.now += 20   # 1銘柄20秒かかる（締め切りは起動から50秒）
+        return "", ""
+
+    metrics = RunMetrics()
+    watchlist = mock.Mock(load=lambda: tickers)
+    with mock.patch.object(monitor, "bars", StaticBars()), \
+            mock.patch.object(monitor, "check_ticker", check_ticker), \
+            mock.patch.object(monitor, "metrics", metrics), \
+            mock.patch.object(monitor, "AlertStore", lambda: AlertStore(":memory:")), \
+            mock.patch("builtins.print", lambda *a, **k: None):
+        monitor.monitor(scheduler=scheduler, watchlist=watchlist, report_path=None)
+    first, second = checked[:3], checked[3:]
+    assert first == tickers[:3]
+    assert second == [tickers[3], tickers[4], tickers[0]]
+    assert metrics.counters["deferred_tickers"] == 4
+
+
+def test_watchlist_reloads_only_when_mtime_changes(tmp_path):
+    path = str(tmp_path / "list.xlsx")
+    pd.DataFrame({"銘柄コード": [7203, 6758]}).to_excel(path, index=False)
+    watchlist = Watchlist(path)
+    reads = []
+    real_load = monitor.load_tickers
+
+    def load_tickers(*args):
+        reads.append(args)
+        return real_load(*args)
+
+    with mock.patch.object(monitor, "load_tickers", load_tickers), \
+            mock.patch("builtins.print", lambda *a, **k: None):
+        assert watchlist.load() == ["7203.T", "6758.T"]
+        assert watchlist.load() == ["7203.T", "6758.T"]
+        assert len(reads) == 1
+
+        pd.DataFrame({"銘柄コード": [9984]}).to_excel(path, index=False)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert watchlist.load() == ["9984.T"]
+        assert len(reads) == 2
+
+        # 保存途中などで読めないときは前回のリストで続ける
+        with open(path, "wb") as f:
+            f.write(b"broken")
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10**9))
+        assert watchlist.load() == ["9984.T"]
+        assert len(reads) == 3
@@ -0,0 +1,77 @@
+import os
+from contextlib import ExitStack
+from unittest import mock
+
+import pytest
+
+import monitor_stocks
+from benchmark import FakeDiscord, FakeYFinance, _patch_patrol, _patrol_output, _run_shard, synthetic_ohlcv
+from shard import load_partials, parse_shard, select_shard
+
+N_SHARDS = 3
+
+
+@pytest.fixture(scope="module")
+def panel():
+    return synthetic_ohlcv(150, 260, seed=3)
+
+
+@pytest.fixture
+def patrol(tmp_path, panel):
+    """フェイクに差し替えた巡回の環境。(Discord, print された行, 作業ディレクトリ) を返す"""
+    discord = FakeDiscord()
+    printed = []
+    ticker_map = {t: f"銘柄{t[:-2]}" for t in panel["Close"].columns}
+    with ExitStack() as stack:
+        _patch_patrol(stack, FakeYFinance(daily=panel), discord, ticker_map, "panel", str(tmp_path))
+        stack.enter_context(mock.patch("builtins.print", lambda *a, **k: printed.append(" ".join(map(str, a)))))
+        yield discord, printed, str(tmp_path)
+
+
+def merge(workdir):
+    return monitor_stocks.merge_shards(os.path.join(workdir, "shards"), os.path.join(workdir, "snapshot"),
+                                       report_path=None)
+
+
+def test_parse_and_select_shard():
+    assert parse_shard("2/3") == (2, 3)
+    with pytest.raises(ValueError):
+        parse_shard("4/3")
+    tickers = [f"{1000 + i}.T" for i in range(300)]
+    parts = [select_shard(tickers, i, N_SHARDS) for i in range(1, N_SHARDS + 1)]
+    assert sorted(t for part in parts for t in part) == sorted(tickers)
+    assert all(part for part in parts)
+
+
+def test_merge_keeps_partials_until_delivered(patrol):
+    discord, printed, workdir = patrol
+    monitor_stocks.main(report_path=None, snapshot_path=os.path.join(workdir, "single"), workers=1)
+    single_msg, _ = _patrol_output(discord, os.path.join(workdir, "single"))
+    assert any("通知を送信しました" in line for line in printed)
+
+    discord.posts.clear()
+    for i in range(1, N_SHARDS + 1):
+        _run_shard(workdir, (i, N_SHARDS))
+    printed.clear()
+    with mock.patch.object(monitor_stocks, "deliver", return_value=False):
+        assert merge(workdir) is False
+    # 届かなかったときは部分結果を残し、送れなかったことを表示する
+    assert len(load_partials(os.path.join(workdir, "shards"))) == N_SHARDS
+    assert not any("通知を送信しました" in line for line in printed)
+    assert any("通知を送れませんでした" in line for line in printed)
+
+    printed.clear()
+    assert merge(workdir) is True
+    assert any("通知を送信しました" in line for line in printed)
+    assert load_partials(os.path.join(workdir, "shards")) == []
+    sharded_msg, _ = _patrol_output(discord, os.path.join(workdir, "snapshot"))
+    assert sharded_msg == single_msg
+
+
+def test_merge_reports_missing_shard(patrol):
+    discord, printed, workdir = patrol
+    for i in range(1, N_SHARDS):
+        _run_shard(workdir, (i, N_SHARDS))
+    assert merge(workdir) is True
+    body = "".join(post["content"] for post in discord.posts)
+    assert f"{N_SHARDS} 番の結果が届いていない" in body
@@ -0,0 +1,97 @@
+import os
+import re
+import shlex
+from contextlib import ExitStack
+
+import pytest
+import yaml
+
+import monitor_stocks
+from benchmark import FakeDiscord, FakeYFinance, _patch_patrol, _patrol_output, synthetic_ohlcv
+from instrumentation import metrics
+from snapshot import SNAPSHOT_PATH, Snapshot
+
+WORKFLOW = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        ".github", "workflows", "stock_monitor.yml")
+CLOSE_SCHEDULE, MIDDAY_SCHEDULE = "0 9 * * 1-5", "0 2 * * 1-5"
+
+N_TICKERS = 300
+
+
+@pytest.fixture(scope="module")
+def panel():
+    return synthetic_ohlcv(N_TICKERS, 260, seed=3)
+
+
+def run(workdir, panel, snapshot_path):
+    """パネル一括モードで main() を通し、(通知本文, plan で指標を計算した列数の合計) を返す"""
+    discord = FakeDiscord()
+    ticker_map = {t: f"銘柄{t[:-2]}" for t in panel["Close"].columns}
+    with ExitStack() as stack:
+        _patch_patrol(stack, FakeYFinance(daily=panel), discord, ticker_map, "panel", str(workdir))
+        monitor_stocks.main(report_path=None, snapshot_path=snapshot_path, workers=1)
+    columns = sum(n for name, n in metrics.counters.items() if name.startswith("plan.") and name.endswith(".columns"))
+    return _patrol_output(discord, str(workdir / "none"))[0], columns
+
+
+def test_snapshot_is_opt_in():
+    assert monitor_stocks.parse_args([]).snapshot is None
+    assert monitor_stocks.parse_args(["--snapshot"]).snapshot == SNAPSHOT_PATH
+    assert monitor_stocks.parse_args(["--snapshot", "snap"]).snapshot == "snap"
+
+
+def test_default_run_computes_indicators_lazily(tmp_path, panel):
+    with_snapshot, _ = run(tmp_path, panel, str(tmp_path / "snapshot"))
+    assert os.path.exists(tmp_path / "snapshot" / "meta.json")
+    without, columns = run(tmp_path, panel, None)
+    # 通知は同じで、指標はフィルターを通った銘柄のうち条件の評価に必要な分だけ計算する
+    assert any("ルール" in line for line in without)
+    assert without == with_snapshot
+    assert 0 < columns < N_TICKERS
+    assert "snapshot_rows" not in metrics.counters
+
+
+def workflow_commands(schedule, shard, shards):
+    """stock_monitor.yml の分割巡回・まとめのコマンドを、schedule の回の引数（argv）にして返す"""
+    with open(WORKFLOW, encoding="utf-8") as f:
+        jobs = yaml.safe_load(f)["jobs"]
+    commands = {}
+    for job, step_name in (("scan", "Run shard"), ("notify", "Merge and notify")):
+        run = next(step["run"] for step in jobs[job]["steps"] if step.get("name") == step_name)
+        run = run.replace("${{ matrix.shard }}", str(shard)).replace("${{ matrix.shards }}", str(shards))
+        # ${{ github.event.schedule == 'X' && 'A' || 'B' }} だけを評価する
+        run = re.sub(r"\$\{\{ github\.event\.schedule == '([^']*)' && '([^']*)' \|\| '([^']*)' \}\}",
+                     lambda m: m.group(2) if schedule == m.group(1) else m.group(3), run)
+        argv = shlex.split(run)
+        assert argv[:2] == ["python", "monitor_stocks.py"]
+        commands[job] = argv[2:]
+    return commands
+
+
+def test_midday_schedule_skips_snapshot():
+    commands = workflow_commands(MIDDAY_SCHEDULE, 1, 4)
+    args = monitor_stocks.parse_args(commands["scan"])
+    assert args.midday and args.snapshot is None
+
+
+def test_close_schedule_writes_snapshot(tmp_path, panel, monkeypatch):
+    # ワークフローと同じ相対パス（patrol_shards/・indicator_snapshot/）で、分割巡回とまとめを順に実行する
+    monkeypatch.chdir(tmp_path)
+    # run_cli が書き換える巡回種別のモジュール変数は、テスト後に元へ戻す
+    for name in ("IS_MIDDAY_PATROL", "PROJECT_MIDDAY_VOLUME"):
+        monkeypatch.setattr(monitor_stocks, name, getattr(monitor_stocks, name))
+    discord = FakeDiscord()
+    tickers = list(panel["Close"].columns)
+    ticker_map = {t: f"銘柄{t[:-2]}" for t in tickers}
+    shards = 2
+    with ExitStack() as stack:
+        _patch_patrol(stack, FakeYFinance(daily=panel), discord, ticker_map, "panel", str(tmp_path))
+        for shard in range(1, shards + 1):
+            argv = workflow_commands(CLOSE_SCHEDULE, shard, shards)["scan"]
+            assert not monitor_stocks.parse_args(argv).midday
+            monitor_stocks.run_cli(argv + ["--workers", "1", "--report", ""])
+        monitor_stocks.run_cli(workflow_commands(CLOSE_SCHEDULE, 1, shards)["notify"] + ["--report", ""])
+    frame = Snapshot(SNAPSHOT_PATH).frame()
+    assert sorted(frame.index) == sorted(tickers)
+    assert {"rci9", "psy12", "filter", "rule"} <= set(frame.columns)
+    assert discord.posts
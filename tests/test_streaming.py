@@ -0,0 +1,96 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+from numpy.testing import assert_allclose
+
+import streaming
+from monitor_stocks import calculate_dmi, calculate_psy, calculate_rci
+
+N_BARS = 300
+
+
+@pytest.fixture(scope="module")
+def bars():
+    """呼値に丸めた（同値を含む）日足 1銘柄分。終値には途中の欠損を1本混ぜる"""
+    rng = np.random.default_rng(1)
+    close = np.round(3000 * np.exp(np.cumsum(rng.normal(0, 0.015, N_BARS))))
+    high = close + np.round(np.abs(rng.normal(0, 20, N_BARS)))
+    low = close - np.round(np.abs(rng.normal(0, 20, N_BARS)))
+    volume = np.round(rng.lognormal(13, 0.5, N_BARS))
+    return pd.DataFrame({"High": high, "Low": low, "Close": close, "Volume": volume},
+                        index=pd.bdate_range("2025-01-01", periods=N_BARS))
+
+
+def stream(indicator, rows, roundtrip_at=N_BARS // 2):
+    """rows を1本ずつ update() した値の列を返す。途中で dumps() / loads() して状態を引き継ぎ直す"""
+    out = []
+    for i, row in enumerate(rows):
+        if i == roundtrip_at:
+            indicator = streaming.loads(streaming.dumps(indicator))
+        out.append(indicator.update(*row))
+    return np.array(out, dtype=float)
+
+
+def assert_same(actual, expected):
+    assert_allclose(actual, np.asarray(expected, dtype=float), rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+@pytest.mark.parametrize("period", [9, 27])
+def test_rci_matches_calculate_rci(bars, period):
+    close = bars["Close"].copy()
+    close.iloc[120] = np.nan
+    assert_same(stream(streaming.RCI(period), zip(close)), calculate_rci(close, period))
+
+
+def test_psy_matches_calculate_psy(bars):
+    close = bars["Close"].copy()
+    close.iloc[120] = np.nan
+    assert_same(stream(streaming.PSY(12), zip(close)), calculate_psy(close, 12))
+
+
+def test_dmi_matches_calculate_dmi(bars):
+    actual = stream(streaming.DMI(14, 9), zip(bars["High"], bars["Low"], bars["Close"]))
+    for k, expected in enumerate(calculate_dmi(bars["High"], bars["Low"], bars["Close"], 14, 9)):
+        assert_same(actual[:, k], expected)
+
+
+def test_macd_matches_ewm(bars):
+    close = bars["Close"].copy()
+    close.iloc[120] = np.nan
+    macd = close.ewm(span=12).mean() - close.ewm(span=26).mean()
+    actual = stream(streaming.MACD(12, 26, 9), zip(close))
+    assert_same(actual[:, 0], macd)
+    assert_same(actual[:, 1], macd.ewm(span=9).mean())
+
+
+def test_vwap_matches_rolling(bars):
+    close, volume = bars["Close"], bars["Volume"]
+    expected = (close * volume).rolling(25).sum() / volume.rolling(25).sum()
+    assert_same(stream(streaming.VWAP(25), zip(close, volume)), expected)
+
+
+def test_peek_does_not_change_state(bars):
+    rci = streaming.RCI(9)
+    for x in bars["Close"].iloc[:20]:
+        rci.update(x)
+    before = streaming.dumps(rci)
+    peeked = rci.peek(bars["Close"].iloc[20])
+    assert streaming.dumps(rci) == before
+    assert peeked == rci.update(bars["Close"].iloc[20])
+
+
+def test_rolling_sum_does_not_drift_on_long_stream():
+    """桁の大きく違う値（売買代金）を長く流しても、合計はウィンドウを正確に足した値からずれない"""
+    rng = np.random.default_rng(2)
+    values = rng.lognormal(20, 3, 200_000)      # 1e5〜1e12 程度に散らばる
+    values[::97] *= 1e4
+    period = 25
+    total = streaming.RollingSum(period)
+    for i, x in enumerate(values):
+        got = total.update(x)
+        if i % 1_000 == 999:
+            total = streaming.loads(streaming.dumps(total))
+            exact = math.fsum(values[i - period + 1:i + 1])
+            assert abs(got - exact) <= 1e-12 * exact
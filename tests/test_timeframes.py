@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark import synthetic_ohlcv, to_yf_frame
+from ohlcv_panel import FIELDS, OHLCVPanel
+from timeframes import Timeframes, resample_panel
+
+N_TICKERS, N_DAYS = 8, 400
+
+
+@pytest.fixture(scope="module")
+def frame():
+    frame = to_yf_frame(synthetic_ohlcv(N_TICKERS, N_DAYS, seed=5))
+    frame.iloc[:40, frame.columns.get_loc(("1001.T", "Close"))] = np.nan   # 上場直後
+    return frame
+
+
+def panel_of(frame):
+    return OHLCVPanel.from_frame(frame)
+
+
+def assert_same(a, b):
+    assert a.tickers == b.tickers
+    assert a.dates.equals(b.dates)
+    for f in FIELDS:
+        np.testing.assert_array_equal(a.aligned()[f], b.aligned()[f])
+
+
+@pytest.mark.parametrize("timeframe, rule", [("1wk", "W-SUN"), ("1mo", "MS")])
+def test_resample_matches_pandas_close(frame, timeframe, rule):
+    resampled = resample_panel(panel_of(frame), timeframe)
+    close = frame.xs("Close", axis=1, level=1).astype(np.float32)
+    expected = close.groupby(close.index.to_period(rule[0])).last()
+    np.testing.assert_allclose(resampled.aligned()["Close"], expected.to_numpy(dtype=float))
+
+
+def test_timeframes_resample_once_per_chunk(frame):
+    panel = panel_of(frame)
+    timeframes = Timeframes(panel)
+    weekly = timeframes["1wk"]
+    assert timeframes["1wk"] is weekly
+    assert len(weekly["Close"]) == 40
+    # 末尾の40本は、全期間を作ってから切り出したものと同じ
+    full = resample_panel(panel, "1wk").aligned()["Close"][-40:]
+    np.testing.assert_array_equal(np.asarray(weekly["Close"], dtype=float), full)
+
+
+def test_holiday_week_is_labelled_by_its_last_trading_day():
+    # 2024/5/3(金)〜5/6(月) は祝日・振替休日。5/2(木) で終わる週と 5/7(火) から始まる週になる
+    dates = pd.bdate_range("2024-04-22", "2024-05-17").drop(pd.to_datetime(["2024-05-03", "2024-05-06"]))
+    arrays = {f: np.arange(len(dates), dtype=float)[:, None] + 100 for f in FIELDS}
+    panel = OHLCVPanel.from_arrays(["1000.T"], dates, arrays)
+    weekly = resample_panel(panel, "1wk")
+    assert list(weekly.dates.strftime("%m-%d")) == ["04-26", "05-02", "05-10", "05-17"]
+    assert weekly.aligned()["Volume"][:, 0].tolist() == [510.0, 426.0, 442.0, 575.0]
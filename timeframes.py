@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+from instrumentation import metrics
+from ohlcv_panel import FIELDS, OHLCVPanel
+
+# ==============================================================================
+# --- 設定項目 ---
+# ==============================================================================
+DAILY = "1d"
+# 足種（yfinance の interval 表記）→ 期間の単位
+TIMEFRAMES = {"1wk": "week", "1mo": "month"}
+# 足種ごとに行列へ展開する末尾の本数（週足 RCI27 の前日値 28本 + 余裕 / 月足 PSY12 の前日値 14本 + 余裕）
+TIMEFRAME_BARS = {"1wk": 40, "1mo": 24}
+
+
+# ==============================================================================
+# --- 東証の営業日カレンダー ---
+# ==============================================================================
+def period_keys(dates, unit):
+    """営業日ごとに、属する週（月曜日の日付）または月を表す整数キーを返す"""
+    dates = pd.DatetimeIndex(dates)
+    if unit == "week":
+        days = dates.tz_localize(None) if dates.tz is not None else dates
+        return (days.normalize() - pd.to_timedelta(days.dayofweek, unit="D")).asi8
+    if unit == "month":
+        return np.asarray(dates.year * 12 + dates.month - 1, dtype=np.int64)
+    raise ValueError(f"未対応の期間です: {unit}")
+
+
+def period_bounds(dates, unit):
+    """営業日の並び dates を期間ごとに区切り、(各期間の先頭位置, 各期間の最終営業日) を返す
+
+    dates は日足の日付（銘柄をまとめて取得したフレームの索引 = 東証の営業日そのもの）。
+    祝日や年末年始で営業日が少ない週・月もそのまま1本になり、足の日付は暦の週末・月末ではなく
+    その期間の最終営業日になる（金曜が祝日の週は木曜の日付）。営業日の無い週は足を作らない。
+    """
+    keys = period_keys(dates, unit)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.empty(0, dtype=int)
+    ends = np.r_[starts[1:], len(keys)] - 1
+    return starts, pd.DatetimeIndex(dates)[ends]
+
+
+# ==============================================================================
+# --- 日足からの週足・月足の作成 ---
+# ==============================================================================
+def _aggregate(arrays, starts):
+    """項目→(日付×銘柄) の日付揃え配列を、starts で区切った期間ごとの OHLCV にまとめる"""
+    valid = np.ones(arrays["Close"].shape, dtype=bool)
+    for f in FIELDS:
+        valid &= ~np.isnan(arrays[f])
+    rows = np.arange(len(valid))[:, None]
+    count = np.add.reduceat(valid, starts, axis=0)
+    empty = count == 0
+
+    # 始値は期間内の最初の有効日、終値は最後の有効日の値
+    first = np.minimum.reduceat(np.where(valid, rows, len(valid) - 1), starts, axis=0)
+    last = np.maximum.reduceat(np.where(valid, rows, 0), starts, axis=0)
+    out = {
+        "Open": np.take_along_axis(arrays["Open"], first, axis=0),
+        "High": np.fmax.reduceat(np.where(valid, arrays["High"], np.nan), starts, axis=0),
+        "Low": np.fmin.reduceat(np.where(valid, arrays["Low"], np.nan), starts, axis=0),
+        "Close": np.take_along_axis(arrays["Close"], last, axis=0),
+        "Volume": np.add.reduceat(np.where(valid, arrays["Volume"], 0.0), starts, axis=0),
+    }
+    for a in out.values():
+        a[empty] = np.nan
+    return out
+
+
+def resample_panel(panel, timeframe):
+    """日足の OHLCVPanel から週足・月足の OHLCVPanel を作る（ネットワークアクセスなし）
+
+    100銘柄×1年分で数ミリ秒なので、保存はせず判定のたびに日足から作る（株式分割などで過去の日足が
+    調整し直されても、保存済みの週足・月足との食い違いが起きない）。
+    """
+    unit = TIMEFRAMES[timeframe]
+    if not panel or not panel.n_bars:
+        return OHLCVPanel.from_arrays(panel.tickers, pd.DatetimeIndex([]),
+                                      {f: np.empty((0, len(panel))) for f in FIELDS})
+    starts, labels = period_bounds(panel.dates, unit)
+    return OHLCVPanel.from_arrays(panel.tickers, labels, _aggregate(panel.aligned(), starts))
+
+
+class Timeframes:
+    """1つの日足パネルについて、足種ごとの末尾行列（項目→(行×銘柄) DataFrame）を必要になった時に作って使い回す
+
+    日足（DAILY）は daily_tail にそのまま渡された行列を返す。週足・月足は最初に参照された時に
+    日足から作り、同じチャンクの判定中は使い回す。
+    """
+
+    def __init__(self, panel, daily_tail=None, bars=TIMEFRAME_BARS):
+        self.panel = panel
+        self.bars = bars
+        self.tails = {DAILY: daily_tail} if daily_tail is not None else {}
+        self.panels = {}
+
+    def resampled(self, timeframe):
+        if timeframe not in self.panels:
+            with metrics.stage(f"resample.{timeframe}"):
+                self.panels[timeframe] = resample_panel(self.panel, timeframe)
+        return self.panels[timeframe]
+
+    def __getitem__(self, timeframe):
+        if timeframe not in self.tails:
+            self.tails[timeframe] = self.resampled(timeframe).tail(self.bars[timeframe])
+        return self.tails[timeframe]
@@ -0,0 +1,97 @@
+import io
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import requests
+
+# ==============================================================================
+# --- 設定項目 ---
+# ==============================================================================
+JPX_LIST_URL = "https://www.jpx.co.jp/markets/statistics-equities/misc/tvdivq0000001vg2-att/data_j.xls"
+CACHE_PATH = "universe_cache.json"
+FALLBACK_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prime_list.csv")
+TARGET_MARKETS = "プライム|スタンダード"
+
+JST = timezone(timedelta(hours=9))
+
+
+# ==============================================================================
+# --- 銘柄マッピングの構築 ---
+# ==============================================================================
+def build_ticker_map(df, markets=TARGET_MARKETS):
+    """JPXの上場銘柄一覧から {コード.T: 銘柄名} を一括で組み立てる"""
+    target_df = df[df['市場・商品区分'].str.contains(markets, na=False)]
+    codes = target_df['コード'].astype(str) + ".T"
+    return dict(zip(codes, target_df['銘柄名']))
+
+
+def load_fallback(path=FALLBACK_CSV):
+    """リポジトリ同梱の prime_list.csv から銘柄マッピングを読み込む"""
+    df = pd.read_csv(path, dtype=str)
+    return dict(zip(df['コード'] + ".T", df['銘柄名']))
+
+
+# ==============================================================================
+# --- キャッシュ付きローダー ---
+# ==============================================================================
+def _read_cache(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(path, cache):
+    # 分割巡回を同じマシンで複数プロセス動かしても一時ファイルがぶつからないよう、プロセスごとに分ける
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def load_universe(cache_path=CACHE_PATH, url=JPX_LIST_URL, now=None):
+    """プライム・スタンダード銘柄のマッピングを、キャッシュを優先して取得する
+
+    - 当日（JST）取得済みのキャッシュがあれば、ネットワークにもExcelにも触れずに返す
+    - 日付が変わっていれば ETag / Last-Modified 付きの条件付きGETで確認し、
+      304（未更新）ならExcelを解析せずキャッシュを使い続ける
+    - 取得に失敗したら古いキャッシュ、それも無ければ prime_list.csv を使う
+    """
+    today = (now or datetime.now(JST)).strftime("%Y-%m-%d")
+    cache = _read_cache(cache_path)
+    if cache and cache.get("checked") == today:
+        return cache["tickers"]
+
+    headers = {"User-Agent": "Mozilla/5.0"}
+    if cache:
+        if cache.get("etag"):
+            headers["If-None-Match"] = cache["etag"]
+        if cache.get("last_modified"):
+            headers["If-Modified-Since"] = cache["last_modified"]
+
+    try:
+        res = requests.get(url, headers=headers, timeout=20)
+        if res.status_code == 304 and cache:
+            cache["checked"] = today
+        else:
+            res.raise_for_status()
+            tickers = build_ticker_map(pd.read_excel(io.BytesIO(res.content)))
+            if not tickers:
+                raise ValueError("対象市場の銘柄が0件でした")
+            cache = {
+                "checked": today,
+                "etag": res.headers.get("ETag"),
+                "last_modified": res.headers.get("Last-Modified"),
+                "tickers": tickers,
+            }
+        _write_cache(cache_path, cache)
+        return cache["tickers"]
+    except Exception as e:
+        if cache:
+            print(f"銘柄リスト取得失敗、前回のキャッシュを使用します: {e}")
+            return cache["tickers"]
+        print(f"銘柄リスト取得失敗、prime_list.csv を適用します: {e}")
+        return load_fallback()